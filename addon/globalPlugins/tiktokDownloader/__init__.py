@@ -1,21 +1,20 @@
 import globalPluginHandler
 import addonHandler
 import wx
-from . import dialogs
-from . import downloader
-from .manager import DownloadManager
+# dialogs, downloader, manager and the modules they pull in are imported when first
+# needed, so loading the add-on adds as little as possible to NVDA's startup.
+from . import latency
+from . import urls
 from .constants import *
 import os
 import logging
 import api
 import controlTypes
 import threading
-import subprocess
 import config
 import gui
 import tones
 from gui import guiHelper, settingsDialogs
-from urllib.parse import urlparse
 import scriptHandler
 import time
 
@@ -35,7 +34,25 @@ confspec = {
 		"playSounds": "boolean(default=True)",
 		"autoRetryAttempts": "integer(default=2)",
 		"removeWatermark": "boolean(default=True)",
+		"photoSlideshow": "boolean(default=False)",
+		"transcodeProfile": "option('off', 'hevc', 'hevc_small', 'audio_cap', default='off')",
+		"transcodeWorkers": "integer(default=1)",
 		"totalDownloads": "integer(default=0)",
+		"totalBytesSaved": "integer(default=0)",
+		"resolveTimeout": "integer(default=30)",
+		"stallTimeout": "integer(default=60)",
+		"mergeTimeout": "integer(default=300)",
+		"minSpeedKbps": "integer(default=0)",
+		"processPriority": "option('normal', 'below_normal', 'idle', default='below_normal')",
+		"cpuAffinity": "string(default='')",
+		"ffmpegThreads": "integer(default=0)",
+		"recordTraces": "boolean(default=False)",
+		"watchClipboard": "boolean(default=False)",
+		"prefetchMetadata": "boolean(default=True)",
+		"profileSeconds": "integer(default=60)",
+		"latencyWarnMs": "integer(default=150)",
+		"lastUpdateCheck": "integer(default=0)",
+		"subscriptionIntervalHours": "integer(default=6)",
 	}
 }
 config.conf.spec.update(confspec)
@@ -53,10 +70,20 @@ def playSound(success=True):
 			pass
 
 
+def _get_plugin_instance():
+	for p in globalPluginHandler.runningPlugins:
+		if isinstance(p, GlobalPlugin):
+			return p
+	return None
+
+
 class TikTokDownloaderSettingsPanel(settingsDialogs.SettingsPanel):
 	title = _("TikTok Downloader")
 
 	def makeSettings(self, settingsSizer):
+		from . import downloader
+		from . import events
+		from . import transcode
 		sHelper = guiHelper.BoxSizerHelper(self, sizer=settingsSizer)
 
 		download_path = config.conf["tiktokDownloader"]["downloadPath"]
@@ -78,6 +105,33 @@ class TikTokDownloaderSettingsPanel(settingsDialogs.SettingsPanel):
 		self.chkRemoveWatermark.Value = config.conf["tiktokDownloader"]["removeWatermark"]
 		sHelper.addItem(self.chkRemoveWatermark)
 
+		self.chkPhotoSlideshow = wx.CheckBox(self, label=_("Save photo posts as a video slideshow instead of a folder of images"))
+		self.chkPhotoSlideshow.Value = config.conf["tiktokDownloader"]["photoSlideshow"]
+		sHelper.addItem(self.chkPhotoSlideshow)
+
+		self.transcodeLabels = [
+			(transcode.PROFILE_OFF, _("Off")),
+			(transcode.PROFILE_HEVC, _("H.265 video, same sound")),
+			(transcode.PROFILE_HEVC_SMALL, _("Smaller H.265 video and sound")),
+			(transcode.PROFILE_AUDIO_CAP, _("Smaller sound only")),
+		]
+		self.transcodeChoice = sHelper.addLabeledControl(
+			_("Shrink finished downloads in the background:"),
+			wx.Choice,
+			choices=[label for _key, label in self.transcodeLabels]
+		)
+		transcode_keys = [key for key, _label in self.transcodeLabels]
+		current_profile = config.conf["tiktokDownloader"]["transcodeProfile"]
+		self.transcodeChoice.SetSelection(transcode_keys.index(current_profile) if current_profile in transcode_keys else 0)
+
+		self.transcodeWorkersCtrl = sHelper.addLabeledControl(
+			_("Files to shrink at the same time:"),
+			wx.SpinCtrl,
+			min=1,
+			max=transcode.MAX_WORKERS,
+			initial=config.conf["tiktokDownloader"]["transcodeWorkers"]
+		)
+
 		self.autoRetryCtrl = sHelper.addLabeledControl(
 			_("Auto-retry attempts (0 to disable):"),
 			wx.SpinCtrl,
@@ -86,34 +140,169 @@ class TikTokDownloaderSettingsPanel(settingsDialogs.SettingsPanel):
 			initial=config.conf["tiktokDownloader"]["autoRetryAttempts"]
 		)
 
+		self.resolveTimeoutCtrl = sHelper.addLabeledControl(
+			_("Title lookup timeout in seconds (0 to disable):"),
+			wx.SpinCtrl,
+			min=0,
+			max=600,
+			initial=config.conf["tiktokDownloader"]["resolveTimeout"]
+		)
+
+		self.stallTimeoutCtrl = sHelper.addLabeledControl(
+			_("Restart a download with no progress after this many seconds (0 to disable):"),
+			wx.SpinCtrl,
+			min=0,
+			max=3600,
+			initial=config.conf["tiktokDownloader"]["stallTimeout"]
+		)
+
+		self.mergeTimeoutCtrl = sHelper.addLabeledControl(
+			_("Merge timeout in seconds (0 to disable):"),
+			wx.SpinCtrl,
+			min=0,
+			max=3600,
+			initial=config.conf["tiktokDownloader"]["mergeTimeout"]
+		)
+
+		self.minSpeedCtrl = sHelper.addLabeledControl(
+			_("Minimum download speed in KB/s (0 to disable):"),
+			wx.SpinCtrl,
+			min=0,
+			max=100000,
+			initial=config.conf["tiktokDownloader"]["minSpeedKbps"]
+		)
+
+		self.priorityLabels = [
+			(downloader.PRIORITY_NORMAL, _("Normal")),
+			(downloader.PRIORITY_BELOW_NORMAL, _("Below normal")),
+			(downloader.PRIORITY_IDLE, _("Low")),
+		]
+		self.priorityChoice = sHelper.addLabeledControl(
+			_("Priority of yt-dlp and ffmpeg:"),
+			wx.Choice,
+			choices=[label for _key, label in self.priorityLabels]
+		)
+		priority_keys = [key for key, _label in self.priorityLabels]
+		current_priority = config.conf["tiktokDownloader"]["processPriority"]
+		self.priorityChoice.SetSelection(priority_keys.index(current_priority) if current_priority in priority_keys else 1)
+
+		self.cpuAffinityEntry = sHelper.addLabeledControl(_("Limit yt-dlp and ffmpeg to these CPU cores, for example 0-1 (empty for all):"), wx.TextCtrl)
+		self.cpuAffinityEntry.Value = config.conf["tiktokDownloader"]["cpuAffinity"]
+
+		self.ffmpegThreadsCtrl = sHelper.addLabeledControl(
+			_("ffmpeg threads (0 for automatic):"),
+			wx.SpinCtrl,
+			min=0,
+			max=64,
+			initial=config.conf["tiktokDownloader"]["ffmpegThreads"]
+		)
+
+		self.chkPrefetch = wx.CheckBox(self, label=_("Look up video details as soon as a link is entered"))
+		self.chkPrefetch.Value = config.conf["tiktokDownloader"]["prefetchMetadata"]
+		sHelper.addItem(self.chkPrefetch)
+
+		self.chkWatchClipboard = wx.CheckBox(self, label=_("Automatically download TikTok links copied to the clipboard"))
+		self.chkWatchClipboard.Value = config.conf["tiktokDownloader"]["watchClipboard"]
+		sHelper.addItem(self.chkWatchClipboard)
+
+		self.subscriptionIntervalCtrl = sHelper.addLabeledControl(
+			_("Check subscribed profiles for new videos every this many hours (0 to check only when asked):"),
+			wx.SpinCtrl,
+			min=0,
+			max=168,
+			initial=config.conf["tiktokDownloader"]["subscriptionIntervalHours"]
+		)
+
+		self.chkRecordTraces = wx.CheckBox(self, label=_("Record download traces for troubleshooting"))
+		self.chkRecordTraces.Value = config.conf["tiktokDownloader"]["recordTraces"]
+		sHelper.addItem(self.chkRecordTraces)
+
+		self.profileSecondsCtrl = sHelper.addLabeledControl(
+			_("Profiling window in seconds:"),
+			wx.SpinCtrl,
+			min=5,
+			max=3600,
+			initial=config.conf["tiktokDownloader"]["profileSeconds"]
+		)
+
+		self.latencyWarnCtrl = sHelper.addLabeledControl(
+			_("Log a warning when add-on work delays NVDA by more than this many milliseconds (0 to disable):"),
+			wx.SpinCtrl,
+			min=0,
+			max=10000,
+			initial=config.conf["tiktokDownloader"]["latencyWarnMs"]
+		)
+
+		profileBtn = wx.Button(self, label=_("Start or Stop Profiling"))
+		profileBtn.Bind(wx.EVT_BUTTON, self.onToggleProfiling)
+		sHelper.addItem(profileBtn)
+
 		totalDownloads = config.conf["tiktokDownloader"]["totalDownloads"]
 		statsLabel = wx.StaticText(self, label=_("Total videos downloaded: {}").format(totalDownloads))
 		sHelper.addItem(statsLabel)
 
+		savedLabel = wx.StaticText(self, label=_("Space saved by shrinking downloads: {}").format(
+			events.format_size(config.conf["tiktokDownloader"]["totalBytesSaved"])
+		))
+		sHelper.addItem(savedLabel)
+
 		resetStatsBtn = wx.Button(self, label=_("Reset Statistics"))
 		resetStatsBtn.Bind(wx.EVT_BUTTON, self.onResetStats)
 		sHelper.addItem(resetStatsBtn)
 
+		exportStatsBtn = wx.Button(self, label=_("Export Download Timings..."))
+		exportStatsBtn.Bind(wx.EVT_BUTTON, self.onExportStats)
+		sHelper.addItem(exportStatsBtn)
+
 		updateBtn = wx.Button(self, label=_("Check for yt-dlp Updates"))
 		updateBtn.Bind(wx.EVT_BUTTON, self.onCheckUpdates)
 		sHelper.addItem(updateBtn)
 
 	def onResetStats(self, event):
 		config.conf["tiktokDownloader"]["totalDownloads"] = 0
+		config.conf["tiktokDownloader"]["totalBytesSaved"] = 0
 		wx.MessageBox(_("Statistics have been reset."), _("Reset"), wx.OK | wx.ICON_INFORMATION)
 
+	def onExportStats(self, event):
+		plugin = _get_plugin_instance()
+		if not plugin:
+			wx.MessageBox(_("Plugin instance not found."), _("Error"), wx.OK | wx.ICON_ERROR)
+			return
+
+		dlg = wx.FileDialog(
+			self,
+			_("Export Download Timings"),
+			defaultFile="tiktok_download_timings.json",
+			wildcard=_("JSON files (*.json)|*.json|CSV files (*.csv)|*.csv"),
+			style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT,
+		)
+		if dlg.ShowModal() == wx.ID_OK:
+			path = dlg.GetPath()
+			try:
+				plugin.manager.export_metrics(path, extra={"ui_latency": latency.MONITOR.summary()})
+				wx.MessageBox(_("Download timings exported to {}.").format(path), _("Export"), wx.OK | wx.ICON_INFORMATION)
+			except Exception as e:
+				logging.error(f"Failed to export download timings: {e}")
+				wx.MessageBox(_("Export failed: {}").format(e), _("Error"), wx.OK | wx.ICON_ERROR)
+		dlg.Destroy()
+
+	def onToggleProfiling(self, event):
+		plugin = _get_plugin_instance()
+		if not plugin:
+			wx.MessageBox(_("Plugin instance not found."), _("Error"), wx.OK | wx.ICON_ERROR)
+			return
+		config.conf["tiktokDownloader"]["profileSeconds"] = self.profileSecondsCtrl.Value
+		plugin.toggle_profiling()
+
 	def onCheckUpdates(self, event):
 		threading.Thread(target=self._run_manual_update, daemon=True).start()
 
 	def _run_manual_update(self):
-		plugin = None
-		for p in globalPluginHandler.runningPlugins:
-			if isinstance(p, GlobalPlugin):
-				plugin = p
-				break
+		plugin = _get_plugin_instance()
 
 		if plugin:
-			result = plugin._silent_update(manual=True)
+			result = plugin._silent_update()
+			# Modal boxes go through wx directly: latency.call_after would time the user reading them.
 			wx.CallAfter(wx.MessageBox, result, _("Update Check"), wx.OK | wx.ICON_INFORMATION)
 		else:
 			wx.CallAfter(wx.MessageBox, _("Plugin instance not found."), _("Error"), wx.OK | wx.ICON_ERROR)
@@ -128,7 +317,31 @@ class TikTokDownloaderSettingsPanel(settingsDialogs.SettingsPanel):
 		config.conf["tiktokDownloader"]["downloadPath"] = self.pathEntry.Value
 		config.conf["tiktokDownloader"]["playSounds"] = self.chkPlaySounds.Value
 		config.conf["tiktokDownloader"]["removeWatermark"] = self.chkRemoveWatermark.Value
+		config.conf["tiktokDownloader"]["photoSlideshow"] = self.chkPhotoSlideshow.Value
+		config.conf["tiktokDownloader"]["transcodeProfile"] = self.transcodeLabels[max(0, self.transcodeChoice.GetSelection())][0]
+		config.conf["tiktokDownloader"]["transcodeWorkers"] = self.transcodeWorkersCtrl.Value
 		config.conf["tiktokDownloader"]["autoRetryAttempts"] = self.autoRetryCtrl.Value
+		config.conf["tiktokDownloader"]["resolveTimeout"] = self.resolveTimeoutCtrl.Value
+		config.conf["tiktokDownloader"]["stallTimeout"] = self.stallTimeoutCtrl.Value
+		config.conf["tiktokDownloader"]["mergeTimeout"] = self.mergeTimeoutCtrl.Value
+		config.conf["tiktokDownloader"]["minSpeedKbps"] = self.minSpeedCtrl.Value
+		config.conf["tiktokDownloader"]["processPriority"] = self.priorityLabels[max(0, self.priorityChoice.GetSelection())][0]
+		config.conf["tiktokDownloader"]["cpuAffinity"] = self.cpuAffinityEntry.Value.strip()
+		config.conf["tiktokDownloader"]["ffmpegThreads"] = self.ffmpegThreadsCtrl.Value
+		config.conf["tiktokDownloader"]["prefetchMetadata"] = self.chkPrefetch.Value
+		config.conf["tiktokDownloader"]["watchClipboard"] = self.chkWatchClipboard.Value
+		config.conf["tiktokDownloader"]["subscriptionIntervalHours"] = self.subscriptionIntervalCtrl.Value
+		config.conf["tiktokDownloader"]["recordTraces"] = self.chkRecordTraces.Value
+		config.conf["tiktokDownloader"]["profileSeconds"] = self.profileSecondsCtrl.Value
+		config.conf["tiktokDownloader"]["latencyWarnMs"] = self.latencyWarnCtrl.Value
+		latency.MONITOR.warn_threshold = self.latencyWarnCtrl.Value / 1000.0
+
+		plugin = _get_plugin_instance()
+		if plugin:
+			plugin.apply_trace_setting()
+			plugin.apply_clipboard_setting()
+			plugin.apply_subscription_setting()
+			plugin.apply_transcode_setting()
 
 
 class GlobalPlugin(globalPluginHandler.GlobalPlugin):
@@ -142,23 +355,85 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 			settingsDialogs.NVDASettingsDialog.categoryClasses.append(TikTokDownloaderSettingsPanel)
 
 		self.dlg = None
-		self.is_updating = False
-
-		self.manager = DownloadManager(
-			max_concurrent=3,
-			on_item_added=self._on_item_added,
-			on_item_updated=self._on_item_updated,
-			on_item_removed=self._on_item_removed,
-			on_queue_updated=self._on_queue_updated,
-			is_updating_callable=lambda: self.is_updating,
-			play_sound_callable=playSound,
-		)
+		self._trace_recorder = None
+		self._address_bar_locator = None
+		self._clipboard_watcher = None
+		self._manager = None
+		self._prefetcher = None
+		self._subscriptions = None
+		self._manager_lock = threading.Lock()
+		latency.MONITOR.warn_threshold = config.conf["tiktokDownloader"]["latencyWarnMs"] / 1000.0
 
 		self.createMenu()
+		self.apply_clipboard_setting()
+
+		threading.Thread(target=self._deferred_init, daemon=True).start()
+
+	@property
+	def manager(self):
+		return self._ensure_manager()
+
+	@property
+	def subscriptions(self):
+		return self._ensure_subscriptions()
+
+	def _ensure_manager(self):
+		"""Returns the download manager, created on first use by whichever thread needs it first."""
+		manager = self._manager
+		if manager is not None:
+			return manager
+		with self._manager_lock:
+			if self._manager is None:
+				from .manager import DownloadManager
+				from . import profiling
+				from . import prefetch
+				self._prefetcher = prefetch.MetadataPrefetcher()
+				profiling.PROFILER.register_summary("Main-thread latency", latency.MONITOR.summary)
+				self._manager = DownloadManager(
+					max_concurrent=3,
+					on_item_added=self._on_item_added,
+					on_item_updated=self._on_item_updated,
+					on_item_removed=self._on_item_removed,
+					on_items_updated=self._on_items_updated,
+					on_items_removed=self._on_items_removed,
+					on_items_added=self._on_items_added,
+					on_queue_updated=self._on_queue_updated,
+					play_sound_callable=playSound,
+					restore_pending=True,
+					prefetcher=self._prefetcher,
+					on_expansion_finished=self._on_expansion_finished,
+				)
+				self.apply_trace_setting()
+			return self._manager
+
+	def _ensure_subscriptions(self):
+		"""Returns the subscription list, loaded and scheduled on first use."""
+		subs = self._subscriptions
+		if subs is not None:
+			return subs
+		with self._manager_lock:
+			if self._subscriptions is None:
+				from . import subscriptions
+				subs = subscriptions.SubscriptionManager(
+					self._enqueue_subscription_videos,
+					interval=config.conf["tiktokDownloader"]["subscriptionIntervalHours"] * 3600,
+					on_synced=self._on_subscription_synced,
+				)
+				subs.load()
+				subs.start()
+				self._subscriptions = subs
+			return self._subscriptions
 
-		self.manager.load_state()
-
-		threading.Thread(target=self._startup_update_check, daemon=True).start()
+	def _deferred_init(self):
+		try:
+			restored = self.manager.load_state()
+			logging.info(f"TikTok Downloader restored {len(restored)} saved downloads")
+		except Exception as e:
+			logging.error(f"Failed to restore saved downloads: {e}")
+		from . import subscriptions
+		if subscriptions.has_saved_subscriptions():
+			self._ensure_subscriptions()
+		self._startup_update_check()
 
 	def createMenu(self):
 		self.toolsMenu = gui.mainFrame.sysTrayIcon.toolsMenu
@@ -183,86 +458,203 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 			except Exception:
 				pass
 
-		self.manager.mark_all_interrupted_and_terminate_processes()
+		if self._clipboard_watcher:
+			self._clipboard_watcher.stop()
+
+		if self._subscriptions is not None:
+			self._subscriptions.stop()
+
+		# Nothing to save or stop if the manager was never needed.
+		if self._manager is not None:
+			self._manager.mark_all_interrupted_and_terminate_processes()
+			self._manager.set_recorder(None)
+			self._prefetcher.clear()
+			from . import profiling
+			profiling.PROFILER.stop()
 
 		super(GlobalPlugin, self).terminate()
 
+	def toggle_profiling(self):
+		import ui
+		from . import profiling
+		# Creating the manager registers its lock, so the session can time it.
+		self._ensure_manager()
+		seconds = config.conf["tiktokDownloader"]["profileSeconds"]
+		if profiling.PROFILER.toggle(seconds, on_finished=self._on_profile_finished):
+			ui.message(_("Profiling TikTok Downloader for {} seconds").format(seconds))
+
+	def _on_profile_finished(self, path):
+		import ui
+		if path:
+			latency.call_after(ui.message, _("Profile saved to {}").format(path))
+		else:
+			latency.call_after(ui.message, _("Profiling stopped, but the profile could not be saved"))
+
+	def apply_trace_setting(self):
+		from . import tracing
+		enabled = config.conf["tiktokDownloader"]["recordTraces"]
+		if enabled and self._trace_recorder is None:
+			try:
+				self._trace_recorder = tracing.TraceRecorder(tracing.new_trace_path(), self.manager.MAX_CONCURRENT)
+			except Exception as e:
+				logging.error(f"Failed to start trace recording: {e}")
+				return
+			self.manager.set_recorder(self._trace_recorder)
+		elif not enabled and self._trace_recorder is not None:
+			self.manager.set_recorder(None)
+			self._trace_recorder = None
+
+	def apply_clipboard_setting(self):
+		enabled = config.conf["tiktokDownloader"]["watchClipboard"]
+		if enabled and self._clipboard_watcher is None:
+			from . import clipboard
+			watcher = clipboard.ClipboardWatcher(self._on_clipboard_text)
+			if watcher.start():
+				self._clipboard_watcher = watcher
+		elif not enabled and self._clipboard_watcher is not None:
+			self._clipboard_watcher.stop()
+			self._clipboard_watcher = None
+
+	def apply_subscription_setting(self):
+		if self._subscriptions is not None:
+			self._subscriptions.set_interval(config.conf["tiktokDownloader"]["subscriptionIntervalHours"] * 3600)
+
+	def apply_transcode_setting(self):
+		# Files already waiting keep the profile they were queued with; the new one applies from the next download.
+		if self._manager is not None:
+			self._manager.set_transcode_workers(config.conf["tiktokDownloader"]["transcodeWorkers"])
+
+	def get_subscriptions(self):
+		return self.subscriptions.get_subscriptions()
+
+	def add_subscription(self, url, quality_str, remove_watermark, include_existing=False):
+		if not self.subscriptions.add(url, quality_str, remove_watermark):
+			return False
+		if include_existing:
+			self.manager.expand_url(url, quality_str, remove_watermark=remove_watermark)
+		return True
+
+	def remove_subscription(self, url):
+		return self.subscriptions.remove(url)
+
+	def sync_subscriptions(self, url=None):
+		self.subscriptions.sync_now(url)
+
+	def _enqueue_subscription_videos(self, video_urls, titles, quality_str, remove_watermark):
+		added, _skipped = self.manager.start_downloads(
+			video_urls, quality_str, remove_watermark=remove_watermark, skip_downloaded=True, titles=titles,
+		)
+		return len(added)
+
+	def _on_subscription_synced(self, sub, queued):
+		if queued:
+			import ui
+			latency.call_after(ui.message, _("{} new videos from {}").format(queued, sub.url))
+		if self.dlg:
+			latency.call_after(self._refresh_subscriptions_dialog)
+
+	def _refresh_subscriptions_dialog(self):
+		# Looked up on the main thread, where the dialog is created and destroyed.
+		dlg = self.dlg.subscriptions_dlg if self.dlg else None
+		if dlg:
+			dlg.refresh()
+
+	def import_links(self, url_iter, quality_str, remove_watermark, on_progress=None, should_stop=None):
+		def videos():
+			for url in url_iter:
+				if urls.is_collection_url(url):
+					self.manager.expand_url(url, quality_str, remove_watermark=remove_watermark)
+				else:
+					yield url
+
+		return self.manager.import_urls(
+			videos(),
+			quality_str,
+			remove_watermark=remove_watermark,
+			on_progress=on_progress,
+			should_stop=should_stop,
+		)
+
+	def prefetch_metadata(self, url):
+		if config.conf["tiktokDownloader"]["prefetchMetadata"] and urls.classify_url(url) == urls.KIND_VIDEO:
+			# The prefetcher is created with the manager.
+			self._ensure_manager()
+			self._prefetcher.prefetch(url)
+
+	def _on_clipboard_text(self, text):
+		# Profile, hashtag and sound links are often copied just to share them; only the download dialog lists their videos.
+		found = [url for url in urls.extract_urls(text) if not urls.is_collection_url(url)]
+		if not found:
+			return
+		import ui
+		quality = config.conf["tiktokDownloader"]["lastQuality"]
+		remove_watermark = config.conf["tiktokDownloader"]["removeWatermark"]
+		added, skipped = self.manager.start_downloads(found, quality, remove_watermark=remove_watermark)
+		if len(added) == 1:
+			message = _("Download started from clipboard")
+		elif added:
+			message = _("{} downloads started from clipboard").format(len(added))
+		else:
+			message = _("These TikTok links are already in the download list")
+		if added and skipped:
+			message += ", " + _("{} already in the list").format(skipped)
+		latency.call_after(ui.message, message)
+
+	def _on_expansion_finished(self, url, queued, error):
+		import ui
+		if error:
+			message = _("Could not list the videos of {}: {}").format(url, error)
+		else:
+			message = _("Finished adding videos from {}: {} queued").format(url, queued)
+		latency.call_after(ui.message, message)
+
 	def _on_item_added(self, d_id, data):
 		if self.dlg:
-			wx.CallAfter(self.dlg.add_download_item, d_id, data.get("title", ""), data.get("status", STATUS_QUEUED))
-			wx.CallAfter(self.dlg.update_queue_status)
+			latency.call_after(self.dlg.add_download_item, d_id, data.get("title", ""), data.get("status", STATUS_QUEUED))
+			latency.call_after(self.dlg.update_queue_status)
 
 	def _on_item_updated(self, d_id, data):
 		if self.dlg:
 			status = data.get("status", "")
 			percent = data.get("progress")
-			wx.CallAfter(self.dlg.update_status, d_id, status, percent)
-			wx.CallAfter(self.dlg.update_queue_status)
-		self.manager.save_state()
+			latency.call_after(self.dlg.update_status, d_id, status, percent)
+			latency.call_after(self.dlg.update_queue_status)
+		self.manager.schedule_save()
 
 	def _on_item_removed(self, d_id):
 		if self.dlg:
-			wx.CallAfter(self.dlg.remove_download_item, d_id)
+			latency.call_after(self.dlg.remove_download_item, d_id)
 
-	def _on_queue_updated(self):
+	def _on_items_updated(self, batch):
 		if self.dlg:
-			wx.CallAfter(self.dlg.update_queue_status)
+			updates = [(d_id, data.get("status", ""), data.get("progress")) for d_id, data in batch]
+			latency.call_after(self.dlg.update_statuses, updates)
 
-	def _startup_update_check(self):
-		time.sleep(5)
-		for _ in range(12):
-			if self.get_active_count() == 0 and self.get_queued_count() == 0:
-				self._silent_update(manual=False)
-				return
-			time.sleep(5)
-
-	def _silent_update(self, manual=False):
-		if self.get_active_count() > 0:
-			return _("Cannot update yt-dlp while downloads are active. Please stop downloads and try again.") if manual else _(
-				"Skipped yt-dlp update check because downloads are active."
-			)
+	def _on_items_added(self, batch):
+		if self.dlg:
+			items = [(d_id, data.get("title", ""), data.get("status", STATUS_QUEUED)) for d_id, data in batch]
+			latency.call_after(self.dlg.add_download_items, items)
 
-		self.is_updating = True
-		status_msg = _("Update check failed.")
-		try:
-			yt_dlp_path = downloader.get_yt_dlp_path()
-			if os.path.exists(yt_dlp_path):
-				logging.info("Checking for yt-dlp updates...")
-				startupinfo = subprocess.STARTUPINFO()
-				startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-
-				proc = subprocess.run(
-					[yt_dlp_path, "-U"],
-					capture_output=True,
-					text=True,
-					startupinfo=startupinfo,
-					check=False,
-					encoding="utf-8",
-					errors="replace",
-					timeout=120
-				)
+	def _on_items_removed(self, d_ids):
+		if self.dlg:
+			latency.call_after(self.dlg.remove_download_items, list(d_ids))
 
-				output = (proc.stdout or "") + "\n" + (proc.stderr or "")
-				logging.info(f"Update Output: {output}")
+	def _on_queue_updated(self):
+		if self.dlg:
+			latency.call_after(self.dlg.update_queue_status)
 
-				if "up-to-date" in output or "is up to date" in output:
-					status_msg = _("yt-dlp is up to date.")
-				elif "Updating to version" in output:
-					try:
-						ver = output.split("Updating to version")[1].split()[0]
-						status_msg = _("Updated yt-dlp to version {}.").format(ver)
-					except Exception:
-						status_msg = _("Updated yt-dlp to latest version.")
-				else:
-					status_msg = _("Update Info: {}").format(output.strip()[:200])
-			else:
-				status_msg = _("yt-dlp executable not found.")
-		except Exception as e:
-			logging.error(f"Auto-update failed: {e}")
-			status_msg = _("Update failed: {}").format(str(e))
-		finally:
-			self.is_updating = False
+	def _startup_update_check(self):
+		from . import updater
+		if not updater.is_check_due(config.conf["tiktokDownloader"]["lastUpdateCheck"], time.time()):
+			return
+		time.sleep(5)
+		self._silent_update()
 
+	def _silent_update(self):
+		# Runs beside active downloads: the update goes to a separate binary that new downloads switch to.
+		from . import updater
+		status_msg = updater.UPDATER.update()
+		config.conf["tiktokDownloader"]["lastUpdateCheck"] = int(time.time())
 		return status_msg
 
 	@scriptHandler.script(
@@ -272,7 +664,7 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 	def script_openDownloader(self, gesture):
 		logging.info("Opening Downloader GUI")
 		url = self.get_video_url()
-		wx.CallAfter(self._showGui, url)
+		latency.call_after(self._showGui, url)
 
 	@scriptHandler.script(
 		description=_("Quick download TikTok video from clipboard"),
@@ -286,7 +678,10 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 				remove_watermark = config.conf["tiktokDownloader"]["removeWatermark"]
 				self.start_download(url, quality, remove_watermark=remove_watermark)
 				import ui
-				ui.message(_("Download started from clipboard"))
+				if urls.is_collection_url(url):
+					ui.message(_("Adding the videos from this link to the queue"))
+				else:
+					ui.message(_("Download started from clipboard"))
 			else:
 				import ui
 				ui.message(_("This URL is already being downloaded"))
@@ -294,6 +689,35 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 			import ui
 			ui.message(_("No valid TikTok URL found in clipboard"))
 
+	@scriptHandler.script(
+		description=_("Announces the TikTok download queue status and estimated time remaining"),
+	)
+	def script_announceQueueStatus(self, gesture):
+		import ui
+		from . import events
+		active = self.get_active_count()
+		queued = self.get_queued_count()
+		expanding = self.get_expansion_count()
+		if not active and not queued and not expanding:
+			ui.message(_("No downloads in progress"))
+			return
+
+		parts = [_("{} active, {} queued").format(active, queued)]
+		if expanding:
+			parts.append(_("still adding videos from {} links").format(expanding))
+		eta = self.get_queue_eta()
+		if eta["bytes_per_sec"] > 0:
+			parts.append(events.format_speed(eta["bytes_per_sec"]))
+		if eta["eta_seconds"] is not None:
+			parts.append(_("about {} remaining").format(events.format_eta(eta["eta_seconds"])))
+		ui.message(", ".join(parts))
+
+	@scriptHandler.script(
+		description=_("Starts or stops profiling the TikTok Downloader"),
+	)
+	def script_toggleProfiling(self, gesture):
+		self.toggle_profiling()
+
 	@scriptHandler.script(
 		description=_("Opens the TikTok Downloader settings"),
 	)
@@ -312,16 +736,20 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 			ui.message(_("Download folder does not exist"))
 
 	def _is_valid_tiktok_url(self, url):
-		if not url:
-			return False
+		return urls.is_tiktok_url(url)
+
+	def _is_address_bar(self, obj):
+		try:
+			if obj.role == controlTypes.Role.EDIT:
+				name = (obj.name or "").lower()
+				return any(k in name for k in ("address", "search", "location", "url"))
+		except Exception:
+			pass
+		return False
+
+	def _is_tiktok_address_bar(self, obj):
 		try:
-			u = url.strip()
-			if "://" not in u:
-				u = "https://" + u
-			parsed = urlparse(u)
-			host = (parsed.hostname or "").lower()
-			valid_hosts = ["tiktok.com", "www.tiktok.com", "m.tiktok.com", "vm.tiktok.com", "vt.tiktok.com"]
-			return host in valid_hosts
+			return self._is_address_bar(obj) and self._is_valid_tiktok_url(obj.value or "")
 		except Exception:
 			return False
 
@@ -332,42 +760,20 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 			try:
 				focus = api.getFocusObject()
 				if hasattr(focus, "appModule") and focus.appModule.appName in ["chrome", "msedge", "firefox", "brave", "opera"]:
-					start = time.monotonic()
-
-					def is_address_bar(obj):
-						try:
-							if obj.role == controlTypes.Role.EDIT:
-								name = (obj.name or "").lower()
-								if any(k in name for k in ("address", "search", "location", "url")):
-									val = obj.value or ""
-									return self._is_valid_tiktok_url(val)
-						except Exception:
-							pass
-						return False
-
 					curr = focus
 					while curr and curr.role != controlTypes.Role.WINDOW:
 						curr = curr.parent
 					window = curr
 
 					if window:
-						queue = [window]
-						visited = 0
-						while queue and visited < 300 and (time.monotonic() - start) < 0.25:
-							node = queue.pop(0)
-							visited += 1
-
-							if is_address_bar(node):
-								url = node.value
-								return url
-
-							try:
-								child = node.firstChild
-								while child:
-									queue.append(child)
-									child = child.next
-							except Exception:
-								pass
+						if self._address_bar_locator is None:
+							from . import locator
+							self._address_bar_locator = locator.AddressBarLocator(self._is_address_bar, self._is_tiktok_address_bar)
+						node = self._address_bar_locator.find(window)
+						if node is not None:
+							value = node.value or ""
+							if self._is_valid_tiktok_url(value):
+								return value
 			except Exception as e:
 				logging.debug(f"UIA URL fetch failed: {type(e).__name__}: {e}")
 
@@ -399,6 +805,7 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 			except Exception:
 				self.dlg = None
 
+		from . import dialogs
 		self.dlg = dialogs.DownloaderDialog(None, self, url)
 		self.dlg.Show()
 		self.dlg.Raise()
@@ -419,15 +826,31 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 	def get_queued_count(self):
 		return self.manager.get_queued_count()
 
+	def get_expansion_count(self):
+		return self.manager.get_expansion_count()
+
+	def get_transcode_count(self):
+		return self.manager.get_transcode_count()
+
+	def get_queue_eta(self):
+		return self.manager.get_queue_eta()
+
 	def _get_download_path(self):
 		return config.conf["tiktokDownloader"]["downloadPath"] or os.path.join(os.path.expanduser("~"), "Downloads")
 
 	def start_download(self, url, quality_str, known_title=None, remove_watermark=True):
+		# Profile, hashtag and sound links are listed and queued a page at a time; they have no id of their own.
+		if urls.is_collection_url(url):
+			self.manager.expand_url(url, quality_str, remove_watermark=remove_watermark)
+			return None
 		return self.manager.start_download(url, quality_str, known_title=known_title, remove_watermark=remove_watermark)
 
 	def retry_download(self, d_id):
 		self.manager.retry_download(d_id)
 
+	def retry_failed(self):
+		return self.manager.retry_failed()
+
 	def stop_download(self, d_id):
 		self.manager.stop_download(d_id, self._get_download_path())
 
@@ -0,0 +1,195 @@
+import os
+import time
+import ctypes
+import logging
+import threading
+from typing import Optional, Callable
+
+DEBOUNCE_MS = 300
+OPEN_RETRIES = 5
+
+WM_CLOSE = 0x0010
+WM_TIMER = 0x0113
+WM_CLIPBOARDUPDATE = 0x031D
+CF_UNICODETEXT = 13
+HWND_MESSAGE = -3
+TIMER_ID = 1
+
+
+class ClipboardWatcher:
+	"""Calls on_text with the clipboard text after it changes.
+
+	A message-only window registered with AddClipboardFormatListener gets
+	WM_CLIPBOARDUPDATE from Windows, so nothing polls. Applications often set
+	the clipboard several times for one copy; a timer restarted on every
+	notification makes that one on_text call, DEBOUNCE_MS after the last one.
+	Everything, including on_text, runs on the watcher's own thread.
+	"""
+
+	def __init__(self, on_text: Callable[[str], None], debounce_ms: int = DEBOUNCE_MS):
+		self._on_text = on_text
+		self._debounce_ms = debounce_ms
+		self._thread: Optional[threading.Thread] = None
+		self._hwnd = None
+		self._user32 = None
+		self._ready = threading.Event()
+		self._last_sequence = None
+
+	@property
+	def running(self) -> bool:
+		return self._thread is not None and self._thread.is_alive()
+
+	def start(self) -> bool:
+		if os.name != "nt":
+			return False
+		if self.running:
+			return True
+		self._ready.clear()
+		self._thread = threading.Thread(target=self._run, name="TikTokClipboardWatcher", daemon=True)
+		self._thread.start()
+		self._ready.wait(5)
+		return self._hwnd is not None
+
+	def stop(self):
+		thread, hwnd = self._thread, self._hwnd
+		if thread is None:
+			return
+		if hwnd:
+			self._user32.PostMessageW(hwnd, WM_CLOSE, 0, 0)
+		thread.join(5)
+		self._thread = None
+
+	def _run(self):
+		from ctypes import wintypes
+
+		# Private DLL handles, so the prototypes set below do not change NVDA's own ctypes.windll calls.
+		user32 = ctypes.WinDLL("user32", use_last_error=True)
+		kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+		self._user32 = user32
+		LRESULT = ctypes.c_ssize_t
+		WNDPROC = ctypes.WINFUNCTYPE(LRESULT, wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM)
+
+		class WNDCLASSW(ctypes.Structure):
+			_fields_ = [
+				("style", wintypes.UINT),
+				("lpfnWndProc", WNDPROC),
+				("cbClsExtra", ctypes.c_int),
+				("cbWndExtra", ctypes.c_int),
+				("hInstance", wintypes.HINSTANCE),
+				("hIcon", wintypes.HICON),
+				("hCursor", wintypes.HANDLE),
+				("hbrBackground", wintypes.HBRUSH),
+				("lpszMenuName", wintypes.LPCWSTR),
+				("lpszClassName", wintypes.LPCWSTR),
+			]
+
+		user32.DefWindowProcW.argtypes = [wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM]
+		user32.DefWindowProcW.restype = LRESULT
+		user32.CreateWindowExW.argtypes = [
+			wintypes.DWORD, wintypes.LPCWSTR, wintypes.LPCWSTR, wintypes.DWORD,
+			ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+			wintypes.HWND, wintypes.HMENU, wintypes.HINSTANCE, wintypes.LPVOID,
+		]
+		user32.CreateWindowExW.restype = wintypes.HWND
+		user32.PostMessageW.argtypes = [wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM]
+		user32.SetTimer.argtypes = [wintypes.HWND, ctypes.c_size_t, wintypes.UINT, wintypes.LPVOID]
+		user32.KillTimer.argtypes = [wintypes.HWND, ctypes.c_size_t]
+		user32.OpenClipboard.argtypes = [wintypes.HWND]
+		user32.AddClipboardFormatListener.argtypes = [wintypes.HWND]
+		user32.RemoveClipboardFormatListener.argtypes = [wintypes.HWND]
+		user32.DestroyWindow.argtypes = [wintypes.HWND]
+		kernel32.GetModuleHandleW.restype = wintypes.HMODULE
+		user32.GetClipboardData.restype = wintypes.HANDLE
+		kernel32.GlobalLock.argtypes = [wintypes.HGLOBAL]
+		kernel32.GlobalLock.restype = wintypes.LPVOID
+		kernel32.GlobalUnlock.argtypes = [wintypes.HGLOBAL]
+
+		def wndproc(hwnd, msg, wparam, lparam):
+			if msg == WM_CLIPBOARDUPDATE:
+				# Restarting the timer is the debounce.
+				user32.SetTimer(hwnd, TIMER_ID, self._debounce_ms, None)
+				return 0
+			if msg == WM_TIMER and wparam == TIMER_ID:
+				user32.KillTimer(hwnd, TIMER_ID)
+				self._deliver(user32, kernel32, hwnd)
+				return 0
+			if msg == WM_CLOSE:
+				user32.KillTimer(hwnd, TIMER_ID)
+				user32.RemoveClipboardFormatListener(hwnd)
+				user32.DestroyWindow(hwnd)
+				user32.PostQuitMessage(0)
+				return 0
+			return user32.DefWindowProcW(hwnd, msg, wparam, lparam)
+
+		# The class is per instance so its window procedure never outlives this watcher.
+		class_name = f"TikTokDownloaderClipboardWatcher{id(self)}"
+		proc = WNDPROC(wndproc)
+		wc = WNDCLASSW()
+		wc.lpfnWndProc = proc
+		wc.hInstance = kernel32.GetModuleHandleW(None)
+		wc.lpszClassName = class_name
+		hwnd = None
+		try:
+			if not user32.RegisterClassW(ctypes.byref(wc)):
+				raise ctypes.WinError(ctypes.get_last_error())
+			hwnd = user32.CreateWindowExW(0, class_name, class_name, 0, 0, 0, 0, 0, HWND_MESSAGE, None, wc.hInstance, None)
+			if not hwnd:
+				raise ctypes.WinError(ctypes.get_last_error())
+			if not user32.AddClipboardFormatListener(hwnd):
+				raise ctypes.WinError(ctypes.get_last_error())
+			self._last_sequence = user32.GetClipboardSequenceNumber()
+			self._hwnd = hwnd
+		except Exception as e:
+			logging.error(f"Failed to start clipboard watcher: {e}")
+			if hwnd:
+				user32.DestroyWindow(hwnd)
+			user32.UnregisterClassW(class_name, wc.hInstance)
+			self._ready.set()
+			return
+		self._ready.set()
+
+		msg = wintypes.MSG()
+		while user32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+			user32.TranslateMessage(ctypes.byref(msg))
+			user32.DispatchMessageW(ctypes.byref(msg))
+
+		self._hwnd = None
+		user32.UnregisterClassW(class_name, wc.hInstance)
+
+	def _deliver(self, user32, kernel32, hwnd):
+		sequence = user32.GetClipboardSequenceNumber()
+		if sequence == self._last_sequence:
+			return
+		self._last_sequence = sequence
+		text = self._read_text(user32, kernel32, hwnd)
+		if not text:
+			return
+		try:
+			self._on_text(text)
+		except Exception as e:
+			logging.error(f"Clipboard handler failed: {e}")
+
+	@staticmethod
+	def _read_text(user32, kernel32, hwnd) -> Optional[str]:
+		if not user32.IsClipboardFormatAvailable(CF_UNICODETEXT):
+			return None
+		# The application that just copied may still hold the clipboard open.
+		for attempt in range(OPEN_RETRIES):
+			if user32.OpenClipboard(hwnd):
+				break
+			time.sleep(0.02 * (attempt + 1))
+		else:
+			return None
+		try:
+			handle = user32.GetClipboardData(CF_UNICODETEXT)
+			if not handle:
+				return None
+			pointer = kernel32.GlobalLock(handle)
+			if not pointer:
+				return None
+			try:
+				return ctypes.wstring_at(pointer)
+			finally:
+				kernel32.GlobalUnlock(handle)
+		finally:
+			user32.CloseClipboard()
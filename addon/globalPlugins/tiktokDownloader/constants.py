@@ -7,9 +7,15 @@ STATUS_ERROR = "Error"
 STATUS_STOPPED = "Stopped"
 STATUS_INTERRUPTED = "Interrupted"
 STATUS_RETRYING = "Retrying"
+STATUS_STOPPING = "Stopping"
 
-ACTIVE_STATUSES = [STATUS_QUEUED, STATUS_STARTING, STATUS_DOWNLOADING, STATUS_MERGING, STATUS_RETRYING]
+ACTIVE_STATUSES = [STATUS_QUEUED, STATUS_STARTING, STATUS_DOWNLOADING, STATUS_MERGING, STATUS_RETRYING, STATUS_STOPPING]
 FINISHED_STATUSES = [STATUS_COMPLETED, STATUS_ERROR, STATUS_STOPPED, STATUS_INTERRUPTED]
+# Finished without a file; only these can be queued again.
+RETRYABLE_STATUSES = [STATUS_ERROR, STATUS_STOPPED, STATUS_INTERRUPTED]
+
+# Quality key for downloading only the sound.
+QUALITY_AUDIO = "audio"
 
 
 def is_active_status(status):
@@ -3,7 +3,15 @@ import re
 import config
 import ui
 import os
+import time
+import threading
 from .constants import *
+from . import events
+from . import latency
+from . import urls
+from .profiling import PROFILER
+
+PREFETCH_DELAY_MS = 500
 
 
 class DownloaderDialog(wx.Dialog):
@@ -13,11 +21,13 @@ class DownloaderDialog(wx.Dialog):
 		("720", "720p"),
 		("480", "480p"),
 		("360", "360p"),
+		(QUALITY_AUDIO, _("Audio only")),
 	]
 
 	def __init__(self, parent, plugin_instance, url=""):
 		super().__init__(parent, title=_("TikTok Downloader"), size=(650, 600))
 		self.plugin = plugin_instance
+		self.subscriptions_dlg = None
 		self.Center()
 		self.Raise()
 		self.SetFocus()
@@ -28,6 +38,8 @@ class DownloaderDialog(wx.Dialog):
 		lbl_url = wx.StaticText(panel, label=_("Enter TikTok video link:"))
 		self.txt_url = wx.TextCtrl(panel, value=url)
 		self.txt_url.SetName(_("Enter TikTok video link"))
+		self.txt_url.Bind(wx.EVT_TEXT, self.on_url_changed)
+		self._prefetch_timer = None
 		vbox.Add(lbl_url, flag=wx.LEFT | wx.TOP, border=10)
 		vbox.Add(self.txt_url, flag=wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, border=10)
 
@@ -68,6 +80,14 @@ class DownloaderDialog(wx.Dialog):
 		self.btn_download.Bind(wx.EVT_BUTTON, self.on_download)
 		hbox_buttons.Add(self.btn_download, flag=wx.RIGHT, border=5)
 
+		self.btn_import = wx.Button(panel, label=_("Import Links..."))
+		self.btn_import.Bind(wx.EVT_BUTTON, self.on_import)
+		hbox_buttons.Add(self.btn_import, flag=wx.RIGHT, border=5)
+
+		self.btn_subscriptions = wx.Button(panel, label=_("Subscriptions..."))
+		self.btn_subscriptions.Bind(wx.EVT_BUTTON, self.on_subscriptions)
+		hbox_buttons.Add(self.btn_subscriptions, flag=wx.RIGHT, border=5)
+
 		self.btn_open_folder = wx.Button(panel, label=_("Open Download Folder"))
 		self.btn_open_folder.Bind(wx.EVT_BUTTON, self.on_open_folder)
 		hbox_buttons.Add(self.btn_open_folder)
@@ -121,10 +141,14 @@ class DownloaderDialog(wx.Dialog):
 		self.btn_clear_completed = wx.Button(panel, label=_("Clear Completed"))
 		self.btn_clear_completed.Bind(wx.EVT_BUTTON, self.on_clear_completed)
 
+		self.btn_retry_failed = wx.Button(panel, label=_("Retry Failed"))
+		self.btn_retry_failed.Bind(wx.EVT_BUTTON, self.on_retry_failed)
+
 		self.btn_stop_all = wx.Button(panel, label=_("Stop All"))
 		self.btn_stop_all.Bind(wx.EVT_BUTTON, self.on_stop_all)
 
 		hbox_batch.Add(self.btn_clear_completed, flag=wx.RIGHT, border=5)
+		hbox_batch.Add(self.btn_retry_failed, flag=wx.RIGHT, border=5)
 		hbox_batch.Add(self.btn_stop_all)
 
 		vbox.Add(hbox_batch, flag=wx.ALIGN_CENTER | wx.BOTTOM, border=10)
@@ -147,6 +171,8 @@ class DownloaderDialog(wx.Dialog):
 		self.list_map = []
 		self.refresh_list()
 		self.update_queue_status()
+		if url:
+			self.on_url_changed(None)
 
 	def get_selected_quality_key(self):
 		idx = self.choice_quality.GetSelection()
@@ -154,6 +180,7 @@ class DownloaderDialog(wx.Dialog):
 			return self.quality_keys[idx]
 		return "best"
 
+	@PROFILER.profiled("refresh_list")
 	def refresh_list(self):
 		self.list_downloads.DeleteAllItems()
 		self.list_map = []
@@ -170,19 +197,64 @@ class DownloaderDialog(wx.Dialog):
 		self.list_downloads.SetItem(idx, 1, "0%")
 		self.list_map.append(d_id)
 
+	@PROFILER.profiled("add_download_items")
+	def add_download_items(self, items):
+		# Saved downloads arrive after the dialog may already have listed some of them.
+		listed = set(self.list_map)
+		items = [(d_id, title, status) for d_id, title, status in items if d_id not in listed]
+		if not items:
+			return
+
+		self.list_downloads.Freeze()
+		try:
+			for d_id, title, status in items:
+				self.add_download_item(d_id, title, status)
+		finally:
+			self.list_downloads.Thaw()
+		self.update_button_states()
+		self.update_queue_status()
+
 	def remove_download_item(self, d_id):
-		if d_id in self.list_map:
-			idx = self.list_map.index(d_id)
-			self.list_downloads.DeleteItem(idx)
-			self.list_map.pop(idx)
-			self.update_button_states()
-			self.update_queue_status()
+		self.remove_download_items([d_id])
+
+	def remove_download_items(self, d_ids):
+		removed = set(d_ids)
+		indexes = [i for i, d_id in enumerate(self.list_map) if d_id in removed]
+		if not indexes:
+			return
 
+		self.list_downloads.Freeze()
+		try:
+			for idx in reversed(indexes):
+				self.list_downloads.DeleteItem(idx)
+		finally:
+			self.list_downloads.Thaw()
+		self.list_map = [d_id for d_id in self.list_map if d_id not in removed]
+		self.update_button_states()
+		self.update_queue_status()
+
+	@PROFILER.profiled("update_statuses")
+	def update_statuses(self, updates):
+		positions = {d_id: i for i, d_id in enumerate(self.list_map)}
+		self.list_downloads.Freeze()
+		try:
+			for d_id, status_text, percent in updates:
+				idx = positions.get(d_id)
+				if idx is not None:
+					self._apply_status(idx, status_text, percent)
+		finally:
+			self.list_downloads.Thaw()
+		self.update_queue_status()
+
+	@PROFILER.profiled("update_status")
 	def update_status(self, d_id, status_text, percent=None):
 		if d_id not in self.list_map:
 			return
 
-		idx = self.list_map.index(d_id)
+		self._apply_status(self.list_map.index(d_id), status_text, percent)
+		self.update_queue_status()
+
+	def _apply_status(self, idx, status_text, percent=None):
 		self.list_downloads.SetItemText(idx, status_text)
 
 		if percent is not None:
@@ -201,14 +273,24 @@ class DownloaderDialog(wx.Dialog):
 				self.gauge.SetValue(0)
 			self.update_button_states()
 
-		self.update_queue_status()
-
+	@PROFILER.profiled("update_queue_status")
 	def update_queue_status(self):
 		active = self.plugin.get_active_count()
 		queued = self.plugin.get_queued_count()
 		total = config.conf["tiktokDownloader"]["totalDownloads"]
 
 		status = _("Active: {} | Queued: {} | Total Downloaded: {}").format(active, queued, total)
+		expanding = self.plugin.get_expansion_count()
+		if expanding:
+			status += " | " + _("Adding from links: {}").format(expanding)
+		shrinking = self.plugin.get_transcode_count()
+		if shrinking:
+			status += " | " + _("Shrinking: {}").format(shrinking)
+		eta = self.plugin.get_queue_eta()
+		if eta["bytes_per_sec"] > 0 and (active or queued):
+			status += " | " + events.format_speed(eta["bytes_per_sec"])
+			if eta["eta_seconds"] is not None:
+				status += " | " + _("Queue ETA: {}").format(events.format_eta(eta["eta_seconds"]))
 		self.lbl_queue_status.SetLabel(status)
 
 	def on_list_selection(self, event):
@@ -296,6 +378,27 @@ class DownloaderDialog(wx.Dialog):
 			if not self.plugin.open_file_location(d_id):
 				wx.MessageBox(_("Could not find the file location."), _("Error"), wx.OK | wx.ICON_ERROR)
 
+	def on_import(self, event):
+		quality_key = self.get_selected_quality_key()
+		remove_watermark = self.chk_watermark.GetValue()
+		config.conf["tiktokDownloader"]["lastQuality"] = quality_key
+		config.conf["tiktokDownloader"]["removeWatermark"] = remove_watermark
+		dlg = ImportDialog(self, self.plugin, quality_key, remove_watermark)
+		dlg.ShowModal()
+		dlg.Destroy()
+		self.update_queue_status()
+
+	def on_subscriptions(self, event):
+		quality_key = self.get_selected_quality_key()
+		remove_watermark = self.chk_watermark.GetValue()
+		config.conf["tiktokDownloader"]["lastQuality"] = quality_key
+		config.conf["tiktokDownloader"]["removeWatermark"] = remove_watermark
+		self.subscriptions_dlg = SubscriptionsDialog(self, self.plugin, quality_key, remove_watermark)
+		self.subscriptions_dlg.ShowModal()
+		self.subscriptions_dlg.Destroy()
+		self.subscriptions_dlg = None
+		self.update_queue_status()
+
 	def on_open_folder(self, event):
 		download_path = config.conf["tiktokDownloader"]["downloadPath"]
 		if not download_path:
@@ -313,9 +416,18 @@ class DownloaderDialog(wx.Dialog):
 			ui.message(_("No completed downloads to clear."))
 		self.update_queue_status()
 
+	def on_retry_failed(self, event):
+		count = self.plugin.retry_failed()
+		if count > 0:
+			ui.message(_("Retrying {} failed downloads.").format(count))
+		else:
+			ui.message(_("No failed downloads to retry."))
+		self.update_button_states()
+		self.update_queue_status()
+
 	def on_stop_all(self, event):
 		self.plugin.stop_all_downloads()
-		ui.message(_("All downloads stopped."))
+		ui.message(_("Stopping all downloads."))
 		self.update_button_states()
 		self.update_queue_status()
 
@@ -325,7 +437,23 @@ class DownloaderDialog(wx.Dialog):
 		else:
 			event.Skip()
 
+	def on_url_changed(self, event):
+		# Debounced so typing a link does not start a yt-dlp run per keystroke.
+		if self._prefetch_timer:
+			self._prefetch_timer.Stop()
+		self._prefetch_timer = wx.CallLater(PREFETCH_DELAY_MS, self._prefetch_url)
+		if event:
+			event.Skip()
+
+	def _prefetch_url(self):
+		self._prefetch_timer = None
+		url = self.txt_url.GetValue().strip()
+		if self.is_valid_url(url):
+			self.plugin.prefetch_metadata(url)
+
 	def on_close(self, event):
+		if self._prefetch_timer:
+			self._prefetch_timer.Stop()
 		self.plugin.dlg = None
 		self.Destroy()
 
@@ -355,9 +483,257 @@ class DownloaderDialog(wx.Dialog):
 		config.conf["tiktokDownloader"]["lastQuality"] = quality_key
 		config.conf["tiktokDownloader"]["removeWatermark"] = remove_watermark
 
-		self.lbl_status.SetLabel(_("Starting download..."))
+		if urls.is_collection_url(url):
+			self.lbl_status.SetLabel(_("Adding the videos from this link to the queue..."))
+		else:
+			self.lbl_status.SetLabel(_("Starting download..."))
 
 		self.plugin.start_download(url, quality_key, remove_watermark=remove_watermark)
 
 		self.txt_url.SetValue("")
-		self.txt_url.SetFocus()
\ No newline at end of file
+		self.txt_url.SetFocus()
+
+
+class ImportDialog(wx.Dialog):
+	"""Queues every TikTok link in pasted text or a text/CSV file.
+
+	The import runs on a background thread through the manager's batched
+	import, so thousands of links neither block NVDA nor update the list one
+	by one. Links already in the list or downloaded before are skipped.
+	"""
+
+	def __init__(self, parent, plugin_instance, quality_key, remove_watermark):
+		super().__init__(parent, title=_("Import TikTok Links"), size=(550, 450))
+		self.plugin = plugin_instance
+		self.quality_key = quality_key
+		self.remove_watermark = remove_watermark
+		self.file_path = None
+		self._cancel = threading.Event()
+		self._running = False
+
+		panel = wx.Panel(self)
+		vbox = wx.BoxSizer(wx.VERTICAL)
+
+		lbl_links = wx.StaticText(panel, label=_("Paste TikTok links, one per line:"))
+		self.txt_links = wx.TextCtrl(panel, style=wx.TE_MULTILINE | wx.TE_DONTWRAP)
+		self.txt_links.SetName(_("TikTok links"))
+		vbox.Add(lbl_links, flag=wx.LEFT | wx.TOP, border=10)
+		vbox.Add(self.txt_links, proportion=1, flag=wx.EXPAND | wx.ALL, border=10)
+
+		hbox_file = wx.BoxSizer(wx.HORIZONTAL)
+		self.btn_file = wx.Button(panel, label=_("Import from File..."))
+		self.btn_file.Bind(wx.EVT_BUTTON, self.on_choose_file)
+		hbox_file.Add(self.btn_file, flag=wx.RIGHT, border=10)
+		self.lbl_file = wx.StaticText(panel, label="")
+		hbox_file.Add(self.lbl_file, flag=wx.ALIGN_CENTER_VERTICAL)
+		vbox.Add(hbox_file, flag=wx.LEFT | wx.RIGHT, border=10)
+
+		self.lbl_progress = wx.StaticText(panel, label="")
+		vbox.Add(self.lbl_progress, flag=wx.ALL, border=10)
+
+		hbox_buttons = wx.BoxSizer(wx.HORIZONTAL)
+		self.btn_start = wx.Button(panel, label=_("Import"))
+		self.btn_start.Bind(wx.EVT_BUTTON, self.on_start)
+		hbox_buttons.Add(self.btn_start, flag=wx.RIGHT, border=5)
+		self.btn_close = wx.Button(panel, id=wx.ID_CANCEL, label=_("Close"))
+		self.btn_close.Bind(wx.EVT_BUTTON, self.on_close)
+		hbox_buttons.Add(self.btn_close)
+		vbox.Add(hbox_buttons, flag=wx.ALIGN_CENTER | wx.BOTTOM, border=10)
+
+		panel.SetSizer(vbox)
+		self.Bind(wx.EVT_CLOSE, self.on_close)
+		self.txt_links.SetFocus()
+
+	def on_choose_file(self, event):
+		dlg = wx.FileDialog(
+			self,
+			_("Choose a File with TikTok Links"),
+			wildcard=_("Text and CSV files (*.txt;*.csv)|*.txt;*.csv|All files (*.*)|*.*"),
+			style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST,
+		)
+		if dlg.ShowModal() == wx.ID_OK:
+			self.file_path = dlg.GetPath()
+			self.lbl_file.SetLabel(os.path.basename(self.file_path))
+			self.start_import(self._read_file(self.file_path))
+		dlg.Destroy()
+
+	def on_start(self, event):
+		text = self.txt_links.GetValue()
+		if not text.strip():
+			wx.MessageBox(_("Paste some TikTok links or choose a file first."), _("Input Required"), wx.OK | wx.ICON_WARNING)
+			return
+		self.start_import(text.splitlines())
+
+	@staticmethod
+	def _read_file(path):
+		# A generator, so the file is read line by line on the import thread.
+		with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+			for line in f:
+				yield line
+
+	def start_import(self, lines):
+		if self._running:
+			return
+		self._running = True
+		self._cancel.clear()
+		self.btn_start.Enable(False)
+		self.btn_file.Enable(False)
+		self.lbl_progress.SetLabel(_("Importing..."))
+		threading.Thread(target=self._run_import, args=(lines,), daemon=True).start()
+
+	def _run_import(self, lines):
+		added = skipped = 0
+		error = None
+		try:
+			added, skipped = self.plugin.import_links(
+				urls.iter_urls(lines),
+				self.quality_key,
+				self.remove_watermark,
+				on_progress=self._on_progress,
+				should_stop=self._cancel.is_set,
+			)
+		except Exception as e:
+			error = e
+		latency.call_after(self._on_finished, added, skipped, error)
+
+	def _on_progress(self, added, skipped):
+		latency.call_after(self._show_progress, added, skipped)
+
+	def _show_progress(self, added, skipped):
+		if self._running and not self._cancel.is_set():
+			self.lbl_progress.SetLabel(_("{} links queued, {} skipped so far...").format(added, skipped))
+
+	def _on_finished(self, added, skipped, error):
+		# The dialog may already be closed and destroyed.
+		if self._cancel.is_set():
+			return
+		self._running = False
+		self.btn_start.Enable(True)
+		self.btn_file.Enable(True)
+		if error is not None:
+			message = _("Import failed: {}").format(error)
+		elif added or skipped:
+			message = _("{} links queued, {} skipped as duplicates or already downloaded.").format(added, skipped)
+		else:
+			message = _("No TikTok links found.")
+		self.lbl_progress.SetLabel(message)
+		ui.message(message)
+		if added:
+			self.txt_links.SetValue("")
+
+	def on_close(self, event):
+		# Closing stops the import after the current batch; links queued so far stay queued.
+		self._cancel.set()
+		self.EndModal(wx.ID_CANCEL)
+
+
+class SubscriptionsDialog(wx.Dialog):
+	"""Lists the subscribed profiles; new videos on them are queued on the schedule set in the settings."""
+
+	def __init__(self, parent, plugin_instance, quality_key, remove_watermark):
+		super().__init__(parent, title=_("TikTok Subscriptions"), size=(650, 420))
+		self.plugin = plugin_instance
+		self.quality_key = quality_key
+		self.remove_watermark = remove_watermark
+		self.sub_urls = []
+
+		panel = wx.Panel(self)
+		vbox = wx.BoxSizer(wx.VERTICAL)
+
+		lbl_list = wx.StaticText(panel, label=_("Subscribed profiles:"))
+		vbox.Add(lbl_list, flag=wx.LEFT | wx.TOP, border=10)
+
+		self.list_subs = wx.ListCtrl(panel, style=wx.LC_REPORT | wx.LC_SINGLE_SEL)
+		self.list_subs.SetName(_("Subscribed profiles"))
+		self.list_subs.InsertColumn(0, _("Profile"), width=300)
+		self.list_subs.InsertColumn(1, _("Last checked"), width=150)
+		self.list_subs.InsertColumn(2, _("Result"), width=170)
+		self.list_subs.Bind(wx.EVT_LIST_ITEM_SELECTED, self.on_selection)
+		self.list_subs.Bind(wx.EVT_LIST_ITEM_DESELECTED, self.on_selection)
+		vbox.Add(self.list_subs, proportion=1, flag=wx.EXPAND | wx.ALL, border=10)
+
+		hbox_buttons = wx.BoxSizer(wx.HORIZONTAL)
+		self.btn_add = wx.Button(panel, label=_("Add..."))
+		self.btn_add.Bind(wx.EVT_BUTTON, self.on_add)
+		hbox_buttons.Add(self.btn_add, flag=wx.RIGHT, border=5)
+		self.btn_remove = wx.Button(panel, label=_("Remove"))
+		self.btn_remove.Bind(wx.EVT_BUTTON, self.on_remove)
+		hbox_buttons.Add(self.btn_remove, flag=wx.RIGHT, border=5)
+		self.btn_check = wx.Button(panel, label=_("Check All Now"))
+		self.btn_check.Bind(wx.EVT_BUTTON, self.on_check)
+		hbox_buttons.Add(self.btn_check, flag=wx.RIGHT, border=5)
+		self.btn_close = wx.Button(panel, id=wx.ID_CANCEL, label=_("Close"))
+		self.btn_close.Bind(wx.EVT_BUTTON, self.on_close)
+		hbox_buttons.Add(self.btn_close)
+		vbox.Add(hbox_buttons, flag=wx.ALIGN_CENTER | wx.BOTTOM, border=10)
+
+		panel.SetSizer(vbox)
+		self.Bind(wx.EVT_CLOSE, self.on_close)
+		self.refresh()
+		self.list_subs.SetFocus()
+
+	def refresh(self):
+		selected = self.list_subs.GetFirstSelected()
+		selected_url = self.sub_urls[selected] if 0 <= selected < len(self.sub_urls) else None
+		subs = self.plugin.get_subscriptions()
+		self.list_subs.Freeze()
+		try:
+			self.list_subs.DeleteAllItems()
+			self.sub_urls = []
+			for sub in subs:
+				idx = self.list_subs.InsertItem(self.list_subs.GetItemCount(), sub.url)
+				if sub.last_sync:
+					checked = time.strftime("%Y-%m-%d %H:%M", time.localtime(sub.last_sync))
+				else:
+					checked = _("Not yet")
+				self.list_subs.SetItem(idx, 1, checked)
+				if sub.last_error:
+					result = _("Error: {}").format(sub.last_error)
+				elif sub.last_sync:
+					result = _("{} new videos").format(sub.last_new)
+				else:
+					result = ""
+				self.list_subs.SetItem(idx, 2, result)
+				self.sub_urls.append(sub.url)
+				if sub.url == selected_url:
+					self.list_subs.Select(idx)
+					self.list_subs.Focus(idx)
+		finally:
+			self.list_subs.Thaw()
+		self.on_selection(None)
+
+	def on_selection(self, event):
+		self.btn_remove.Enable(self.list_subs.GetFirstSelected() != -1)
+		self.btn_check.Enable(bool(self.sub_urls))
+
+	def on_add(self, event):
+		dlg = wx.TextEntryDialog(self, _("TikTok profile link, for example https://www.tiktok.com/@username:"), _("Add Subscription"))
+		url = dlg.GetValue().strip() if dlg.ShowModal() == wx.ID_OK else ""
+		dlg.Destroy()
+		if not url:
+			return
+		if urls.classify_url(url) != urls.KIND_PROFILE:
+			wx.MessageBox(_("Only TikTok profile links can be subscribed to."), _("Invalid URL"), wx.OK | wx.ICON_ERROR)
+			return
+		include_existing = wx.MessageBox(
+			_("Also download the videos already on this profile?\nOtherwise only videos posted from now on are downloaded."),
+			_("Add Subscription"),
+			wx.YES_NO | wx.NO_DEFAULT | wx.ICON_QUESTION,
+		) == wx.YES
+		if not self.plugin.add_subscription(url, self.quality_key, self.remove_watermark, include_existing):
+			wx.MessageBox(_("You are already subscribed to this profile."), _("Duplicate Subscription"), wx.OK | wx.ICON_WARNING)
+			return
+		self.refresh()
+
+	def on_remove(self, event):
+		idx = self.list_subs.GetFirstSelected()
+		if 0 <= idx < len(self.sub_urls):
+			self.plugin.remove_subscription(self.sub_urls[idx])
+			self.refresh()
+
+	def on_check(self, event):
+		self.plugin.sync_subscriptions()
+		ui.message(_("Checking subscriptions for new videos"))
+
+	def on_close(self, event):
+		self.EndModal(wx.ID_CANCEL)
@@ -1,6 +1,11 @@
 import os
+import shutil
 import subprocess
 import logging
+import tempfile
+
+from . import events
+from .constants import QUALITY_AUDIO
 
 try:
 	import ui
@@ -12,6 +17,26 @@ except ImportError:
 
 ADDON_DIR = os.path.dirname(os.path.abspath(__file__))
 BIN_DIR = os.path.join(ADDON_DIR, "bin")
+TEMP_DIR_NAME = ".ttdl-tmp"
+# Names the versioned yt-dlp binary that updater.py installed next to yt-dlp.exe.
+YT_DLP_POINTER = "yt-dlp.current"
+FILE_ATTRIBUTE_HIDDEN = 0x02
+
+PRIORITY_NORMAL = "normal"
+PRIORITY_BELOW_NORMAL = "below_normal"
+PRIORITY_IDLE = "idle"
+PRIORITY_LEVELS = [PRIORITY_NORMAL, PRIORITY_BELOW_NORMAL, PRIORITY_IDLE]
+
+# Windows priority classes. ffmpeg inherits the class of the yt-dlp process that starts it.
+_WINDOWS_PRIORITY_FLAGS = {
+	PRIORITY_BELOW_NORMAL: 0x00004000,
+	PRIORITY_IDLE: 0x00000040,
+}
+# Elsewhere: (nice increment, ionice arguments)
+_POSIX_PRIORITY = {
+	PRIORITY_BELOW_NORMAL: (10, ["-c", "2", "-n", "7"]),
+	PRIORITY_IDLE: (19, ["-c", "3"]),
+}
 
 
 def ensure_bin_dir():
@@ -36,6 +61,13 @@ def sanitize_filename(name):
 
 
 def get_yt_dlp_path():
+	try:
+		with open(os.path.join(BIN_DIR, YT_DLP_POINTER), "r", encoding="utf-8") as f:
+			name = os.path.basename(f.read().strip())
+		if name and os.path.exists(os.path.join(BIN_DIR, name)):
+			return os.path.join(BIN_DIR, name)
+	except OSError:
+		pass
 	return os.path.join(BIN_DIR, "yt-dlp.exe")
 
 
@@ -47,6 +79,74 @@ def get_ffprobe_path():
 	return os.path.join(BIN_DIR, "ffprobe.exe")
 
 
+def popen_kwargs(priority=PRIORITY_NORMAL):
+	if os.name != "nt":
+		return {}
+	startupinfo = subprocess.STARTUPINFO()
+	startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+	kwargs = {"startupinfo": startupinfo}
+	flags = _WINDOWS_PRIORITY_FLAGS.get(priority)
+	if flags:
+		kwargs["creationflags"] = flags
+	return kwargs
+
+
+def priority_prefix(priority):
+	# nice and ionice settings are inherited across exec, so they also cover ffmpeg.
+	if os.name == "nt" or priority not in _POSIX_PRIORITY:
+		return []
+	niceness, ionice_args = _POSIX_PRIORITY[priority]
+	prefix = []
+	ionice = shutil.which("ionice")
+	if ionice:
+		prefix += [ionice] + ionice_args
+	nice = shutil.which("nice")
+	if nice:
+		prefix += [nice, "-n", str(niceness)]
+	return prefix
+
+
+def parse_cpu_list(text):
+	"""Parses "0-3,6" into the sorted CPU indexes that exist on this machine."""
+	cpus = set()
+	count = os.cpu_count() or 1
+	for part in (text or "").replace(" ", "").split(","):
+		if not part:
+			continue
+		try:
+			if "-" in part:
+				start, end = part.split("-", 1)
+				cpus.update(range(int(start), int(end) + 1))
+			else:
+				cpus.add(int(part))
+		except ValueError:
+			logging.debug(f"Ignoring invalid CPU list entry: {part}")
+	return sorted(c for c in cpus if 0 <= c < count)
+
+
+def apply_affinity(process, cpus):
+	if not cpus:
+		return
+	try:
+		if os.name == "nt":
+			import ctypes
+			mask = 0
+			for cpu in cpus:
+				mask |= 1 << cpu
+			ctypes.windll.kernel32.SetProcessAffinityMask(int(process._handle), mask)
+		elif hasattr(os, "sched_setaffinity"):
+			os.sched_setaffinity(process.pid, cpus)
+	except Exception as e:
+		logging.debug(f"Failed to set CPU affinity: {e}")
+
+
+def start_process(cmd, priority=PRIORITY_NORMAL, cpus=None, **kwargs):
+	process = subprocess.Popen(priority_prefix(priority) + list(cmd), **popen_kwargs(priority), **kwargs)
+	# Set right after creation, before yt-dlp starts ffmpeg, so the children inherit it.
+	apply_affinity(process, cpus)
+	return process
+
+
 def check_dependencies(progress_hook=None):
 	ensure_bin_dir()
 	yt_dlp_path = get_yt_dlp_path()
@@ -70,61 +170,94 @@ def check_dependencies(progress_hook=None):
 	return yt_dlp_path, ffmpeg_path, ffprobe_path
 
 
-def cleanup_partial_files(output_path, title, filename=None):
-	if not output_path:
-		return
+def _system_temp_path():
+	return os.path.join(tempfile.gettempdir(), "nvda_tiktok_downloader")
 
-	if filename:
-		try:
-			if os.path.isabs(filename):
-				base_name = os.path.basename(filename)
-				dir_name = os.path.dirname(filename)
-				if dir_name and os.path.exists(dir_name):
-					output_path = dir_name
-				filename = base_name
-
-			base_without_ext = os.path.splitext(filename)[0]
-			candidates = [
-				filename,
-				filename + ".part",
-				filename + ".ytdl",
-				filename + ".temp",
-				base_without_ext + ".mp4.part",
-				base_without_ext + ".f0.mp4",
-				base_without_ext + ".f1.mp4",
-				base_without_ext + ".f2.mp4",
-			]
-
-			for cand in candidates:
-				full_path = os.path.join(output_path, cand)
-				if os.path.exists(full_path):
-					try:
-						os.remove(full_path)
-					except:
-						pass
-		except:
-			pass
 
-	if not title:
-		return
+def _same_volume(path_a, path_b):
+	try:
+		return os.stat(path_a).st_dev == os.stat(path_b).st_dev
+	except OSError:
+		return False
 
-	safe_title = "".join([c for c in title if c.isalnum() or c in " ._-"]).strip()
-	if not safe_title:
-		return
 
+def _hide_path(path):
+	if os.name != "nt":
+		return
 	try:
-		for file in os.listdir(output_path):
-			if safe_title.lower() in file.lower():
-				if file.endswith(".part") or file.endswith(".ytdl") or file.endswith(".temp"):
-					try:
-						os.remove(os.path.join(output_path, file))
-					except:
-						pass
-	except:
+		import ctypes
+		ctypes.windll.kernel32.SetFileAttributesW(path, FILE_ATTRIBUTE_HIDDEN)
+	except Exception:
 		pass
 
 
-def download_video_with_process(url, output_path, quality_str, progress_hook, remove_watermark=True):
+def get_temp_path(output_path):
+	# Partial files live on the destination volume so yt-dlp's final move is a rename, not a copy.
+	if output_path and os.path.isdir(output_path):
+		temp_path = os.path.join(output_path, TEMP_DIR_NAME)
+		try:
+			if not os.path.exists(temp_path):
+				os.makedirs(temp_path)
+				_hide_path(temp_path)
+			if os.access(temp_path, os.W_OK) and _same_volume(temp_path, output_path):
+				return temp_path
+		except OSError as e:
+			logging.debug(f"Cannot use {temp_path} as temp dir: {e}")
+
+	temp_path = _system_temp_path()
+	if not os.path.exists(temp_path):
+		try:
+			os.makedirs(temp_path)
+		except OSError:
+			pass
+	return temp_path
+
+
+def temp_file_variants(path):
+	base, ext = os.path.splitext(path)
+	return [
+		path,
+		path + ".part",
+		path + ".ytdl",
+		path + ".temp",
+		base + ".temp" + ext,
+	]
+
+
+def cleanup_job_files(paths, keep=None):
+	keep_set = set()
+	for k in keep or ():
+		if k:
+			keep_set.add(os.path.normcase(os.path.abspath(k)))
+
+	removed = 0
+	for path in paths or ():
+		if not path:
+			continue
+		for cand in temp_file_variants(path):
+			if os.path.normcase(os.path.abspath(cand)) in keep_set:
+				continue
+			try:
+				os.remove(cand)
+				removed += 1
+			except FileNotFoundError:
+				pass
+			except OSError as e:
+				logging.debug(f"Failed to remove partial file {cand}: {e}")
+	return removed
+
+
+def download_video_with_process(
+	url,
+	output_path,
+	quality_str,
+	progress_hook,
+	remove_watermark=True,
+	priority=PRIORITY_NORMAL,
+	cpus=None,
+	ffmpeg_threads=0,
+	info_json=None,
+):
 	yt_dlp_path, ffmpeg_path, ffprobe_path = check_dependencies(progress_hook)
 
 	if progress_hook:
@@ -142,12 +275,7 @@ def download_video_with_process(url, output_path, quality_str, progress_hook, re
 		except Exception as e:
 			logging.error(f"Failed to create output path: {e}")
 
-	temp_path = os.path.join(os.path.expanduser("~"), "AppData", "Local", "Temp", "nvda_tiktok_downloader")
-	if not os.path.exists(temp_path):
-		try:
-			os.makedirs(temp_path)
-		except:
-			pass
+	temp_path = get_temp_path(output_path)
 
 	cmd = [
 		yt_dlp_path,
@@ -161,31 +289,44 @@ def download_video_with_process(url, output_path, quality_str, progress_hook, re
 		"--no-check-certificates",
 		"--encoding", "utf-8",
 		"--no-colors",
-		"--progress-template", "download:NVDA_TTDL_PROGRESS:%(progress._percent_str)s|%(progress._total_bytes_str)s|%(progress._speed_str)s|%(progress._eta_str)s",
-		"--print", "after_move:NVDA_TTDL_FILEPATH:%(filepath)s",
+		"--progress",
+		"--progress-template", events.PROGRESS_TEMPLATE,
 	]
-
-	if remove_watermark:
-		cmd.extend(["--format", "bestvideo*+bestaudio/best"])
+	for template in events.PRINT_TEMPLATES:
+		cmd.extend(["--print", template])
+
+	if quality_str == QUALITY_AUDIO:
+		# The audio-only format when there is one, else the sound is taken out of the video.
+		# The default --audio-format best never encodes: an m4a or mp3 stays as it is and
+		# AAC in an MP4 is copied into an m4a.
+		cmd.extend(["--format", "bestaudio[ext=m4a]/bestaudio/best", "--extract-audio", "--audio-format", "best"])
 	else:
-		cmd.extend(["--format", "best"])
+		if remove_watermark:
+			cmd.extend(["--format", "bestvideo*+bestaudio/best"])
+		else:
+			cmd.extend(["--format", "best"])
 
-	cmd.extend(["--merge-output-format", "mp4"])
+		cmd.extend(["--merge-output-format", "mp4"])
 
-	if quality_str and quality_str != "best":
-		cmd.extend(["-S", f"res:{quality_str}"])
+		if quality_str and quality_str != "best":
+			cmd.extend(["-S", f"res:{quality_str}"])
 
-	cmd.append(url)
+	if ffmpeg_threads:
+		cmd.extend(["--postprocessor-args", f"ffmpeg:-threads {int(ffmpeg_threads)}"])
 
-	startupinfo = subprocess.STARTUPINFO()
-	startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+	# Metadata the prefetcher already extracted lets yt-dlp go straight to downloading.
+	if info_json and os.path.exists(info_json):
+		cmd.extend(["--load-info-json", info_json])
+	else:
+		cmd.append(url)
 
-	process = subprocess.Popen(
+	process = start_process(
 		cmd,
+		priority=priority,
+		cpus=cpus,
 		stdout=subprocess.PIPE,
 		stderr=subprocess.STDOUT,
 		text=True,
-		startupinfo=startupinfo,
 		encoding="utf-8",
 		errors="replace",
 	)
@@ -0,0 +1,209 @@
+import json
+from dataclasses import dataclass
+from typing import Optional, Any
+
+PREFIX = "NVDA_TTDL_"
+PROGRESS_TAG = "PROGRESS"
+INFO_TAG = "INFO"
+POSTPROCESS_TAG = "POSTPROCESS"
+FILEPATH_TAG = "FILEPATH"
+
+PROGRESS_TEMPLATE = (
+	"download:" + PREFIX + PROGRESS_TAG + ":"
+	"%(progress.{status,downloaded_bytes,total_bytes,total_bytes_estimate,speed,eta,filename,tmpfilename})j"
+)
+PRINT_TEMPLATES = [
+	"before_dl:" + PREFIX + INFO_TAG + ":%(.{id,title,ext,format_id,vcodec,filesize,filesize_approx})j",
+	"post_process:" + PREFIX + POSTPROCESS_TAG + ":%(filepath)j",
+	"after_move:" + PREFIX + FILEPATH_TAG + ":%(filepath)j",
+]
+
+
+@dataclass
+class ProgressEvent:
+	status: str
+	downloaded_bytes: Optional[int] = None
+	total_bytes: Optional[int] = None
+	speed: Optional[float] = None
+	eta: Optional[int] = None
+	filename: Optional[str] = None
+	tmpfilename: Optional[str] = None
+
+	@property
+	def percent(self) -> Optional[float]:
+		if self.status == "finished":
+			return 100.0
+		if self.downloaded_bytes is None or not self.total_bytes:
+			return None
+		return min(100.0, self.downloaded_bytes * 100.0 / self.total_bytes)
+
+
+@dataclass
+class InfoEvent:
+	video_id: Optional[str] = None
+	title: Optional[str] = None
+	ext: Optional[str] = None
+	format_id: Optional[str] = None
+	vcodec: Optional[str] = None
+	filesize: Optional[int] = None
+
+	@property
+	def format_count(self) -> int:
+		if not self.format_id:
+			return 1
+		return self.format_id.count("+") + 1
+
+	@property
+	def is_audio_only(self) -> bool:
+		# What yt-dlp picks for a photo-mode post, whose only format is its sound.
+		return self.vcodec == "none"
+
+
+@dataclass
+class FileEvent:
+	stage: str
+	path: str
+
+
+@dataclass
+class DestinationEvent:
+	path: str
+
+
+@dataclass
+class MergeEvent:
+	path: Optional[str] = None
+
+
+@dataclass
+class AlreadyDownloadedEvent:
+	pass
+
+
+@dataclass
+class LogEvent:
+	line: str
+
+
+def _int_or_none(value: Any) -> Optional[int]:
+	if value is None or isinstance(value, bool):
+		return None
+	try:
+		return int(value)
+	except (TypeError, ValueError):
+		return None
+
+
+def _float_or_none(value: Any) -> Optional[float]:
+	if value is None or isinstance(value, bool):
+		return None
+	try:
+		return float(value)
+	except (TypeError, ValueError):
+		return None
+
+
+def _load_json(payload: str) -> Any:
+	try:
+		return json.loads(payload)
+	except ValueError:
+		return None
+
+
+def _parse_progress(payload: str):
+	data = _load_json(payload)
+	if not isinstance(data, dict):
+		return LogEvent(PREFIX + PROGRESS_TAG + ":" + payload)
+	total = _int_or_none(data.get("total_bytes"))
+	if total is None:
+		total = _int_or_none(data.get("total_bytes_estimate"))
+	return ProgressEvent(
+		status=data.get("status") or "downloading",
+		downloaded_bytes=_int_or_none(data.get("downloaded_bytes")),
+		total_bytes=total,
+		speed=_float_or_none(data.get("speed")),
+		eta=_int_or_none(data.get("eta")),
+		filename=data.get("filename"),
+		tmpfilename=data.get("tmpfilename"),
+	)
+
+
+def _parse_info(payload: str):
+	data = _load_json(payload)
+	if not isinstance(data, dict):
+		return InfoEvent()
+	size = _int_or_none(data.get("filesize"))
+	if size is None:
+		size = _int_or_none(data.get("filesize_approx"))
+	return InfoEvent(
+		video_id=data.get("id"),
+		title=data.get("title"),
+		ext=data.get("ext"),
+		format_id=data.get("format_id"),
+		vcodec=data.get("vcodec"),
+		filesize=size,
+	)
+
+
+def _parse_path(stage: str, payload: str):
+	path = _load_json(payload)
+	if not isinstance(path, str):
+		path = payload.strip()
+	return FileEvent(stage=stage, path=path)
+
+
+def parse_line(line: str):
+	if not line:
+		return None
+
+	if line.startswith(PREFIX):
+		tag, sep, payload = line[len(PREFIX):].partition(":")
+		if sep:
+			if tag == PROGRESS_TAG:
+				return _parse_progress(payload)
+			if tag == INFO_TAG:
+				return _parse_info(payload)
+			if tag == POSTPROCESS_TAG:
+				return _parse_path("post_process", payload)
+			if tag == FILEPATH_TAG:
+				return _parse_path("after_move", payload)
+		return LogEvent(line)
+
+	if line.startswith("[download]"):
+		if "Destination:" in line:
+			return DestinationEvent(line.split("Destination:", 1)[1].strip())
+		if "has already been downloaded" in line:
+			return AlreadyDownloadedEvent()
+	elif line.startswith("[Merger]") or "Merging formats into" in line:
+		if "Merging formats into" in line:
+			return MergeEvent(line.split("Merging formats into", 1)[1].strip().strip('"'))
+		return MergeEvent()
+
+	return LogEvent(line)
+
+
+def format_size(num: Optional[float]) -> str:
+	if num is None:
+		return ""
+	for unit in ("B", "KiB", "MiB", "GiB"):
+		if abs(num) < 1024 or unit == "GiB":
+			return f"{num:.2f}{unit}" if unit != "B" else f"{int(num)}B"
+		num /= 1024.0
+	return ""
+
+
+def format_speed(bytes_per_sec: Optional[float]) -> str:
+	if not bytes_per_sec:
+		return ""
+	return format_size(bytes_per_sec) + "/s"
+
+
+def format_eta(seconds: Optional[float]) -> str:
+	if seconds is None or seconds < 0:
+		return ""
+	seconds = int(seconds)
+	hours, rem = divmod(seconds, 3600)
+	minutes, secs = divmod(rem, 60)
+	if hours:
+		return f"{hours}:{minutes:02d}:{secs:02d}"
+	return f"{minutes:02d}:{secs:02d}"
@@ -0,0 +1,191 @@
+import os
+import json
+import logging
+import subprocess
+import tempfile
+from dataclasses import dataclass
+from itertools import islice
+from typing import Optional, Dict, Any, List, Iterator
+
+from . import downloader
+
+# One JSON object per line, as titles may span lines. Some flat entries lack webpage_url; url is the fallback.
+ENTRY_TEMPLATE = "%(.{playlist_index,id,webpage_url,url,title})j"
+# About 70 entries. Windows pipes are this size already; Linux ones hold 64 KiB unless shrunk.
+PIPE_SIZE = 4096
+
+
+@dataclass
+class ListedVideo:
+	index: int
+	url: str
+	# From the listing when it has one, which saves the download a title lookup.
+	title: Optional[str] = None
+	video_id: Optional[str] = None
+
+
+@dataclass
+class ExpansionSource:
+	"""A profile, hashtag or sound link whose videos are still being queued.
+
+	next_index is the playlist position of the first entry not queued yet,
+	so a restarted expansion carries on from there instead of the top.
+	"""
+	url: str
+	quality_str: str
+	remove_watermark: bool = True
+	next_index: int = 1
+	queued: int = 0
+
+	def to_persist_dict(self) -> Dict[str, Any]:
+		return {
+			"url": self.url,
+			"quality_str": self.quality_str,
+			"remove_watermark": self.remove_watermark,
+			"next_index": self.next_index,
+			"queued": self.queued,
+		}
+
+	@staticmethod
+	def from_persist_dict(d: Dict[str, Any]) -> "ExpansionSource":
+		return ExpansionSource(
+			url=d["url"],
+			quality_str=d.get("quality_str", "best"),
+			remove_watermark=bool(d.get("remove_watermark", True)),
+			next_index=max(1, int(d.get("next_index", 1))),
+			queued=int(d.get("queued", 0)),
+		)
+
+
+class PlaylistExpander:
+	"""Lists the videos behind a profile, hashtag or sound link as they are needed.
+
+	One yt-dlp run with --flat-playlist --lazy-playlist prints an entry per
+	line as each page of the listing arrives. Nothing reads ahead: once the
+	pipe is full, yt-dlp blocks until next_page() asks for more, so a profile
+	with thousands of videos is never listed up front.
+	"""
+
+	def __init__(self, url: str, start: int = 1, priority: str = downloader.PRIORITY_IDLE):
+		self.url = url
+		self.error: Optional[str] = None
+		self.exhausted = False
+		self._start = max(1, start)
+		self._priority = priority
+		self._proc: Optional[subprocess.Popen] = None
+		self._stderr = None
+		self._closed = False
+		self._entries = self._iter_entries()
+
+	def next_page(self, size: int) -> List[ListedVideo]:
+		"""Returns up to size videos; an empty list once the listing is over."""
+		page = list(islice(self._entries, size))
+		if not page:
+			self.exhausted = True
+		return page
+
+	@property
+	def closed(self) -> bool:
+		return self._closed
+
+	def close(self):
+		self._closed = True
+		self._kill()
+		try:
+			# Runs _finish now rather than whenever the generator is collected.
+			self._entries.close()
+		except ValueError:
+			# next_page() is running on another thread; the killed listing ends it, and it finishes itself.
+			pass
+
+	def _kill(self):
+		proc = self._proc
+		if proc is not None and proc.poll() is None:
+			try:
+				proc.kill()
+			except Exception:
+				pass
+
+	def _iter_entries(self) -> Iterator[ListedVideo]:
+		cmd = [
+			downloader.get_yt_dlp_path(),
+			"--flat-playlist",
+			"--lazy-playlist",
+			"--no-warnings",
+			"--no-check-certificates",
+			"--encoding", "utf-8",
+			"-I", f"{self._start}:",
+			"--print", ENTRY_TEMPLATE,
+			self.url,
+		]
+		try:
+			# Nothing reads stderr while stdout is paged through, so it goes to a file rather than a pipe yt-dlp could fill and block on.
+			self._stderr = tempfile.TemporaryFile()
+			self._proc = downloader.start_process(
+				cmd,
+				self._priority,
+				stdout=subprocess.PIPE,
+				stderr=self._stderr,
+				stdin=subprocess.DEVNULL,
+				encoding="utf-8",
+				errors="replace",
+			)
+		except Exception as e:
+			self.error = str(e)
+			self._close_stderr()
+			return
+		_shrink_pipe(self._proc.stdout)
+
+		index = self._start - 1
+		complete = False
+		try:
+			for line in self._proc.stdout:
+				try:
+					entry = json.loads(line)
+				except ValueError:
+					continue
+				position = entry.get("playlist_index")
+				index = position if isinstance(position, int) else index + 1
+				url = entry.get("webpage_url") or entry.get("url")
+				if url:
+					video_id = entry.get("id")
+					yield ListedVideo(index, url, entry.get("title") or None, str(video_id) if video_id is not None else None)
+			complete = True
+		finally:
+			self._finish(complete)
+
+	def _finish(self, complete: bool):
+		proc = self._proc
+		if not complete:
+			# The generator was dropped part-way; yt-dlp would otherwise wait on the full pipe forever.
+			self._closed = True
+			self._kill()
+		try:
+			proc.wait()
+			self._stderr.seek(0)
+			err = self._stderr.read().decode("utf-8", "replace")
+		except Exception:
+			err = ""
+		self._close_stderr()
+		if proc.returncode and not self._closed:
+			lines = [line for line in err.splitlines() if line.strip()]
+			self.error = lines[-1] if lines else f"yt-dlp exited with code {proc.returncode}"
+			logging.error(f"Listing {self.url} failed: {self.error}")
+
+	def _close_stderr(self):
+		if self._stderr is not None:
+			try:
+				self._stderr.close()
+			except OSError:
+				pass
+			self._stderr = None
+
+
+def _shrink_pipe(stream):
+	if os.name == "nt":
+		return
+	try:
+		import fcntl
+		fcntl.fcntl(stream.fileno(), fcntl.F_SETPIPE_SZ, PIPE_SIZE)
+	except (ImportError, AttributeError, OSError):
+		pass
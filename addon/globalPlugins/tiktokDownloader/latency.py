@@ -0,0 +1,96 @@
+import logging
+import threading
+import time
+from typing import Optional, Callable, Dict, Any
+
+import wx
+
+from . import metrics
+
+DEFAULT_WARN_THRESHOLD = 0.15
+WARN_INTERVAL = 10.0
+
+
+def _callback_name(func: Callable) -> str:
+	name = getattr(func, "__qualname__", None) or getattr(func, "__name__", None)
+	return name or repr(func)
+
+
+class LatencyMonitor:
+	"""Measures work the add-on posts to NVDA's main thread.
+
+	Every call_after() records how long the callback waited in the wx queue
+	(a proxy for how busy the main thread is) and how long it then ran there.
+	"""
+
+	def __init__(self, warn_threshold: float = DEFAULT_WARN_THRESHOLD):
+		self.warn_threshold = warn_threshold
+		self._lock = threading.Lock()
+		self._last_warning = 0.0
+		self._suppressed = 0
+		self.reset()
+
+	def reset(self):
+		with self._lock:
+			self._delay = metrics.Histogram()
+			self._run = metrics.Histogram()
+			self._by_callback: Dict[str, Dict[str, metrics.Histogram]] = {}
+			self._over_threshold = 0
+
+	def call_after(self, func: Callable, *args, **kwargs):
+		posted = time.perf_counter()
+
+		def run():
+			started = time.perf_counter()
+			try:
+				return func(*args, **kwargs)
+			finally:
+				self.record(_callback_name(func), started - posted, time.perf_counter() - started)
+
+		wx.CallAfter(run)
+
+	def record(self, name: str, delay: float, duration: float):
+		with self._lock:
+			self._delay.add(delay)
+			self._run.add(duration)
+			hists = self._by_callback.get(name)
+			if hists is None:
+				hists = self._by_callback[name] = {"delay": metrics.Histogram(500), "run": metrics.Histogram(500)}
+			hists["delay"].add(delay)
+			hists["run"].add(duration)
+
+			threshold = self.warn_threshold
+			if not threshold or (delay < threshold and duration < threshold):
+				return
+			self._over_threshold += 1
+			now = time.monotonic()
+			if now - self._last_warning < WARN_INTERVAL:
+				self._suppressed += 1
+				return
+			self._last_warning = now
+			suppressed, self._suppressed = self._suppressed, 0
+
+		logging.warning(
+			f"TikTok Downloader main-thread latency: {name} waited {delay * 1000:.0f} ms and ran {duration * 1000:.0f} ms"
+			+ (f" ({suppressed} similar warnings suppressed)" if suppressed else "")
+		)
+
+	def summary(self) -> Dict[str, Any]:
+		with self._lock:
+			return {
+				"delay": self._delay.summary(),
+				"run": self._run.summary(),
+				"over_threshold": self._over_threshold,
+				"warn_threshold": self.warn_threshold,
+				"callbacks": {
+					name: {"delay": h["delay"].summary(), "run": h["run"].summary()}
+					for name, h in sorted(self._by_callback.items())
+				},
+			}
+
+
+MONITOR = LatencyMonitor()
+
+
+def call_after(func: Callable, *args, **kwargs):
+	MONITOR.call_after(func, *args, **kwargs)
@@ -0,0 +1,115 @@
+import time
+import logging
+from collections import deque, OrderedDict
+from typing import Optional, Callable, Tuple, Any
+
+MAX_NODES = 300
+SEARCH_BUDGET = 0.25
+MAX_CACHED_WINDOWS = 16
+
+
+def _child_at(node, index: int):
+	child = node.firstChild
+	for _ in range(index):
+		if child is None:
+			return None
+		child = child.next
+	return child
+
+
+class AddressBarLocator:
+	"""Finds a browser's address bar, remembering where it was per window.
+
+	The first lookup in a window is a breadth-first search that records the
+	path of child indexes leading to the match. The path is cached under the
+	window's (process id, window handle), and later lookups walk straight down
+	it and only confirm the result with is_candidate. A full search runs again
+	only when that walk no longer lands on a candidate.
+	"""
+
+	def __init__(
+		self,
+		is_candidate: Callable[[Any], bool],
+		is_match: Callable[[Any], bool],
+		max_nodes: int = MAX_NODES,
+		budget: float = SEARCH_BUDGET,
+		max_windows: int = MAX_CACHED_WINDOWS,
+	):
+		# is_candidate is the cheap structural check; is_match also decides whether a full search may stop.
+		self._is_candidate = is_candidate
+		self._is_match = is_match
+		self._max_nodes = max_nodes
+		self._budget = budget
+		self._max_windows = max_windows
+		self._paths: "OrderedDict[Tuple[int, int], Tuple[int, ...]]" = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+
+	@staticmethod
+	def _key(window) -> Optional[Tuple[int, int]]:
+		try:
+			return (window.processID, window.windowHandle)
+		except Exception:
+			return None
+
+	def find(self, window):
+		key = self._key(window)
+		path = self._paths.get(key) if key else None
+		if path is not None:
+			node = self._walk(window, path)
+			if node is not None:
+				self._paths.move_to_end(key)
+				self.hits += 1
+				return node
+			del self._paths[key]
+
+		self.misses += 1
+		found = self._search(window)
+		if found is None:
+			return None
+		node, path = found
+		if key:
+			self._paths[key] = path
+			while len(self._paths) > self._max_windows:
+				self._paths.popitem(last=False)
+		return node
+
+	def forget(self, window=None):
+		if window is None:
+			self._paths.clear()
+		else:
+			self._paths.pop(self._key(window), None)
+
+	def _walk(self, window, path: Tuple[int, ...]):
+		node = window
+		try:
+			for index in path:
+				node = _child_at(node, index)
+				if node is None:
+					return None
+			return node if self._is_candidate(node) else None
+		except Exception as e:
+			logging.debug(f"Cached address bar path failed: {type(e).__name__}: {e}")
+			return None
+
+	def _search(self, window):
+		start = time.monotonic()
+		queue = deque([(window, ())])
+		visited = 0
+		while queue and visited < self._max_nodes and (time.monotonic() - start) < self._budget:
+			node, path = queue.popleft()
+			visited += 1
+
+			if self._is_match(node):
+				return node, path
+
+			try:
+				child = node.firstChild
+				index = 0
+				while child:
+					queue.append((child, path + (index,)))
+					child = child.next
+					index += 1
+			except Exception:
+				pass
+		return None
@@ -1,17 +1,27 @@
 import os
 import time
 import json
+import shutil
 import logging
 import threading
 import subprocess
 from dataclasses import dataclass, field
-from collections import deque
+from collections import deque, OrderedDict
 from typing import Optional, Callable, Dict, Any, List, Tuple
 
 import addonHandler
 addonHandler.initTranslation()
 
 from . import downloader
+from . import events
+from . import expander
+from . import metrics
+from . import photo
+from . import prefetch
+from . import profiling
+from . import tracing
+from . import transcode
+from . import urls
 from .constants import (
 	STATUS_QUEUED,
 	STATUS_STARTING,
@@ -22,6 +32,9 @@ from .constants import (
 	STATUS_STOPPED,
 	STATUS_INTERRUPTED,
 	STATUS_RETRYING,
+	STATUS_STOPPING,
+	RETRYABLE_STATUSES,
+	QUALITY_AUDIO,
 	is_finished_status,
 	is_active_status,
 	guess_state_from_status_text,
@@ -32,15 +45,59 @@ try:
 except Exception:
 	config = None
 
+STOP_GRACE_SECONDS = 2.0
+STOP_POLL_INTERVAL = 0.05
+
+PHASE_RESOLVE = "resolve"
+PHASE_DOWNLOAD = "download"
+PHASE_MERGE = "merge"
+
+WATCHDOG_INTERVAL = 1.0
+# The title lookup and the prefetch wait give up by themselves after resolveTimeout; the
+# watchdog only flags a resolve step still running this much later.
+RESOLVE_GRACE = 5.0
+MIN_SPEED_WINDOW = 30.0
+
+TIMING_RECORD_LIMIT = 5000
+# Progress updates ask for a save each; they are written at most this often.
+SAVE_DELAY = 1.0
+IMPORT_BATCH_SIZE = 500
+# Profile, hashtag and sound links are listed this many videos at a time, whenever fewer
+# downloads than that are waiting, so the next page is ready before the slots run dry.
+EXPAND_PAGE_SIZE = 10
+
 
 def _default_download_path() -> str:
 	return os.path.join(os.path.expanduser("~"), "Downloads")
 
 
+def _conf_value(key: str, default: Any) -> Any:
+	try:
+		if config:
+			return config.conf["tiktokDownloader"][key]
+	except Exception:
+		pass
+	return default
+
+
 def _state_file_path() -> str:
 	return os.path.join(os.path.expanduser("~"), "nvda_tiktok_downloader_state.json")
 
 
+def _source_key(url: str) -> str:
+	# /@user and /@user/ list the same videos.
+	return urls.normalize_url(url).rstrip("/")
+
+
+def _is_unsupported(lines: List[str]) -> bool:
+	return any("Unsupported URL" in line for line in lines)
+
+
+def _history_file_path() -> str:
+	# Append-only, one normalized URL per completed download; the state file drops completed items.
+	return os.path.join(os.path.expanduser("~"), "nvda_tiktok_downloader_history.txt")
+
+
 @dataclass
 class DownloadItem:
 	id: int
@@ -55,16 +112,62 @@ class DownloadItem:
 
 	file_path: Optional[str] = None
 	current_filename: Optional[str] = None
+	temp_files: List[str] = field(default_factory=list)
 
 	retry_count: int = 0
+	priority: int = 0
+
+	timings: Dict[str, float] = field(default_factory=dict)
+	expected_size: Optional[int] = None
+	bytes_transferred: int = 0
+	peak_speed: float = 0.0
+	# Bytes the transcode profile took off the finished file.
+	bytes_saved: int = 0
 	manual_stop: bool = False
 	completed: bool = False
 
 	process: Optional[subprocess.Popen] = None
+	run_token: Optional[object] = None
+	phase: Optional[str] = None
+	phase_started: float = 0.0
+	last_progress_at: float = 0.0
+	bytes_done: int = 0
+	speed_window_started: float = 0.0
+	speed_window_bytes: int = 0
+	url_key: Optional[str] = None
+	stalled_phase: Optional[str] = None
 
 	created_at: float = field(default_factory=time.time)
 	updated_at: float = field(default_factory=time.time)
 
+	def dedupe_key(self) -> str:
+		# Normalizing parses the URL; each item does it once, not on every duplicate check.
+		if self.url_key is None:
+			self.url_key = urls.normalize_url(self.url)
+		return self.url_key
+
+	@property
+	def avg_speed(self) -> Optional[float]:
+		start = self.timings.get(metrics.TIMING_FIRST_BYTE)
+		end = self.timings.get(metrics.TIMING_DOWNLOAD_DONE)
+		if start is None or end is None or end <= start or not self.bytes_transferred:
+			return None
+		return self.bytes_transferred / (end - start)
+
+	def to_timing_record(self) -> Dict[str, Any]:
+		return {
+			"id": self.id,
+			"title": self.title,
+			"url": self.url,
+			"state": self.state,
+			"retry_count": self.retry_count,
+			"bytes_transferred": self.bytes_transferred,
+			"peak_speed": self.peak_speed,
+			"avg_speed": self.avg_speed,
+			"bytes_saved": self.bytes_saved,
+			"timings": dict(self.timings),
+		}
+
 	def to_public_dict(self) -> Dict[str, Any]:
 		return {
 			"title": self.title,
@@ -75,6 +178,8 @@ class DownloadItem:
 			"url": self.url,
 			"file_path": self.file_path,
 			"retry_count": self.retry_count,
+			"priority": self.priority,
+			"bytes_saved": self.bytes_saved,
 			"completed": self.completed,
 			"manual_stop": self.manual_stop,
 			"current_filename": self.current_filename,
@@ -98,7 +203,14 @@ class DownloadItem:
 			"progress": self.progress,
 			"file_path": self.file_path,
 			"current_filename": self.current_filename,
+			"temp_files": list(self.temp_files),
 			"retry_count": self.retry_count,
+			"priority": self.priority,
+			"timings": dict(self.timings),
+			"expected_size": self.expected_size,
+			"bytes_transferred": self.bytes_transferred,
+			"peak_speed": self.peak_speed,
+			"bytes_saved": self.bytes_saved,
 			"manual_stop": self.manual_stop,
 			"completed": self.completed,
 			"created_at": self.created_at,
@@ -119,7 +231,14 @@ class DownloadItem:
 		item.progress = d.get("progress")
 		item.file_path = d.get("file_path")
 		item.current_filename = d.get("current_filename")
+		item.temp_files = list(d.get("temp_files") or [])
 		item.retry_count = int(d.get("retry_count", 0))
+		item.priority = int(d.get("priority", 0))
+		item.timings = dict(d.get("timings") or {})
+		item.expected_size = d.get("expected_size")
+		item.bytes_transferred = int(d.get("bytes_transferred", 0))
+		item.peak_speed = float(d.get("peak_speed", 0.0))
+		item.bytes_saved = int(d.get("bytes_saved", 0))
 		item.manual_stop = bool(d.get("manual_stop", False))
 		item.completed = bool(d.get("completed", False))
 		item.created_at = float(d.get("created_at", time.time()))
@@ -136,12 +255,20 @@ class DownloadManager:
 		on_item_added: Optional[Callable[[int, Dict[str, Any]], None]] = None,
 		on_item_updated: Optional[Callable[[int, Dict[str, Any]], None]] = None,
 		on_item_removed: Optional[Callable[[int], None]] = None,
+		on_items_updated: Optional[Callable[[List[Tuple[int, Dict[str, Any]]]], None]] = None,
+		on_items_removed: Optional[Callable[[List[int]], None]] = None,
+		on_items_added: Optional[Callable[[List[Tuple[int, Dict[str, Any]]]], None]] = None,
 		on_queue_updated: Optional[Callable[[], None]] = None,
-		is_updating_callable: Optional[Callable[[], bool]] = None,
 		play_sound_callable: Optional[Callable[[bool], None]] = None,
+		launcher: Optional[Callable[..., Any]] = None,
+		recorder: Optional[tracing.TraceRecorder] = None,
+		restore_pending: bool = False,
+		prefetcher: Optional[Any] = None,
+		on_expansion_finished: Optional[Callable[[str, int, Optional[str]], None]] = None,
 	):
 		self.MAX_CONCURRENT = max(1, int(max_concurrent))
-		self._lock = threading.RLock()
+		self._lock = profiling.InstrumentedLock()
+		profiling.PROFILER.register_lock("DownloadManager._lock", self._lock)
 		self._queue = deque()
 		self._items: Dict[int, DownloadItem] = {}
 		self._next_id = 0
@@ -149,9 +276,50 @@ class DownloadManager:
 		self._on_item_added = on_item_added
 		self._on_item_updated = on_item_updated
 		self._on_item_removed = on_item_removed
+		self._on_items_updated = on_items_updated
+		self._on_items_removed = on_items_removed
+		self._on_items_added = on_items_added
 		self._on_queue_updated = on_queue_updated
-		self._is_updating = is_updating_callable or (lambda: False)
+		self._on_expansion_finished = on_expansion_finished
 		self._play_sound = play_sound_callable
+		# Starts a yt-dlp run; replaced by tracing.TraceReplayer.launcher when replaying traces.
+		self._launcher = launcher
+		self._recorder = recorder
+		# prefetch.MetadataPrefetcher, or None to always extract in the download itself.
+		self._prefetcher = prefetcher
+		# Set while load_state() has yet to run, so an early save cannot overwrite the saved downloads.
+		self._restore_pending = restore_pending
+
+		self._history: set = set()
+		self._history_lock = threading.Lock()
+		self._save_lock = threading.Lock()
+		self._save_timer: Optional[threading.Timer] = None
+
+		# Keyed by normalized link. The expanders are only touched by the one _expand_worker thread and cancel_expansions().
+		self._sources: "OrderedDict[str, expander.ExpansionSource]" = OrderedDict()
+		self._expanders: Dict[str, expander.PlaylistExpander] = {}
+		self._expanding = False
+		self._expansion_suspended = False
+
+		# Created with the first finished download that a transcode profile applies to.
+		self._transcoder: Optional[transcode.TranscodePool] = None
+
+		self._watchdog: Optional[threading.Thread] = None
+		self._metrics: Dict[str, int] = {
+			"stalls": 0,
+			f"stalls_{PHASE_RESOLVE}": 0,
+			f"stalls_{PHASE_DOWNLOAD}": 0,
+			f"stalls_{PHASE_MERGE}": 0,
+			"transcoded": 0,
+			"transcodes_kept": 0,
+			"transcode_errors": 0,
+			"bytes_saved": 0,
+		}
+		self._timing_histograms: Dict[str, metrics.Histogram] = {name: metrics.Histogram() for name in metrics.TIMING_SPANS}
+		self._timing_histograms["avg_speed"] = metrics.Histogram()
+		self._timing_records = deque(maxlen=TIMING_RECORD_LIMIT)
+		self._throughput = metrics.ThroughputMeter()
+		self._queue_estimator = metrics.QueueEstimator()
 
 	def iter_snapshot(self) -> List[Tuple[int, Dict[str, Any]]]:
 		with self._lock:
@@ -163,7 +331,8 @@ class DownloadManager:
 			return item.to_public_dict() if item else None
 
 	def get_active_count(self) -> int:
-		active_states = {STATUS_STARTING, STATUS_DOWNLOADING, STATUS_MERGING, STATUS_RETRYING}
+		# Retrying items wait in the queue without a worker, so they do not hold a slot.
+		active_states = {STATUS_STARTING, STATUS_DOWNLOADING, STATUS_MERGING, STATUS_STOPPING}
 		with self._lock:
 			return sum(1 for it in self._items.values() if it.state in active_states)
 
@@ -171,154 +340,572 @@ class DownloadManager:
 		with self._lock:
 			return len(self._queue)
 
+	def get_metrics(self) -> Dict[str, int]:
+		with self._lock:
+			return dict(self._metrics)
+
+	def get_timing_stats(self) -> Dict[str, Any]:
+		with self._lock:
+			stats = {name: hist.summary() for name, hist in self._timing_histograms.items()}
+			stats["downloads_recorded"] = len(self._timing_records)
+			stats["retries"] = sum(r.get("retry_count", 0) for r in self._timing_records)
+			return stats
+
+	def get_queue_eta(self) -> Dict[str, Any]:
+		with self._lock:
+			rate = self._throughput.rate(time.monotonic())
+			remaining = self._queue_estimator.bytes_remaining()
+			pending = self._queue_estimator.tracked_count
+			unknown = self._queue_estimator.unknown_count
+			has_estimate = unknown == 0 or self._queue_estimator.average_size is not None
+		eta = None
+		if pending and has_estimate and rate > 0:
+			eta = remaining / rate
+		return {
+			"bytes_per_sec": rate,
+			"bytes_remaining": remaining,
+			"pending": pending,
+			"unknown_sizes": unknown,
+			"eta_seconds": eta,
+		}
+
+	def set_recorder(self, recorder: Optional[tracing.TraceRecorder]):
+		with self._lock:
+			old, self._recorder = self._recorder, recorder
+		if old and old is not recorder:
+			old.close()
+
+	def get_timing_records(self) -> List[Dict[str, Any]]:
+		with self._lock:
+			return list(self._timing_records)
+
+	def export_metrics(self, path: str, extra: Optional[Dict[str, Any]] = None):
+		records = self.get_timing_records()
+		if path.lower().endswith(".csv"):
+			metrics.export_csv(path, records)
+			return
+		summary = {"timings": self.get_timing_stats(), "counters": self.get_metrics()}
+		if extra:
+			summary.update(extra)
+		metrics.export_json(path, summary, records)
+
 	def is_url_downloading(self, url: str) -> bool:
 		with self._lock:
 			for it in self._items.values():
 				if it.url == url and is_active_status(it.state) and not is_finished_status(it.state):
 					return True
-		return False
+			return _source_key(url) in self._sources
 
 	def start_download(self, url: str, quality_str: str, known_title: Optional[str] = None, remove_watermark: bool = True) -> int:
 		with self._lock:
-			d_id = self._next_id
-			self._next_id += 1
-
-			item = DownloadItem(
-				id=d_id,
-				url=url,
-				quality_str=quality_str,
-				remove_watermark=remove_watermark,
-			)
-			if known_title:
-				item.title = known_title
-			item.state = STATUS_QUEUED
-			item.statusText = STATUS_QUEUED
-			item.updated_at = time.time()
-
-			self._items[d_id] = item
-			self._queue.append(d_id)
+			item = self._add_item(url, quality_str, known_title, remove_watermark)
 
+		self._trace_add(item, known_title)
 		if self._on_item_added:
-			self._on_item_added(d_id, item.to_public_dict())
+			self._on_item_added(item.id, item.to_public_dict())
 		self._signal_queue_update()
 		self._process_queue()
-		return d_id
+		return item.id
 
-	def retry_download(self, d_id: int):
+	def start_downloads(
+		self,
+		url_list: List[str],
+		quality_str: str,
+		remove_watermark: bool = True,
+		skip_downloaded: bool = False,
+		titles: Optional[List[Optional[str]]] = None,
+	) -> Tuple[List[int], int]:
+		"""Queues many links at once, skipping any already in the list.
+
+		With skip_downloaded, links in the download history are skipped too.
+		titles, parallel to url_list, holds titles already known, as for known_title.
+		Returns the new ids and the number of links skipped as duplicates. The
+		new items are reported in one on_items_added batch.
+		"""
+		added: List[Tuple[DownloadItem, Optional[str]]] = []
+		skipped = 0
+		if skip_downloaded:
+			with self._history_lock:
+				history = set(self._history)
 		with self._lock:
-			item = self._items.get(d_id)
-			if not item:
-				return
-			item.retry_count = 0
-			item.manual_stop = False
-			item.completed = False
-			item.state = STATUS_QUEUED
-			item.statusText = f"{item.title} - {STATUS_QUEUED}"
-			item.progress = None
-			item.updated_at = time.time()
-			if d_id not in self._queue:
-				self._queue.append(d_id)
-
-		self._notify_item_updated(d_id)
+			known = {it.dedupe_key() for it in self._items.values() if it.url}
+			if skip_downloaded:
+				known |= history
+			for i, url in enumerate(url_list):
+				key = urls.normalize_url(url)
+				if key in known:
+					skipped += 1
+					continue
+				known.add(key)
+				title = titles[i] if titles else None
+				item = self._add_item(url, quality_str, title, remove_watermark)
+				item.url_key = key
+				added.append((item, title))
+			batch = [(item.id, item.to_public_dict()) for item, title in added]
+
+		if not added:
+			return [], skipped
+		for item, title in added:
+			self._trace_add(item, title)
+		self._notify_items_added(batch)
 		self._signal_queue_update()
 		self._process_queue()
+		return [item.id for item, title in added], skipped
 
-	def stop_download(self, d_id: int, download_path: str):
+	def import_urls(
+		self,
+		url_iter,
+		quality_str: str,
+		remove_watermark: bool = True,
+		batch_size: int = IMPORT_BATCH_SIZE,
+		on_progress: Optional[Callable[[int, int], None]] = None,
+		should_stop: Optional[Callable[[], bool]] = None,
+	) -> Tuple[int, int]:
+		"""Queues links from an iterable in batches, skipping duplicates and downloaded links.
+
+		Meant for a background thread: the iterable is consumed lazily, each
+		batch takes the lock once and is reported as one on_items_added call,
+		and the state is saved once at the end. on_progress(added, skipped) runs
+		after every batch. Returns the totals.
+		"""
+		added = skipped = 0
+		batch: List[str] = []
+
+		def flush():
+			nonlocal added, skipped
+			new_ids, batch_skipped = self.start_downloads(batch, quality_str, remove_watermark, skip_downloaded=True)
+			added += len(new_ids)
+			skipped += batch_skipped
+			batch.clear()
+			if on_progress:
+				try:
+					on_progress(added, skipped)
+				except Exception:
+					pass
+
+		for url in url_iter:
+			if should_stop and should_stop():
+				break
+			batch.append(url)
+			if len(batch) >= batch_size:
+				flush()
+		if batch:
+			flush()
+		if added:
+			self.save_state()
+		return added, skipped
+
+	def expand_url(self, url: str, quality_str: str, remove_watermark: bool = True) -> bool:
+		"""Queues the videos of a profile, hashtag or sound link, a page at a time as the queue drains.
+
+		Returns False if the link is already being expanded. The position
+		reached is saved with the state, so the listing resumes there after a
+		restart the next time downloads run.
+		"""
+		key = _source_key(url)
 		with self._lock:
-			item = self._items.get(d_id)
-			if not item:
-				return
+			if key in self._sources:
+				return False
+			self._sources[key] = expander.ExpansionSource(url=url, quality_str=quality_str, remove_watermark=remove_watermark)
+		self.schedule_save()
+		self._maybe_expand()
+		return True
+
+	def get_expansion_count(self) -> int:
+		with self._lock:
+			return len(self._sources)
+
+	def get_transcode_count(self) -> int:
+		pool = self._transcoder
+		return pool.pending_count() if pool else 0
+
+	def set_transcode_workers(self, workers: int):
+		pool = self._transcoder
+		if pool:
+			pool.set_workers(workers)
+
+	def _transcode_gate(self) -> bool:
+		# Transcodes wait for the queue to drain, so they never take CPU or disk from a download.
+		with self._lock:
+			if self._queue:
+				return False
+		return self.get_active_count() == 0
 
+	def _submit_transcode(self, d_id: int, path: Optional[str]):
+		profile = _conf_value("transcodeProfile", transcode.PROFILE_OFF)
+		if profile not in transcode.PROFILES or not path or not os.path.isfile(path):
+			return
+		if self._transcoder is None:
+			self._transcoder = transcode.TranscodePool(
+				workers=int(_conf_value("transcodeWorkers", 1) or 1),
+				gate=self._transcode_gate,
+				on_done=self._on_transcoded,
+			)
+		self._transcoder.submit(d_id, path, profile, threads=int(_conf_value("ffmpegThreads", 0) or 0))
+		self._signal_queue_update()
+
+	def _on_transcoded(self, result: transcode.TranscodeResult):
+		saved = result.saved
+		with self._lock:
+			if result.error:
+				self._metrics["transcode_errors"] += 1
+			elif saved:
+				self._metrics["transcoded"] += 1
+				self._metrics["bytes_saved"] += saved
+			else:
+				self._metrics["transcodes_kept"] += 1
+			item = self._items.get(result.job_id)
+			if item and saved and item.file_path == result.path:
+				item.bytes_saved += saved
+				saved_text = _("saved {size}").format(size=events.format_size(saved))
+				item.statusText = f"{item.title} - {STATUS_COMPLETED}, {saved_text}"
+				item.updated_at = time.time()
+				# The timing record was taken when the download finished, before the file was shrunk.
+				for record in self._timing_records:
+					if record.get("id") == item.id:
+						record["bytes_saved"] = item.bytes_saved
+			else:
+				item = None
+		if result.error:
+			logging.warning(f"Kept {result.path} as it was: {result.error}")
+		if saved:
 			try:
-				self._queue.remove(d_id)
-			except ValueError:
+				if config:
+					config.conf["tiktokDownloader"]["totalBytesSaved"] += saved
+			except Exception:
 				pass
+		if item is not None:
+			self._notify_item_updated(result.job_id)
+			self.schedule_save()
+		self._signal_queue_update()
 
-			item.manual_stop = True
+	def cancel_expansions(self):
+		with self._lock:
+			if not self._sources:
+				return
+			self._sources.clear()
+			running = list(self._expanders.values())
+			self._expanders.clear()
+		for exp in running:
+			exp.close()
+		self.schedule_save()
+
+	def _maybe_expand(self):
+		with self._lock:
+			if self._expanding or self._expansion_suspended or not self._sources or len(self._queue) >= EXPAND_PAGE_SIZE:
+				return
+			self._expanding = True
+		threading.Thread(target=self._expand_worker, name="TikTokExpander", daemon=True).start()
 
-			proc = item.process
+	def _expand_worker(self):
+		with profiling.PROFILER.thread_scope("expand_worker"):
+			while True:
+				with self._lock:
+					if self._expansion_suspended or not self._sources or len(self._queue) >= EXPAND_PAGE_SIZE:
+						self._expanding = False
+						return
+					key, source = next(iter(self._sources.items()))
+					exp = self._expanders.get(key)
+					if exp is None:
+						priority = _conf_value("processPriority", downloader.PRIORITY_BELOW_NORMAL)
+						exp = self._expanders[key] = expander.PlaylistExpander(source.url, start=source.next_index, priority=priority)
+				try:
+					self._expand_page(key, source, exp)
+				except Exception as e:
+					logging.error(f"Expanding {source.url} failed: {e}")
+					if not exp.closed:
+						exp.error = exp.error or str(e)
+						self._finish_expansion(key, source, exp)
+
+	def _expand_page(self, key: str, source: expander.ExpansionSource, exp: expander.PlaylistExpander):
+		# Blocks on yt-dlp while it fetches the next page of the listing, outside the lock.
+		page = exp.next_page(EXPAND_PAGE_SIZE)
+		new_ids: List[int] = []
+		if page:
+			new_ids = self.start_downloads(
+				[video.url for video in page],
+				source.quality_str,
+				source.remove_watermark,
+				skip_downloaded=True,
+				titles=[video.title for video in page],
+			)[0]
+		with self._lock:
+			if self._sources.get(key) is not source:
+				return
+			if page:
+				source.next_index = page[-1].index + 1
+				source.queued += len(new_ids)
+		# A closed expander was cancelled, or suspended for shutdown with its position kept.
+		if exp.exhausted and not exp.closed:
+			self._finish_expansion(key, source, exp)
+		else:
+			self.schedule_save()
 
-		if proc:
+	def _finish_expansion(self, key: str, source: expander.ExpansionSource, exp: expander.PlaylistExpander):
+		with self._lock:
+			if self._sources.get(key) is not source:
+				return
+			del self._sources[key]
+			self._expanders.pop(key, None)
+		exp.close()
+		self.schedule_save()
+		if self._on_expansion_finished:
 			try:
-				if proc.poll() is None:
-					proc.terminate()
-					try:
-						proc.wait(timeout=2)
-					except Exception:
-						proc.kill()
+				self._on_expansion_finished(source.url, source.queued, exp.error)
 			except Exception:
 				pass
 
-		temp_path = os.path.join(os.path.expanduser("~"), "AppData", "Local", "Temp", "nvda_tiktok_downloader")
+	def is_downloaded(self, url: str) -> bool:
+		with self._history_lock:
+			return urls.normalize_url(url) in self._history
+
+	def _add_to_history(self, url: str):
+		key = urls.normalize_url(url)
+		with self._history_lock:
+			if key in self._history:
+				return
+			self._history.add(key)
+			try:
+				with open(_history_file_path(), "a", encoding="utf-8") as f:
+					f.write(key + "\n")
+			except Exception as e:
+				logging.error(f"Failed to update download history: {e}")
+
+	def _load_history(self):
+		path = _history_file_path()
+		if not os.path.exists(path):
+			return
+		try:
+			with open(path, "r", encoding="utf-8") as f:
+				loaded = {line.strip() for line in f if line.strip()}
+		except Exception as e:
+			logging.error(f"Failed to load download history: {e}")
+			return
+		with self._history_lock:
+			self._history |= loaded
+
+	def _add_item(self, url: str, quality_str: str, known_title: Optional[str], remove_watermark: bool) -> DownloadItem:
+		d_id = self._next_id
+		self._next_id += 1
+
+		item = DownloadItem(
+			id=d_id,
+			url=url,
+			quality_str=quality_str,
+			remove_watermark=remove_watermark,
+		)
+		if known_title:
+			item.title = known_title
+		item.state = STATUS_QUEUED
+		item.statusText = STATUS_QUEUED
+		item.updated_at = time.time()
+
+		self._items[d_id] = item
+		self._enqueue(d_id)
+		return item
+
+	def _trace_add(self, item: DownloadItem, known_title: Optional[str]):
+		self._trace(tracing.KIND_ADD, item.id, {
+			"url": item.url,
+			"quality": item.quality_str,
+			"title": known_title,
+			"remove_watermark": item.remove_watermark,
+		})
+
+	def retry_download(self, d_id: int):
+		self.retry_many([d_id])
+
+	def retry_many(self, d_ids: List[int]) -> int:
+		retried = []
+		with self._lock:
+			queued = set(self._queue)
+			for d_id in d_ids:
+				item = self._items.get(d_id)
+				# A running or queued download already has a worker, and a completed one has its file.
+				if not item or item.state not in RETRYABLE_STATUSES or d_id in queued:
+					continue
+				item.retry_count = 0
+				item.manual_stop = False
+				item.completed = False
+				item.state = STATUS_QUEUED
+				item.statusText = f"{item.title} - {STATUS_QUEUED}"
+				item.progress = None
+				item.updated_at = time.time()
+				self._enqueue(d_id)
+				queued.add(d_id)
+				retried.append(d_id)
+
+		if not retried:
+			return 0
+
+		self._notify_items_updated(retried)
+		self._signal_queue_update()
+		self.save_state()
+		self._process_queue()
+		return len(retried)
+
+	def retry_failed(self) -> int:
+		with self._lock:
+			ids = [d_id for d_id, it in self._items.items() if it.state in (STATUS_ERROR, STATUS_INTERRUPTED)]
+		return self.retry_many(ids)
+
+	def set_priority_many(self, d_ids: List[int], priority: int):
+		updated = []
+		with self._lock:
+			for d_id in d_ids:
+				item = self._items.get(d_id)
+				if item and item.priority != priority:
+					item.priority = int(priority)
+					item.updated_at = time.time()
+					updated.append(d_id)
+			if updated:
+				self._queue = deque(sorted(self._queue, key=self._queue_sort_key))
+
+		if not updated:
+			return
+
+		self._notify_items_updated(updated)
+		self._signal_queue_update()
+		self.save_state()
+
+	def stop_download(self, d_id: int, download_path: str):
+		self.stop_many([d_id], download_path)
+
+	def stop_many(self, d_ids: List[int], download_path: str):
+		targets = []
+		with self._lock:
+			for d_id in d_ids:
+				item = self._items.get(d_id)
+				if not item or item.state == STATUS_STOPPING or is_finished_status(item.state):
+					continue
+
+				try:
+					self._queue.remove(d_id)
+				except ValueError:
+					pass
+
+				item.manual_stop = True
+				item.state = STATUS_STOPPING
+				item.statusText = f"{item.title} - {STATUS_STOPPING}..."
+				item.progress = None
+				item.updated_at = time.time()
+				targets.append((d_id, item, item.process))
+
+		if not targets:
+			return
+
+		self._notify_items_updated([t[0] for t in targets])
+		self._signal_queue_update()
+
+		threading.Thread(target=self._reap_stopped, args=(targets,), daemon=True).start()
+
+	def stop_all(self, download_path: str):
+		self.cancel_expansions()
+		with self._lock:
+			ids = [d_id for d_id, it in self._items.items() if not is_finished_status(it.state)]
+		self.stop_many(ids, download_path)
+
+	def _reap_stopped(self, targets: List[Tuple[int, DownloadItem, Optional[subprocess.Popen]]]):
+		pending = {}
+		for d_id, item, proc in targets:
+			if proc:
+				try:
+					if proc.poll() is None:
+						proc.terminate()
+				except Exception:
+					pass
+			pending[d_id] = (item, proc)
+
+		killed = False
+		deadline = time.monotonic() + STOP_GRACE_SECONDS
+		while pending:
+			for d_id, (item, proc) in list(pending.items()):
+				try:
+					alive = proc is not None and proc.poll() is None
+				except Exception:
+					alive = False
+				if not alive:
+					del pending[d_id]
+					self._finish_stop(d_id, item)
+
+			if not pending:
+				break
+
+			if time.monotonic() >= deadline:
+				if killed:
+					for d_id, (item, proc) in list(pending.items()):
+						logging.error(f"Download {d_id} did not exit after kill")
+						self._finish_stop(d_id, item)
+					break
+				for item, proc in pending.values():
+					try:
+						proc.kill()
+					except Exception:
+						pass
+				killed = True
+				deadline = time.monotonic() + STOP_GRACE_SECONDS
+
+			time.sleep(STOP_POLL_INTERVAL)
+
+		self._process_queue()
+
+	def _finish_stop(self, d_id: int, item: DownloadItem):
+		with self._lock:
+			temp_files = list(item.temp_files)
+			keep = [item.file_path]
+			item.temp_files = []
+
 		try:
-			downloader.cleanup_partial_files(download_path, item.title, item.current_filename)
-			downloader.cleanup_partial_files(temp_path, item.title, item.current_filename)
+			downloader.cleanup_job_files(temp_files, keep=keep)
 		except Exception:
 			pass
 
 		with self._lock:
-			item = self._items.get(d_id)
-			if not item:
+			self._queue_estimator.untrack(d_id)
+			if self._items.get(d_id) is not item:
 				return
 			item.state = STATUS_STOPPED
 			item.statusText = f"{item.title} - {STATUS_STOPPED}"
 			item.progress = None
+			item.process = None
 			item.updated_at = time.time()
 
 		self._notify_item_updated(d_id)
 		self._signal_queue_update()
-		self._process_queue()
-
-	def stop_all(self, download_path: str):
-		with self._lock:
-			ids = list(self._items.keys())
-		for d_id in ids:
-			snap = self.get_snapshot(d_id)
-			if not snap:
-				continue
-			state = snap.get("state") or guess_state_from_status_text(snap.get("status", ""))
-			if not is_finished_status(state):
-				self.stop_download(d_id, download_path)
 
 	def remove_download(self, d_id: int, download_path: str):
-		snap = self.get_snapshot(d_id)
-		if snap:
-			state = snap.get("state") or guess_state_from_status_text(snap.get("status", ""))
-			if is_active_status(state) and not is_finished_status(state):
-				self.stop_download(d_id, download_path)
+		self.remove_many([d_id], download_path)
 
+	def remove_many(self, d_ids: List[int], download_path: str) -> int:
 		with self._lock:
-			try:
-				self._queue.remove(d_id)
-			except ValueError:
-				pass
-
-			if d_id in self._items:
-				del self._items[d_id]
-
-		if self._on_item_removed:
-			self._on_item_removed(d_id)
-		self._signal_queue_update()
-		self.save_state()
+			to_stop = [
+				d_id for d_id in d_ids
+				if d_id in self._items and is_active_status(self._items[d_id].state) and not is_finished_status(self._items[d_id].state)
+			]
+		if to_stop:
+			self.stop_many(to_stop, download_path)
+		return self._remove_ids(d_ids)
 
 	def clear_completed(self) -> int:
-		to_remove = []
 		with self._lock:
-			for d_id, it in self._items.items():
-				if it.state == STATUS_COMPLETED:
-					to_remove.append(d_id)
+			to_remove = [d_id for d_id, it in self._items.items() if it.state == STATUS_COMPLETED]
+		return self._remove_ids(to_remove)
 
-		for d_id in to_remove:
-			with self._lock:
-				if d_id in self._items:
-					del self._items[d_id]
-			if self._on_item_removed:
-				self._on_item_removed(d_id)
+	def _remove_ids(self, d_ids: List[int]) -> int:
+		with self._lock:
+			removed = [d_id for d_id in d_ids if d_id in self._items]
+			if not removed:
+				return 0
+			removed_set = set(removed)
+			self._queue = deque(d_id for d_id in self._queue if d_id not in removed_set)
+			for d_id in removed:
+				del self._items[d_id]
+				self._queue_estimator.untrack(d_id)
 
-		if to_remove:
-			self._signal_queue_update()
-			self.save_state()
-		return len(to_remove)
+		self._notify_items_removed(removed)
+		self._signal_queue_update()
+		self.save_state()
+		return len(removed)
 
 	def open_file_location(self, d_id: int, download_path: str) -> bool:
 		snap = self.get_snapshot(d_id)
@@ -342,10 +929,31 @@ class DownloadManager:
 
 		return False
 
+	def schedule_save(self, delay: float = SAVE_DELAY):
+		"""Saves within delay seconds, folding any further requests until then into the same write."""
+		with self._save_lock:
+			if self._save_timer is not None:
+				return
+			timer = threading.Timer(delay, self._run_scheduled_save)
+			timer.daemon = True
+			self._save_timer = timer
+		timer.start()
+
+	def _run_scheduled_save(self):
+		with self._save_lock:
+			self._save_timer = None
+		self.save_state()
+
 	def save_state(self):
 		path = _state_file_path()
+		with self._save_lock:
+			if self._save_timer is not None:
+				self._save_timer.cancel()
+				self._save_timer = None
 
 		with self._lock:
+			if self._restore_pending:
+				return
 			downloads = {}
 			for d_id, it in self._items.items():
 				if it.state == STATUS_COMPLETED:
@@ -356,28 +964,67 @@ class DownloadManager:
 				"version": 2,
 				"next_download_id": self._next_id,
 				"downloads": downloads,
+				"expansions": [source.to_persist_dict() for source in self._sources.values()],
 			}
 
 		try:
 			with open(path, "w", encoding="utf-8") as f:
-				json.dump(payload, f, indent=4, ensure_ascii=False)
+				# dumps() uses the C encoder; dump() and indent fall back to the pure Python one.
+				f.write(json.dumps(payload, ensure_ascii=False))
 		except Exception as e:
 			logging.error(f"Failed to save state: {e}")
 
-	def load_state(self):
+	def load_state(self) -> List[int]:
+		"""Merges the saved downloads into the list and returns their ids.
+
+		Safe to run on a background thread after downloads have been added:
+		saved ids that are already taken get new ones.
+		"""
+		self._load_history()
+		try:
+			items, next_id, sources = self._read_state()
+		finally:
+			with self._lock:
+				self._restore_pending = False
+		if sources:
+			# Resumed by the next _process_queue() run, so a restart does not start downloading by itself.
+			with self._lock:
+				for source in sources:
+					self._sources.setdefault(_source_key(source.url), source)
+		if not items and next_id is None:
+			return []
+
+		with self._lock:
+			added: List[int] = []
+			base = max([self._next_id, next_id or 0] + [d_id + 1 for d_id in items])
+			for d_id, item in items.items():
+				if d_id in self._items:
+					d_id = base
+					base += 1
+					item.id = d_id
+				self._items[d_id] = item
+				added.append(d_id)
+			self._next_id = max([self._next_id, base] + [d_id + 1 for d_id in self._items])
+			batch = [(d_id, self._items[d_id].to_public_dict()) for d_id in added]
+
+		if batch:
+			self._notify_items_added(batch)
+		return added
+
+	def _read_state(self) -> Tuple[Dict[int, DownloadItem], Optional[int], List[expander.ExpansionSource]]:
 		path = _state_file_path()
 		if not os.path.exists(path):
-			return
+			return {}, None, []
 
 		try:
 			with open(path, "r", encoding="utf-8") as f:
 				loaded = json.load(f)
 		except Exception as e:
 			logging.error(f"Failed to load state: {e}")
-			return
+			return {}, None, []
 
 		if not loaded:
-			return
+			return {}, None, []
 
 		if isinstance(loaded, dict) and "downloads" not in loaded:
 			downloads_dict = loaded
@@ -425,23 +1072,44 @@ class DownloadManager:
 
 			items[d_id] = item
 
-		with self._lock:
-			self._items = items
-			if isinstance(next_id, int) and next_id > max_id:
-				self._next_id = next_id
-			else:
-				self._next_id = max_id + 1
+		if not isinstance(next_id, int) or next_id <= max_id:
+			next_id = max_id + 1
+		sources = []
+		if isinstance(loaded, dict) and "downloads" in loaded:
+			for d in loaded.get("expansions") or []:
+				try:
+					sources.append(expander.ExpansionSource.from_persist_dict(d))
+				except Exception:
+					continue
+		return items, next_id, sources
 
 	def mark_all_interrupted_and_terminate_processes(self):
+		if self._transcoder is not None:
+			self._transcoder.stop()
 		with self._lock:
+			# The sources stay, to be saved below with the position each listing reached.
+			self._expansion_suspended = True
+			running = list(self._expanders.values())
+			self._expanders.clear()
+		for exp in running:
+			exp.close()
+
+		with self._lock:
+			procs = [it.process for it in self._items.values() if it.process]
+			for proc in procs:
+				try:
+					proc.terminate()
+				except Exception:
+					pass
+
+			deadline = time.monotonic() + 1
+			for proc in procs:
+				try:
+					proc.wait(timeout=max(0.0, deadline - time.monotonic()))
+				except Exception:
+					pass
+
 			for it in self._items.values():
-				proc = it.process
-				if proc:
-					try:
-						proc.terminate()
-						proc.wait(timeout=1)
-					except Exception:
-						pass
 				it.process = None
 				if not is_finished_status(it.state):
 					it.state = STATUS_INTERRUPTED
@@ -458,21 +1126,253 @@ class DownloadManager:
 			except Exception:
 				pass
 
+	def _queue_sort_key(self, d_id: int) -> int:
+		item = self._items.get(d_id)
+		return -item.priority if item else 0
+
+	def _enqueue(self, d_id: int, retry: bool = False):
+		item = self._items[d_id]
+		if retry:
+			# The spans keep counting from the first time the download was queued.
+			item.timings.setdefault(metrics.TIMING_QUEUED, time.time())
+			item.timings[metrics.TIMING_RETRIED] = time.time()
+		else:
+			item.timings = {metrics.TIMING_QUEUED: time.time()}
+		self._queue_estimator.track(d_id, item.expected_size)
+		priority = item.priority
+		pos = len(self._queue)
+		while pos > 0:
+			prev = self._items.get(self._queue[pos - 1])
+			if prev is None or prev.priority >= priority:
+				break
+			pos -= 1
+		self._queue.insert(pos, d_id)
+
+	def _trace(self, kind: str, d_id: Optional[int], data: Any = None):
+		recorder = self._recorder
+		if recorder:
+			try:
+				recorder.record(kind, d_id, data)
+			except Exception:
+				pass
+
+	def _notify_items_updated(self, d_ids: List[int]):
+		if not self._on_items_updated:
+			for d_id in d_ids:
+				self._notify_item_updated(d_id)
+			return
+		with self._lock:
+			batch = [(d_id, self._items[d_id].to_public_dict()) for d_id in d_ids if d_id in self._items]
+		if not batch:
+			return
+		for d_id, data in batch:
+			self._trace(tracing.KIND_STATE, d_id, data["state"])
+		try:
+			self._on_items_updated(batch)
+		except Exception:
+			pass
+
+	def _notify_items_added(self, batch: List[Tuple[int, Dict[str, Any]]]):
+		if self._on_items_added:
+			try:
+				self._on_items_added(batch)
+			except Exception:
+				pass
+			return
+		if self._on_item_added:
+			for d_id, data in batch:
+				try:
+					self._on_item_added(d_id, data)
+				except Exception:
+					pass
+
+	def _notify_items_removed(self, d_ids: List[int]):
+		for d_id in d_ids:
+			self._trace(tracing.KIND_REMOVE, d_id)
+		if self._on_items_removed:
+			try:
+				self._on_items_removed(d_ids)
+			except Exception:
+				pass
+			return
+		if self._on_item_removed:
+			for d_id in d_ids:
+				self._on_item_removed(d_id)
+
 	def _notify_item_updated(self, d_id: int):
-		if not self._on_item_updated:
+		if not self._on_item_updated and not self._recorder:
 			return
 		snap = self.get_snapshot(d_id)
 		if snap is None:
 			return
+		self._trace(tracing.KIND_STATE, d_id, snap["state"])
+		if not self._on_item_updated:
+			return
 		try:
 			self._on_item_updated(d_id, snap)
 		except Exception:
 			pass
 
-	def _process_queue(self):
-		if self._is_updating():
+	def _record_temp_file(self, d_id: int, path: str, base_dir: str):
+		if not path:
 			return
+		if not os.path.isabs(path):
+			path = os.path.join(base_dir, path)
+		with self._lock:
+			item = self._items.get(d_id)
+			if item and path not in item.temp_files:
+				item.temp_files.append(path)
+
+	def _set_phase(self, d_id: int, phase: Optional[str], token: Optional[object] = None):
+		now = time.monotonic()
+		with self._lock:
+			item = self._items.get(d_id)
+			if not item:
+				return
+			if token is not None and item.run_token is not token:
+				return
+			item.phase = phase
+			item.phase_started = now
+			item.last_progress_at = now
+			item.speed_window_started = now
+			item.speed_window_bytes = item.bytes_done
+		if phase:
+			self._ensure_watchdog()
+
+	def _touch_progress(
+		self,
+		d_id: int,
+		downloaded_bytes: Optional[int] = None,
+		speed: Optional[float] = None,
+		total_bytes: Optional[int] = None,
+	):
+		now = time.monotonic()
+		with self._lock:
+			item = self._items.get(d_id)
+			if not item:
+				return
+			if speed and speed > item.peak_speed:
+				item.peak_speed = speed
+			if downloaded_bytes is None or downloaded_bytes != item.bytes_done:
+				item.last_progress_at = now
+			if downloaded_bytes is not None:
+				if downloaded_bytes < item.bytes_done:
+					item.speed_window_bytes = 0
+					self._throughput.add(downloaded_bytes, now)
+				else:
+					self._throughput.add(downloaded_bytes - item.bytes_done, now)
+				item.bytes_done = downloaded_bytes
+
+				remaining = None
+				if item.expected_size:
+					remaining = max(0, item.expected_size - item.bytes_transferred - downloaded_bytes)
+				elif total_bytes:
+					remaining = max(0, total_bytes - downloaded_bytes)
+				self._queue_estimator.track(d_id, remaining)
+
+	def _mark_timing(self, d_id: int, mark: str, overwrite: bool = True):
+		with self._lock:
+			item = self._items.get(d_id)
+			if item and (overwrite or mark not in item.timings):
+				item.timings[mark] = time.time()
+
+	def _add_transferred(self, d_id: int, num_bytes: Optional[int]):
+		if not num_bytes:
+			return
+		with self._lock:
+			item = self._items.get(d_id)
+			if item:
+				item.bytes_transferred += num_bytes
+
+	def _finish_timings(self, d_id: int):
+		with self._lock:
+			item = self._items.get(d_id)
+			if not item:
+				return
+			self._queue_estimator.untrack(d_id)
+			if item.state == STATUS_COMPLETED:
+				self._queue_estimator.observe_size(item.bytes_transferred)
+			for name, duration in metrics.span_durations(item.timings).items():
+				self._timing_histograms[name].add(duration)
+			if item.avg_speed:
+				self._timing_histograms["avg_speed"].add(item.avg_speed)
+			self._timing_records.append(item.to_timing_record())
+
+	def _record_stall(self, phase: str):
+		with self._lock:
+			self._metrics["stalls"] += 1
+			key = f"stalls_{phase}"
+			self._metrics[key] = self._metrics.get(key, 0) + 1
+
+	def _ensure_watchdog(self):
+		with self._lock:
+			if self._watchdog is not None:
+				return
+			self._watchdog = threading.Thread(target=self._watchdog_loop, daemon=True)
+			self._watchdog.start()
 
+	def _watchdog_loop(self):
+		while True:
+			time.sleep(WATCHDOG_INTERVAL)
+			with self._lock:
+				if not any(it.phase for it in self._items.values()):
+					self._watchdog = None
+					return
+			try:
+				self._check_stalls()
+			except Exception as e:
+				logging.error(f"Stall watchdog error: {e}")
+
+	def _check_stalls(self):
+		now = time.monotonic()
+		resolve_timeout = int(_conf_value("resolveTimeout", 30))
+		stall_timeout = int(_conf_value("stallTimeout", 60))
+		merge_timeout = int(_conf_value("mergeTimeout", 300))
+		min_speed = int(_conf_value("minSpeedKbps", 0)) * 1024
+
+		stalled = []
+		with self._lock:
+			for d_id, it in self._items.items():
+				proc = it.process
+				if it.manual_stop or it.stalled_phase or it.phase not in (PHASE_RESOLVE, PHASE_DOWNLOAD, PHASE_MERGE):
+					continue
+
+				reason = None
+				if it.phase == PHASE_RESOLVE:
+					# Resolving may wait on no process at all (a prefetch); the worker sees the flag when the wait ends.
+					if resolve_timeout > 0 and now - it.phase_started > resolve_timeout + RESOLVE_GRACE:
+						reason = f"resolve exceeded {resolve_timeout}s"
+				elif not proc:
+					continue
+				elif it.phase == PHASE_MERGE:
+					if merge_timeout > 0 and now - it.phase_started > merge_timeout:
+						reason = f"merge exceeded {merge_timeout}s"
+				elif stall_timeout > 0 and now - it.last_progress_at > stall_timeout:
+					reason = f"no progress for {stall_timeout}s"
+				elif min_speed > 0 and now - it.speed_window_started >= MIN_SPEED_WINDOW:
+					elapsed = now - it.speed_window_started
+					rate = (it.bytes_done - it.speed_window_bytes) / elapsed
+					if rate < min_speed:
+						reason = f"speed {int(rate)} B/s below floor"
+					else:
+						it.speed_window_started = now
+						it.speed_window_bytes = it.bytes_done
+
+				if reason:
+					it.stalled_phase = it.phase
+					stalled.append((d_id, it.phase, proc, reason))
+
+		for d_id, phase, proc, reason in stalled:
+			logging.warning(f"Download {d_id} stalled in {phase} phase: {reason}")
+			self._record_stall(phase)
+			if not proc:
+				continue
+			try:
+				proc.kill()
+			except Exception:
+				pass
+
+	def _process_queue(self):
 		while True:
 			with self._lock:
 				if self.get_active_count() >= self.MAX_CONCURRENT:
@@ -493,8 +1393,219 @@ class DownloadManager:
 			threading.Thread(target=self._download_worker, args=(d_id,), daemon=True).start()
 
 		self._signal_queue_update()
+		self._maybe_expand()
+		# Shrinking waits for the downloads to drain; start or resume it now rather than at its next poll.
+		if self._transcoder is not None and self._transcode_gate():
+			self._transcoder.wake()
 
 	def _download_worker(self, d_id: int):
+		with profiling.PROFILER.thread_scope("download_worker"):
+			self._run_download(d_id)
+
+	def _complete_download(self, d_id: int, url: str, resolved_path: Optional[str]):
+		with self._lock:
+			item = self._items.get(d_id)
+			if not item:
+				return
+			item.completed = True
+			item.timings[metrics.TIMING_FINALIZED] = time.time()
+			item.state = STATUS_COMPLETED
+			item.statusText = f"{item.title} - {STATUS_COMPLETED}"
+			item.progress = 100.0
+			item.file_path = resolved_path
+			item.temp_files = []
+			item.process = None
+			item.updated_at = time.time()
+
+		self._finish_timings(d_id)
+		self._add_to_history(url)
+		self._notify_item_updated(d_id)
+		self._submit_transcode(d_id, resolved_path)
+		self._signal_queue_update()
+
+		try:
+			if config:
+				config.conf["tiktokDownloader"]["totalDownloads"] += 1
+		except Exception:
+			pass
+
+		if self._play_sound:
+			try:
+				self._play_sound(True)
+			except Exception:
+				pass
+
+		self.save_state()
+		self._process_queue()
+
+	def _attach_process(self, d_id: int, proc) -> bool:
+		"""Makes proc the item's process, so stopping the item ends it; False, with proc ended, if it was stopped already."""
+		with self._lock:
+			item = self._items.get(d_id)
+			if item and not item.manual_stop:
+				item.process = proc
+				item.updated_at = time.time()
+				return True
+		try:
+			proc.terminate()
+		except Exception:
+			pass
+		return False
+
+	def _check_run_ended(self, d_id: int) -> bool:
+		"""True if the item was stopped or removed; raises if the watchdog killed it for stalling."""
+		with self._lock:
+			item = self._items.get(d_id)
+			if not item or item.manual_stop:
+				return True
+			stalled_phase = item.stalled_phase
+		if stalled_phase:
+			raise Exception(f"Download stalled during {stalled_phase} phase")
+		return False
+
+	def _run_photo_download(
+		self,
+		d_id: int,
+		url: str,
+		run_token: object,
+		quality_str: str,
+		download_path: str,
+		temp_path: str,
+		update: Callable[..., None],
+	) -> bool:
+		"""Downloads url as a photo-mode post; False if the page shows a regular video instead.
+
+		The images and sound are fetched in parallel into a work folder in
+		temp_path, which then becomes the post's folder in download_path, or
+		with photoSlideshow set is rendered into one MP4 by a single ffmpeg
+		run. The audio-only quality fetches just the sound. Failures raise,
+		so the usual retries apply.
+		"""
+		self._set_phase(d_id, PHASE_RESOLVE, run_token)
+		fetch = photo.PostFetch(url)
+		if not self._attach_process(d_id, fetch):
+			return True
+		post = fetch.run()
+		if self._check_run_ended(d_id):
+			return True
+		if post is None:
+			return False
+
+		with self._lock:
+			item = self._items.get(d_id)
+			if not item or item.manual_stop:
+				return True
+			if post.title and item.title in (None, "", _("Resolving..."), _("TikTok Video")):
+				item.title = post.title
+				item.updated_at = time.time()
+			title = item.title or _("TikTok Photos")
+		self._trace(tracing.KIND_TITLE, d_id, title)
+		display_title = title if len(title) <= 30 else title[:27] + "..."
+
+		audio_only = quality_str == QUALITY_AUDIO
+		if audio_only:
+			if not post.audio_url:
+				raise Exception("The photo post has no sound")
+			post.image_urls = []
+		slideshow = not audio_only and bool(_conf_value("photoSlideshow", False))
+		name = downloader.sanitize_filename(title)
+		post_key = post.post_id or str(d_id)
+		if not audio_only:
+			target, exists = photo.unique_path(download_path, name, post_key, ".mp4" if slideshow else "")
+			if exists:
+				self._complete_download(d_id, url, target)
+				return True
+
+		work_dir = os.path.join(temp_path, f"photo-{post.post_id or d_id}")
+		first_byte_seen = False
+
+		def on_progress(progress: photo.PhotoProgress):
+			nonlocal first_byte_seen
+			self._touch_progress(d_id, progress.done_bytes, None, progress.total_bytes)
+			if not first_byte_seen and progress.done_bytes:
+				first_byte_seen = True
+				self._mark_timing(d_id, metrics.TIMING_FIRST_BYTE, overwrite=False)
+			status_bits = [
+				_("{done} of {total} files").format(done=progress.files_done, total=progress.files_total),
+				f"{progress.percent:.1f}%",
+			]
+			if progress.done_bytes:
+				status_bits.append(events.format_size(progress.done_bytes))
+			update(f"{display_title} - " + " | ".join(status_bits), progress.percent, state=STATUS_DOWNLOADING)
+
+		try:
+			job = photo.PhotoDownload(post, work_dir, on_progress=on_progress)
+			if not self._attach_process(d_id, job):
+				return True
+			self._set_phase(d_id, PHASE_DOWNLOAD, run_token)
+			self._mark_timing(d_id, metrics.TIMING_SPAWNED)
+			job.run()
+			self._add_transferred(d_id, job.transferred)
+			if self._check_run_ended(d_id):
+				return True
+			if job.returncode != 0:
+				raise Exception(f"Photo download failed: {job.error}")
+			self._mark_timing(d_id, metrics.TIMING_DOWNLOAD_DONE)
+
+			if audio_only:
+				# The sound's extension is known once it is fetched.
+				target, exists = photo.unique_path(download_path, name, post_key, os.path.splitext(job.audio_path)[1])
+				if not exists:
+					shutil.move(job.audio_path, target)
+			elif not slideshow:
+				# A rename, unless the temp folder had to go on another drive.
+				shutil.move(work_dir, target)
+			else:
+				self._render_slideshow(d_id, run_token, job, os.path.join(work_dir, "slideshow.mp4"), display_title, update)
+				if self._check_run_ended(d_id):
+					return True
+				shutil.move(os.path.join(work_dir, "slideshow.mp4"), target)
+				self._mark_timing(d_id, metrics.TIMING_MERGE_DONE)
+		finally:
+			photo.remove_work_dir(work_dir)
+
+		self._complete_download(d_id, url, target)
+		return True
+
+	def _render_slideshow(
+		self,
+		d_id: int,
+		run_token: object,
+		job: "photo.PhotoDownload",
+		output: str,
+		display_title: str,
+		update: Callable[..., None],
+	):
+		self._set_phase(d_id, PHASE_MERGE, run_token)
+		rendering = _("Rendering slideshow")
+		update(f"{display_title} - {rendering}...", None, state=STATUS_MERGING)
+		proc = photo.start_slideshow(
+			job.image_paths,
+			job.audio_path,
+			output,
+			priority=_conf_value("processPriority", downloader.PRIORITY_BELOW_NORMAL),
+			cpus=downloader.parse_cpu_list(_conf_value("cpuAffinity", "")),
+			threads=int(_conf_value("ffmpegThreads", 0) or 0),
+		)
+		if not self._attach_process(d_id, proc):
+			proc.wait()
+			return
+
+		duration = photo.slideshow_duration(len(job.image_paths))
+		errors: List[str] = []
+		for line in proc.stdout:
+			seconds = photo.parse_render_progress(line)
+			if seconds is None:
+				if "=" not in line and line.strip():
+					errors.append(line.strip())
+				continue
+			percent = min(100.0, seconds * 100.0 / duration)
+			update(f"{display_title} - {rendering} {percent:.0f}%", percent, state=STATUS_MERGING)
+		proc.wait()
+		if proc.returncode and not self._check_run_ended(d_id):
+			raise Exception(f"Rendering the slideshow failed. Exit code: {proc.returncode}\n" + "\n".join(errors[-8:]))
+
+	def _run_download(self, d_id: int):
 		last_ui_time = 0.0
 		last_ui_percent = -1
 
@@ -505,7 +1616,7 @@ class DownloadManager:
 			if percent is None:
 				with self._lock:
 					it = self._items.get(d_id)
-					if not it:
+					if not it or it.manual_stop:
 						return
 					if state:
 						it.state = state
@@ -524,7 +1635,7 @@ class DownloadManager:
 
 			with self._lock:
 				it = self._items.get(d_id)
-				if not it:
+				if not it or it.manual_stop:
 					return
 				if state:
 					it.state = state
@@ -544,35 +1655,69 @@ class DownloadManager:
 
 		title = None
 		final_filepath = ""
+		processed_filepath = ""
+		current_filename = None
+		format_count = 1
+		finished_formats = 0
 		download_success = False
 		last_lines: List[str] = []
+		run_token = object()
+		prefetched = None
+		slideshow_detected = False
 
 		try:
 			with self._lock:
 				item = self._items.get(d_id)
 				if not item:
 					return
+				item.run_token = run_token
+				item.stalled_phase = None
+				item.bytes_done = 0
+				item.bytes_transferred = 0
+				item.peak_speed = 0.0
+				item.timings = {k: v for k, v in item.timings.items() if k in (metrics.TIMING_QUEUED, metrics.TIMING_RETRIED)}
 				need_title = (not item.title) or (item.title == _("Resolving..."))
 
-			if need_title:
+			priority = _conf_value("processPriority", downloader.PRIORITY_BELOW_NORMAL)
+			resolve_timeout = int(_conf_value("resolveTimeout", 30)) or None
+
+			if self._prefetcher is not None:
+				self._set_phase(d_id, PHASE_RESOLVE, run_token)
+				# Without a timeout the wait still has to cover a running lookup, or a second one starts beside it.
+				prefetched = self._prefetcher.take(url, wait=resolve_timeout or prefetch.FETCH_TIMEOUT)
+				if prefetched and prefetched.title and need_title:
+					need_title = False
+					with self._lock:
+						item = self._items.get(d_id)
+						if item:
+							item.title = prefetched.title
+							item.updated_at = time.time()
+					self._trace(tracing.KIND_TITLE, d_id, prefetched.title)
+
+			# yt-dlp cannot read photo pages; the photo download takes the title from the page instead.
+			is_photo = urls.classify_url(url) == urls.KIND_PHOTO
+			if need_title and not is_photo:
+				self._set_phase(d_id, PHASE_RESOLVE, run_token)
 				try:
 					yt_dlp_path = downloader.get_yt_dlp_path()
-					startupinfo = subprocess.STARTUPINFO()
-					startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
 					result = subprocess.run(
-						[yt_dlp_path, "--get-title", "--skip-download", "--no-warnings", url],
+						downloader.priority_prefix(priority) + [yt_dlp_path, "--get-title", "--skip-download", "--no-warnings", url],
 						capture_output=True,
 						text=True,
-						startupinfo=startupinfo,
 						check=False,
-						timeout=30,
+						timeout=resolve_timeout,
 						encoding="utf-8",
 						errors="replace",
+						**downloader.popen_kwargs(priority),
 					)
 					if result.returncode == 0 and result.stdout.strip():
 						title = result.stdout.strip()
 					else:
 						title = _("TikTok Video")
+				except subprocess.TimeoutExpired:
+					logging.warning(f"Download {d_id} stalled in {PHASE_RESOLVE} phase: title lookup exceeded {resolve_timeout}s")
+					self._record_stall(PHASE_RESOLVE)
+					title = _("TikTok Video")
 				except Exception:
 					title = _("TikTok Video")
 
@@ -581,12 +1726,14 @@ class DownloadManager:
 					if item:
 						item.title = title
 						item.updated_at = time.time()
+				self._trace(tracing.KIND_TITLE, d_id, title)
 
 			with self._lock:
 				item = self._items.get(d_id)
 				if not item:
 					return
 				title = item.title or _("TikTok Video")
+			self._mark_timing(d_id, metrics.TIMING_TITLE_RESOLVED)
 
 			display_title = title if len(title) <= 30 else title[:27] + "..."
 
@@ -608,20 +1755,39 @@ class DownloadManager:
 					download_path = _default_download_path()
 					os.makedirs(download_path, exist_ok=True)
 
+			temp_path = downloader.get_temp_path(download_path)
+
+			if self._check_run_ended(d_id):
+				return
+			fetch_url = url
+			if is_photo:
+				if self._run_photo_download(d_id, url, run_token, quality_str, download_path, temp_path, throttled_update):
+					return
+				# The page holds a regular video; yt-dlp has no extractor for the /photo/ form of its link.
+				fetch_url = urls.as_video_url(url)
+
 			def progress_hook(text: str):
 				throttled_update(f"{display_title} - {text}", None)
 
-			proc = downloader.download_video_with_process(
-				url=url,
+			launcher = self._launcher or downloader.download_video_with_process
+			proc = launcher(
+				url=fetch_url,
 				output_path=download_path,
 				quality_str=quality_str,
 				progress_hook=progress_hook,
 				remove_watermark=remove_watermark,
+				priority=priority,
+				cpus=downloader.parse_cpu_list(_conf_value("cpuAffinity", "")),
+				ffmpeg_threads=int(_conf_value("ffmpegThreads", 0) or 0),
+				info_json=prefetched.path if prefetched else None,
 			)
+			recorder = self._recorder
+			if recorder:
+				proc = recorder.wrap_process(d_id, proc)
 
 			with self._lock:
 				item = self._items.get(d_id)
-				if not item:
+				if not item or item.manual_stop:
 					try:
 						proc.terminate()
 					except Exception:
@@ -630,7 +1796,12 @@ class DownloadManager:
 				item.process = proc
 				item.updated_at = time.time()
 
+			self._set_phase(d_id, PHASE_DOWNLOAD, run_token)
+			self._mark_timing(d_id, metrics.TIMING_SPAWNED)
+			first_byte_seen = False
+
 			for raw_line in proc.stdout:
+				profiling.PROFILER.checkpoint()
 				with self._lock:
 					item = self._items.get(d_id)
 					if not item:
@@ -646,53 +1817,95 @@ class DownloadManager:
 				if len(last_lines) > 30:
 					last_lines.pop(0)
 
-				if line.startswith("NVDA_TTDL_FILEPATH:"):
-					final_filepath = line.split("NVDA_TTDL_FILEPATH:", 1)[1].strip()
-					continue
+				event = events.parse_line(line)
+
+				if isinstance(event, events.ProgressEvent):
+					self._touch_progress(d_id, event.downloaded_bytes, event.speed, event.total_bytes)
+					if not first_byte_seen and event.downloaded_bytes:
+						first_byte_seen = True
+						self._mark_timing(d_id, metrics.TIMING_FIRST_BYTE, overwrite=False)
+					if event.filename and event.filename != current_filename:
+						current_filename = event.filename
+						with self._lock:
+							item = self._items.get(d_id)
+							if item:
+								item.current_filename = current_filename
+						self._record_temp_file(d_id, current_filename, temp_path)
+					if event.tmpfilename and event.tmpfilename != current_filename:
+						self._record_temp_file(d_id, event.tmpfilename, temp_path)
+
+					if event.status == "finished":
+						finished_formats += 1
+						self._add_transferred(d_id, event.downloaded_bytes or event.total_bytes)
+						if finished_formats >= format_count:
+							self._mark_timing(d_id, metrics.TIMING_DOWNLOAD_DONE)
+						if format_count > 1 and finished_formats >= format_count:
+							self._set_phase(d_id, PHASE_MERGE, run_token)
+							throttled_update(f"{display_title} - {STATUS_MERGING}...", None, state=STATUS_MERGING)
+						continue
 
-				if line.startswith("NVDA_TTDL_PROGRESS:"):
-					payload = line.split("NVDA_TTDL_PROGRESS:", 1)[1].strip()
-					parts = payload.split("|")
-					if parts:
-						pct_str = (parts[0] or "").replace("%", "").strip()
-						try:
-							pct = float(pct_str)
-						except Exception:
-							pct = None
-
-						if pct is not None:
-							total = parts[1].strip() if len(parts) > 1 else ""
-							speed = parts[2].strip() if len(parts) > 2 else ""
-							eta = parts[3].strip() if len(parts) > 3 else ""
-
-							status_bits = [f"{pct:.1f}%"]
-							if total and total != "~":
-								status_bits.append(total)
-							if speed and speed.lower() != "unknown":
-								status_bits.append(speed)
-							if eta and eta.lower() != "unknown":
-								status_bits.append(f"ETA: {eta}")
-
-							throttled_update(f"{display_title} - " + " | ".join(status_bits), pct, state=STATUS_DOWNLOADING)
+					pct = event.percent
+					if pct is not None:
+						status_bits = [f"{pct:.1f}%"]
+						if event.total_bytes:
+							status_bits.append(events.format_size(event.total_bytes))
+						if event.speed:
+							status_bits.append(events.format_speed(event.speed))
+						if event.eta is not None:
+							status_bits.append(f"ETA: {events.format_eta(event.eta)}")
+
+						throttled_update(f"{display_title} - " + " | ".join(status_bits), pct, state=STATUS_DOWNLOADING)
 					continue
 
-				if "[download]" in line:
-					if "Destination:" in line:
+				if isinstance(event, events.InfoEvent):
+					if event.is_audio_only and quality_str != QUALITY_AUDIO:
+						slideshow_detected = True
 						try:
-							current_filename = line.split("Destination:", 1)[1].strip()
-							with self._lock:
-								item = self._items.get(d_id)
-								if item:
-									item.current_filename = current_filename
+							proc.kill()
 						except Exception:
 							pass
-						continue
+						break
+					format_count = event.format_count
+					if event.filesize:
+						with self._lock:
+							item = self._items.get(d_id)
+							if item:
+								item.expected_size = event.filesize
+					continue
 
-					if "has already been downloaded" in line:
-						download_success = True
-						continue
+				if isinstance(event, events.FileEvent):
+					if event.stage == "after_move":
+						final_filepath = event.path
+						with self._lock:
+							item = self._items.get(d_id)
+							if item:
+								item.file_path = final_filepath
+					else:
+						processed_filepath = event.path
+						self._mark_timing(d_id, metrics.TIMING_DOWNLOAD_DONE, overwrite=False)
+						if format_count > 1:
+							self._mark_timing(d_id, metrics.TIMING_MERGE_DONE)
+						self._record_temp_file(d_id, processed_filepath, temp_path)
+					continue
+
+				if isinstance(event, events.DestinationEvent):
+					current_filename = event.path
+					with self._lock:
+						item = self._items.get(d_id)
+						if item:
+							item.current_filename = current_filename
+					self._record_temp_file(d_id, current_filename, temp_path)
+					self._touch_progress(d_id)
+					continue
+
+				if isinstance(event, events.AlreadyDownloadedEvent):
+					download_success = True
+					continue
 
-				if "[Merger]" in line or "Merging formats into" in line:
+				if isinstance(event, events.MergeEvent):
+					if event.path:
+						self._record_temp_file(d_id, event.path, temp_path)
+					self._set_phase(d_id, PHASE_MERGE, run_token)
 					throttled_update(f"{display_title} - {STATUS_MERGING}...", None, state=STATUS_MERGING)
 
 			proc.wait()
@@ -703,54 +1916,28 @@ class DownloadManager:
 					return
 				if item.manual_stop:
 					return
+				stalled_phase = item.stalled_phase
 
-			if proc.returncode == 0 or download_success:
-				resolved_path = None
-				if final_filepath and os.path.exists(final_filepath):
-					resolved_path = final_filepath
-				else:
-					with self._lock:
-						item = self._items.get(d_id)
-						current_filename = item.current_filename if item else None
-					if current_filename:
-						potential = current_filename
-						if not os.path.isabs(potential):
-							potential = os.path.join(download_path, potential)
-						mp4_path = os.path.splitext(potential)[0] + ".mp4"
-						if os.path.exists(mp4_path):
-							resolved_path = mp4_path
-						elif os.path.exists(potential):
-							resolved_path = potential
-
-				with self._lock:
-					item = self._items.get(d_id)
-					if not item:
-						return
-					item.completed = True
-					item.state = STATUS_COMPLETED
-					item.statusText = f"{item.title} - {STATUS_COMPLETED}"
-					item.progress = 100.0
-					item.file_path = resolved_path
-					item.process = None
-					item.updated_at = time.time()
-
-				self._notify_item_updated(d_id)
-				self._signal_queue_update()
+			if stalled_phase:
+				raise Exception(f"Download stalled during {stalled_phase} phase")
 
+			# A post already read as a regular video is not tried as photos again.
+			if not is_photo and (slideshow_detected or (proc.returncode and not download_success and _is_unsupported(last_lines))):
+				# A photo-mode post: yt-dlp picked its sound alone, or has no extractor for its page.
 				try:
-					if config:
-						config.conf["tiktokDownloader"]["totalDownloads"] += 1
-				except Exception:
-					pass
-
-				if self._play_sound:
-					try:
-						self._play_sound(True)
-					except Exception:
-						pass
+					if self._run_photo_download(d_id, url, run_token, quality_str, download_path, temp_path, throttled_update):
+						return
+				except photo.PhotoError as e:
+					# Not a post page after all; yt-dlp's own error below says more.
+					logging.debug(f"Download {d_id} is not a photo post: {e}")
 
-				self.save_state()
-				self._process_queue()
+			if proc.returncode == 0 or download_success:
+				resolved_path = None
+				for candidate in (final_filepath, processed_filepath):
+					if candidate and os.path.exists(candidate):
+						resolved_path = candidate
+						break
+				self._complete_download(d_id, url, resolved_path)
 				return
 
 			err_tail = "\n".join(last_lines[-8:])
@@ -782,13 +1969,14 @@ class DownloadManager:
 					item.progress = None
 					item.updated_at = time.time()
 					if d_id not in self._queue:
-						self._queue.append(d_id)
+						self._enqueue(d_id, retry=True)
 				else:
 					item.state = STATUS_ERROR
 					item.statusText = f"{STATUS_ERROR}: {item.title}"
 					item.progress = None
 					item.process = None
 					item.updated_at = time.time()
+					self._finish_timings(d_id)
 
 			self._notify_item_updated(d_id)
 			self._signal_queue_update()
@@ -801,4 +1989,10 @@ class DownloadManager:
 				except Exception:
 					pass
 
-			self._process_queue()
\ No newline at end of file
+			self._process_queue()
+
+		finally:
+			self._set_phase(d_id, None, run_token)
+			# Retries extract again: the prefetched media URLs may be what failed.
+			if prefetched:
+				prefetched.release()
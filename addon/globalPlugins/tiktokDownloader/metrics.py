@@ -0,0 +1,194 @@
+import csv
+import json
+import math
+from collections import deque
+from typing import Optional, Dict, Any, List
+
+TIMING_QUEUED = "queued"
+# When the last automatic retry was queued; queued itself keeps the first time.
+TIMING_RETRIED = "retried"
+TIMING_TITLE_RESOLVED = "title_resolved"
+TIMING_SPAWNED = "spawned"
+TIMING_FIRST_BYTE = "first_byte"
+TIMING_DOWNLOAD_DONE = "download_done"
+TIMING_MERGE_DONE = "merge_done"
+TIMING_FINALIZED = "finalized"
+
+TIMING_MARKS = [
+	TIMING_QUEUED,
+	TIMING_RETRIED,
+	TIMING_TITLE_RESOLVED,
+	TIMING_SPAWNED,
+	TIMING_FIRST_BYTE,
+	TIMING_DOWNLOAD_DONE,
+	TIMING_MERGE_DONE,
+	TIMING_FINALIZED,
+]
+
+# Histogram name -> (start mark, end mark)
+TIMING_SPANS = {
+	"queue_wait": (TIMING_QUEUED, TIMING_SPAWNED),
+	"retry_wait": (TIMING_RETRIED, TIMING_SPAWNED),
+	"title_resolve": (TIMING_QUEUED, TIMING_TITLE_RESOLVED),
+	"time_to_first_byte": (TIMING_SPAWNED, TIMING_FIRST_BYTE),
+	"download": (TIMING_FIRST_BYTE, TIMING_DOWNLOAD_DONE),
+	"merge": (TIMING_DOWNLOAD_DONE, TIMING_MERGE_DONE),
+	"total": (TIMING_QUEUED, TIMING_FINALIZED),
+}
+
+RECORD_FIELDS = [
+	"id",
+	"title",
+	"url",
+	"state",
+	"retry_count",
+	"bytes_transferred",
+	"peak_speed",
+	"avg_speed",
+	"bytes_saved",
+] + TIMING_MARKS
+
+
+class Histogram:
+
+	def __init__(self, max_samples: int = 2000):
+		self._samples = deque(maxlen=max_samples)
+		self.count = 0
+		self.total = 0.0
+		self.max = 0.0
+
+	def add(self, value: float):
+		self._samples.append(value)
+		self.count += 1
+		self.total += value
+		if value > self.max:
+			self.max = value
+
+	def percentile(self, pct: float) -> Optional[float]:
+		if not self._samples:
+			return None
+		ordered = sorted(self._samples)
+		rank = max(1, int(math.ceil(pct / 100.0 * len(ordered))))
+		return ordered[rank - 1]
+
+	def summary(self) -> Dict[str, Any]:
+		return {
+			"count": self.count,
+			"mean": (self.total / self.count) if self.count else None,
+			"p50": self.percentile(50),
+			"p95": self.percentile(95),
+			"max": self.max if self.count else None,
+		}
+
+
+def span_durations(timings: Dict[str, float]) -> Dict[str, float]:
+	result = {}
+	for name, (start, end) in TIMING_SPANS.items():
+		if start in timings and end in timings and timings[end] >= timings[start]:
+			result[name] = timings[end] - timings[start]
+	return result
+
+
+def export_json(path: str, summary: Dict[str, Any], records: List[Dict[str, Any]]):
+	with open(path, "w", encoding="utf-8") as f:
+		json.dump({"summary": summary, "downloads": records}, f, indent=4, ensure_ascii=False)
+
+
+def export_csv(path: str, records: List[Dict[str, Any]]):
+	with open(path, "w", encoding="utf-8", newline="") as f:
+		writer = csv.DictWriter(f, fieldnames=RECORD_FIELDS, extrasaction="ignore")
+		writer.writeheader()
+		for record in records:
+			row = dict(record)
+			row.update(record.get("timings") or {})
+			writer.writerow(row)
+
+
+class ThroughputMeter:
+
+	def __init__(self, alpha: float = 0.3, interval: float = 1.0):
+		self._alpha = alpha
+		self._interval = interval
+		self._rate = 0.0
+		self._bucket = 0
+		self._window_start: Optional[float] = None
+
+	def add(self, num_bytes: int, now: float):
+		self._roll(now)
+		if num_bytes > 0:
+			self._bucket += num_bytes
+
+	def rate(self, now: float) -> float:
+		self._roll(now)
+		return self._rate
+
+	def _roll(self, now: float):
+		if self._window_start is None:
+			self._window_start = now
+			return
+		elapsed = now - self._window_start
+		if elapsed < self._interval:
+			return
+		sample = self._bucket / elapsed
+		idle_windows = int(elapsed / self._interval) - 1
+		if idle_windows > 0:
+			self._rate *= (1 - self._alpha) ** idle_windows
+		if self._rate <= 0:
+			self._rate = sample
+		else:
+			self._rate = self._alpha * sample + (1 - self._alpha) * self._rate
+		self._bucket = 0
+		self._window_start = now
+
+
+class QueueEstimator:
+
+	def __init__(self):
+		self._remaining: Dict[int, Optional[int]] = {}
+		self._known_total = 0
+		self._unknown_count = 0
+		self._size_total = 0
+		self._size_count = 0
+
+	def track(self, d_id: int, remaining: Optional[int]):
+		self.untrack(d_id)
+		self._remaining[d_id] = remaining
+		if remaining is None:
+			self._unknown_count += 1
+		else:
+			self._known_total += remaining
+
+	def untrack(self, d_id: int):
+		if d_id not in self._remaining:
+			return
+		previous = self._remaining.pop(d_id)
+		if previous is None:
+			self._unknown_count -= 1
+		else:
+			self._known_total -= previous
+
+	def observe_size(self, num_bytes: int):
+		if num_bytes > 0:
+			self._size_total += num_bytes
+			self._size_count += 1
+
+	@property
+	def average_size(self) -> Optional[float]:
+		if not self._size_count:
+			return None
+		return self._size_total / self._size_count
+
+	def bytes_remaining(self) -> int:
+		estimate = self._known_total
+		avg = self.average_size
+		if avg and self._unknown_count:
+			estimate += int(avg * self._unknown_count)
+		return estimate
+
+	@property
+	def unknown_count(self) -> int:
+		return self._unknown_count
+
+	@property
+	def tracked_count(self) -> int:
+		return len(self._remaining)
@@ -0,0 +1,529 @@
+import os
+import re
+import json
+import shutil
+import socket
+import logging
+import threading
+import subprocess
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional, Callable, Dict, List, Tuple
+from urllib.parse import urljoin, urlsplit
+
+from . import downloader
+
+# Images of one post are fetched this many at a time, each worker reusing its connection.
+FETCH_WORKERS = 4
+FETCH_RETRIES = 2
+FETCH_TIMEOUT = 30
+CHUNK_SIZE = 64 * 1024
+MAX_REDIRECTS = 5
+SLIDE_SECONDS = 3
+SLIDESHOW_SIZE = (1080, 1920)
+# Each slide is a still, so extra frames would only be encoding time; players show 1 fps fine.
+SLIDESHOW_FPS = 1
+USER_AGENT = (
+	"Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+	"(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+)
+
+_DATA_RE = re.compile(
+	r'<script[^>]+\bid="__UNIVERSAL_DATA_FOR_REHYDRATION__"[^>]*>(.*?)</script>', re.DOTALL,
+)
+_REDIRECTS = (301, 302, 303, 307, 308)
+_IMAGE_EXTS = {"image/jpeg": "jpg", "image/webp": "webp", "image/png": "png", "image/heic": "heic"}
+_AUDIO_EXTS = {"audio/mpeg": "mp3", "audio/mp4": "m4a", "audio/x-m4a": "m4a", "audio/aac": "aac"}
+
+
+class PhotoError(Exception):
+	pass
+
+
+@dataclass
+class PhotoPost:
+	"""A photo-mode (slideshow) post: its images in order and the sound that plays under them."""
+	url: str
+	post_id: str
+	title: Optional[str]
+	image_urls: List[str]
+	audio_url: Optional[str] = None
+	# Cookies the page set; the media hosts expect them with the Referer.
+	cookie: str = ""
+
+	def headers(self) -> Dict[str, str]:
+		headers = {"User-Agent": USER_AGENT, "Referer": self.url}
+		if self.cookie:
+			headers["Cookie"] = self.cookie
+		return headers
+
+
+class ConnectionPool:
+	"""Keeps idle HTTP connections per host, so the requests for a post share a few sockets.
+
+	close() shuts down every connection, idle or busy, which also breaks a
+	worker out of a blocking read.
+	"""
+
+	def __init__(self, timeout: float = FETCH_TIMEOUT):
+		self._timeout = timeout
+		self._lock = threading.Lock()
+		self._idle: Dict[Tuple[str, str], List[http.client.HTTPConnection]] = {}
+		self._open: List[http.client.HTTPConnection] = []
+		self._closed = False
+
+	def acquire(self, scheme: str, netloc: str) -> Tuple[http.client.HTTPConnection, bool]:
+		"""Returns a connection to the host and whether it was reused."""
+		with self._lock:
+			if self._closed:
+				raise PhotoError("Cancelled")
+			idle = self._idle.get((scheme, netloc))
+			if idle:
+				return idle.pop(), True
+			cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+			conn = cls(netloc, timeout=self._timeout)
+			self._open.append(conn)
+			return conn, False
+
+	def release(self, scheme: str, netloc: str, conn: http.client.HTTPConnection):
+		with self._lock:
+			if not self._closed:
+				self._idle.setdefault((scheme, netloc), []).append(conn)
+				return
+		self.discard(conn)
+
+	def discard(self, conn: http.client.HTTPConnection):
+		with self._lock:
+			if conn in self._open:
+				self._open.remove(conn)
+		try:
+			conn.close()
+		except Exception:
+			pass
+
+	def close(self):
+		with self._lock:
+			self._closed = True
+			conns = list(self._open)
+			self._open = []
+			self._idle = {}
+		for conn in conns:
+			sock = conn.sock
+			if sock is not None:
+				try:
+					sock.shutdown(socket.SHUT_RDWR)
+				except OSError:
+					pass
+			try:
+				conn.close()
+			except Exception:
+				pass
+
+	def open(self, url: str, headers: Dict[str, str]) -> Tuple[http.client.HTTPResponse, Callable[[bool], None], str]:
+		"""GETs url, following redirects; returns the response, a done(reusable) callback and the final URL.
+
+		A reused connection the server has meanwhile closed is retried once on a new one.
+		"""
+		for _redirect in range(MAX_REDIRECTS + 1):
+			parts = urlsplit(url)
+			target = parts.path or "/"
+			if parts.query:
+				target += "?" + parts.query
+			for attempt in range(2):
+				conn, reused = self.acquire(parts.scheme, parts.netloc)
+				try:
+					conn.request("GET", target, headers=headers)
+					response = conn.getresponse()
+					break
+				except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+					self.discard(conn)
+					if not reused or attempt:
+						raise
+				except Exception:
+					self.discard(conn)
+					raise
+
+			def done(reusable: bool, conn=conn, scheme=parts.scheme, netloc=parts.netloc):
+				if reusable and not response.will_close:
+					self.release(scheme, netloc, conn)
+				else:
+					self.discard(conn)
+
+			if response.status in _REDIRECTS and response.getheader("Location"):
+				response.read()
+				done(True)
+				url = urljoin(url, response.getheader("Location"))
+				continue
+			return response, done, url
+		raise PhotoError(f"Too many redirects for {url}")
+
+
+def _cookie_header(response: http.client.HTTPResponse) -> str:
+	pairs = []
+	for value in response.headers.get_all("Set-Cookie") or []:
+		pair = value.split(";", 1)[0].strip()
+		if "=" in pair:
+			pairs.append(pair)
+	return "; ".join(pairs)
+
+
+def parse_post(page_url: str, html: str) -> Optional[PhotoPost]:
+	"""Reads the post data embedded in a TikTok page; None when the post is a regular video."""
+	m = _DATA_RE.search(html)
+	if not m:
+		raise PhotoError("The page has no post data")
+	try:
+		data = json.loads(m.group(1))
+		item = data["__DEFAULT_SCOPE__"]["webapp.video-detail"]["itemInfo"]["itemStruct"]
+	except (ValueError, KeyError, TypeError):
+		raise PhotoError("The page has no post data")
+
+	image_post = item.get("imagePost") or {}
+	image_urls = []
+	for image in image_post.get("images") or []:
+		candidates = (image.get("imageURL") or {}).get("urlList") or []
+		if candidates:
+			image_urls.append(urljoin(page_url, candidates[0]))
+	if not image_urls:
+		return None
+
+	audio_url = (item.get("music") or {}).get("playUrl")
+	return PhotoPost(
+		url=page_url,
+		post_id=str(item.get("id") or ""),
+		title=item.get("desc") or image_post.get("title") or None,
+		image_urls=image_urls,
+		audio_url=urljoin(page_url, audio_url) if isinstance(audio_url, str) and audio_url else None,
+	)
+
+
+def fetch_post(url: str, pool: Optional[ConnectionPool] = None) -> Optional[PhotoPost]:
+	"""Loads the page behind url, short links included, and returns the photo post it shows, if any."""
+	own_pool = pool is None
+	pool = pool or ConnectionPool()
+	try:
+		response, done, final_url = pool.open(url, {"User-Agent": USER_AGENT, "Accept-Language": "en-US,en;q=0.9"})
+		try:
+			body = response.read()
+		finally:
+			done(True)
+		if response.status != 200:
+			raise PhotoError(f"HTTP {response.status} for {final_url}")
+		charset = response.headers.get_content_charset() or "utf-8"
+		post = parse_post(final_url, body.decode(charset, errors="replace"))
+		if post is not None:
+			post.cookie = _cookie_header(response)
+		return post
+	finally:
+		if own_pool:
+			pool.close()
+
+
+class PostFetch:
+	"""Runs fetch_post() on its own pool and answers poll(), terminate(), kill() and wait() like a Popen.
+
+	The manager attaches it to the download while the page loads, so
+	stopping the download, or the stall watchdog, can break it out of a
+	blocking read.
+	"""
+
+	def __init__(self, url: str):
+		self.url = url
+		self.returncode: Optional[int] = None
+		self._pool = ConnectionPool()
+		self._finished = threading.Event()
+		self._cancelled = False
+
+	def run(self) -> Optional[PhotoPost]:
+		"""The post, None for a regular video or when cancelled; raises when the page cannot be loaded."""
+		try:
+			post = fetch_post(self.url, self._pool)
+			self.returncode = 0
+			return post
+		except Exception:
+			self.returncode = -15 if self._cancelled else 1
+			if self._cancelled:
+				return None
+			raise
+		finally:
+			self._pool.close()
+			self._finished.set()
+
+	def poll(self) -> Optional[int]:
+		return self.returncode
+
+	def wait(self, timeout: Optional[float] = None) -> Optional[int]:
+		self._finished.wait(timeout)
+		return self.returncode
+
+	def terminate(self):
+		self._cancelled = True
+		self._pool.close()
+
+	kill = terminate
+
+
+@dataclass
+class _Part:
+	url: str
+	stem: str
+	exts: Dict[str, str]
+	size: Optional[int] = None
+	done: int = 0
+	path: Optional[str] = None
+
+
+@dataclass
+class PhotoProgress:
+	done_bytes: int
+	total_bytes: int
+	files_done: int
+	files_total: int
+	percent: float
+
+
+class PhotoDownload:
+	"""Fetches the images and sound of a photo post into work_dir, FETCH_WORKERS at a time.
+
+	All parts share one ConnectionPool. Progress is reported for the post
+	as a whole; parts whose size is not known yet count as the average of
+	the known ones. It answers poll(), terminate(), kill() and wait() like a
+	Popen, so the manager can stop it, and the stall watchdog can kill it,
+	the way it does a yt-dlp process.
+	"""
+
+	def __init__(
+		self,
+		post: PhotoPost,
+		work_dir: str,
+		workers: int = FETCH_WORKERS,
+		on_progress: Optional[Callable[[PhotoProgress], None]] = None,
+	):
+		self.post = post
+		self.work_dir = work_dir
+		self.returncode: Optional[int] = None
+		self.error: Optional[str] = None
+		self._workers = max(1, workers)
+		self._on_progress = on_progress
+		self._pool = ConnectionPool()
+		self._lock = threading.Lock()
+		self._finished = threading.Event()
+		self._cancelled = False
+		self._percent = 0.0
+		width = len(str(len(post.image_urls)))
+		self._parts = [
+			_Part(url, str(n).zfill(max(2, width)), _IMAGE_EXTS)
+			for n, url in enumerate(post.image_urls, 1)
+		]
+		if post.audio_url:
+			self._parts.append(_Part(post.audio_url, "audio", _AUDIO_EXTS))
+
+	@property
+	def image_paths(self) -> List[str]:
+		return [p.path for p in self._parts if p.exts is _IMAGE_EXTS and p.path]
+
+	@property
+	def audio_path(self) -> Optional[str]:
+		return next((p.path for p in self._parts if p.exts is _AUDIO_EXTS), None)
+
+	@property
+	def transferred(self) -> int:
+		with self._lock:
+			return sum(p.done for p in self._parts)
+
+	def run(self) -> int:
+		os.makedirs(self.work_dir, exist_ok=True)
+		try:
+			with ThreadPoolExecutor(max_workers=min(self._workers, len(self._parts))) as executor:
+				for future in [executor.submit(self._fetch, part) for part in self._parts]:
+					future.result()
+		finally:
+			self._pool.close()
+			if self._cancelled:
+				self.returncode = -15
+			elif self.error:
+				self.returncode = 1
+			else:
+				self.returncode = 0
+			self._finished.set()
+		return self.returncode
+
+	def poll(self) -> Optional[int]:
+		return self.returncode
+
+	def wait(self, timeout: Optional[float] = None) -> Optional[int]:
+		self._finished.wait(timeout)
+		return self.returncode
+
+	def terminate(self):
+		self._cancelled = True
+		self._pool.close()
+
+	kill = terminate
+
+	def _fetch(self, part: _Part):
+		headers = self.post.headers()
+		for attempt in range(FETCH_RETRIES + 1):
+			if self._cancelled or self.error:
+				return
+			try:
+				self._fetch_once(part, headers)
+				return
+			except Exception as e:
+				with self._lock:
+					part.done = 0
+				if attempt < FETCH_RETRIES and not isinstance(e, PhotoError):
+					logging.debug(f"Retrying {part.url}: {e}")
+					continue
+				with self._lock:
+					if self.error is None and not self._cancelled:
+						self.error = str(e)
+				# One missing image spoils the post; stop the rest.
+				self._pool.close()
+				return
+
+	def _fetch_once(self, part: _Part, headers: Dict[str, str]):
+		response, done, final_url = self._pool.open(part.url, headers)
+		reusable = False
+		try:
+			if response.status != 200:
+				raise PhotoError(f"HTTP {response.status} for {final_url}")
+			content_type = (response.getheader("Content-Type") or "").split(";", 1)[0].strip().lower()
+			ext = part.exts.get(content_type) or _ext_from_url(final_url) or next(iter(part.exts.values()))
+			path = os.path.join(self.work_dir, f"{part.stem}.{ext}")
+			length = response.getheader("Content-Length")
+			with self._lock:
+				part.size = int(length) if length and length.isdigit() else None
+			self._report()
+			with open(path, "wb") as f:
+				while True:
+					chunk = response.read(CHUNK_SIZE)
+					if not chunk:
+						break
+					f.write(chunk)
+					with self._lock:
+						part.done += len(chunk)
+					self._report()
+			if part.size is not None and part.done < part.size:
+				raise PhotoError(f"Connection closed early for {final_url}")
+			with self._lock:
+				part.path = path
+				part.size = part.done
+			reusable = True
+			self._report()
+		finally:
+			done(reusable)
+
+	def _report(self):
+		if not self._on_progress:
+			return
+		with self._lock:
+			known = [p.size for p in self._parts if p.size is not None]
+			unknown = len(self._parts) - len(known)
+			total = sum(known) + (unknown * sum(known) // len(known) if known else 0)
+			done = sum(p.done for p in self._parts)
+			# The estimate moves as sizes come in; the percentage only goes up.
+			if total:
+				self._percent = max(self._percent, min(100.0, done * 100.0 / total))
+			progress = PhotoProgress(
+				done_bytes=done,
+				total_bytes=total,
+				files_done=sum(1 for p in self._parts if p.path),
+				files_total=len(self._parts),
+				percent=self._percent,
+			)
+		try:
+			self._on_progress(progress)
+		except Exception:
+			pass
+
+
+def _ext_from_url(url: str) -> Optional[str]:
+	ext = os.path.splitext(urlsplit(url).path)[1].lstrip(".").lower()
+	return ext if ext.isalnum() and len(ext) <= 4 else None
+
+
+def unique_path(directory: str, name: str, post_id: str, ext: str = "") -> Tuple[str, bool]:
+	"""Picks where a post is saved and whether it is already there.
+
+	Posts without a caption share a title, so a taken name gets the post id
+	appended; a name with the id that is taken is this post, saved before.
+	"""
+	path = os.path.join(directory, name + ext)
+	if not os.path.exists(path):
+		return path, False
+	path = os.path.join(directory, f"{name} ({post_id}){ext}")
+	return path, os.path.exists(path)
+
+
+def slideshow_duration(image_count: int) -> int:
+	return image_count * SLIDE_SECONDS
+
+
+def slideshow_command(
+	images: List[str], audio: Optional[str], output: str, ffmpeg_path: str, threads: int = 0,
+) -> List[str]:
+	"""Builds one ffmpeg run that turns the images, each shown SLIDE_SECONDS, and the sound into an MP4.
+
+	Each image is decoded once, fitted into SLIDESHOW_SIZE with letterboxing
+	so pictures of different shapes and formats can be concatenated, and its
+	frame repeated. The sound is copied, not encoded again; it loops if it is
+	shorter than the slides and is cut where they end. Progress goes to
+	stdout as -progress key=value lines.
+	"""
+	width, height = SLIDESHOW_SIZE
+	frames = SLIDE_SECONDS * SLIDESHOW_FPS
+	cmd = [ffmpeg_path, "-y", "-hide_banner", "-loglevel", "error", "-nostats", "-progress", "pipe:1"]
+	for image in images:
+		cmd.extend(["-i", image])
+	if audio:
+		cmd.extend(["-stream_loop", "-1", "-i", audio])
+	slide = (
+		f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+		f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,format=yuv420p,"
+		f"loop=loop={frames - 1}:size=1,setpts=N/({SLIDESHOW_FPS}*TB)"
+	)
+	chains = [f"[{n}:v]{slide}[v{n}]" for n in range(len(images))]
+	inputs = "".join(f"[v{n}]" for n in range(len(images)))
+	chains.append(f"{inputs}concat=n={len(images)}:v=1:a=0[v]")
+	cmd.extend(["-filter_complex", ";".join(chains), "-map", "[v]"])
+	if audio:
+		# MP4 holds TikTok's AAC and MP3 sounds as they are.
+		cmd.extend(["-map", f"{len(images)}:a", "-c:a", "copy"])
+	cmd.extend(["-c:v", "libx264", "-preset", "veryfast", "-tune", "stillimage", "-r", str(SLIDESHOW_FPS)])
+	if threads:
+		cmd.extend(["-threads", str(int(threads))])
+	cmd.extend(["-t", str(slideshow_duration(len(images))), "-movflags", "+faststart", output])
+	return cmd
+
+
+def start_slideshow(
+	images: List[str], audio: Optional[str], output: str,
+	priority: str = downloader.PRIORITY_NORMAL, cpus=None, threads: int = 0,
+) -> subprocess.Popen:
+	cmd = slideshow_command(images, audio, output, downloader.get_ffmpeg_path(), threads)
+	return downloader.start_process(
+		cmd,
+		priority=priority,
+		cpus=cpus,
+		stdout=subprocess.PIPE,
+		stderr=subprocess.STDOUT,
+		stdin=subprocess.DEVNULL,
+		text=True,
+		encoding="utf-8",
+		errors="replace",
+	)
+
+
+def parse_render_progress(line: str) -> Optional[float]:
+	"""Seconds of video written so far, from an ffmpeg -progress line; None for other lines."""
+	key, sep, value = line.strip().partition("=")
+	if sep and key in ("out_time_us", "out_time_ms") and value.strip().isdigit():
+		# Both keys are in microseconds.
+		return int(value) / 1_000_000
+	return None
+
+
+def remove_work_dir(path: str):
+	shutil.rmtree(path, ignore_errors=True)
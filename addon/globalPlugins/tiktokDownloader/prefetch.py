@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+import subprocess
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Dict
+
+from . import downloader
+from . import urls
+
+# Signed media URLs in the extracted info expire after a few hours; stay well inside that.
+PREFETCH_TTL = 10 * 60
+MAX_ENTRIES = 32
+FETCH_TIMEOUT = 60
+
+
+def default_cache_dir() -> str:
+	return os.path.join(tempfile.gettempdir(), "nvda_tiktok_downloader", "info")
+
+
+@dataclass
+class PrefetchedInfo:
+	url: str
+	path: str
+	title: Optional[str]
+	fetched_at: float
+
+	def release(self):
+		try:
+			os.remove(self.path)
+		except OSError:
+			pass
+
+
+class _Pending:
+
+	def __init__(self):
+		self.done = threading.Event()
+		self.proc: Optional[subprocess.Popen] = None
+		self.claimed = False
+		self.cancelled = False
+
+
+class MetadataPrefetcher:
+	"""Extracts video metadata with yt-dlp before the user confirms a download.
+
+	prefetch() runs `yt-dlp --dump-single-json` at idle priority and keeps the
+	result as an .info.json file for PREFETCH_TTL seconds. One speculative
+	fetch runs at a time: prefetching another URL cancels it, unless a
+	download already waits on it. take() hands an entry to a download, which
+	passes it to yt-dlp with --load-info-json and skips extraction.
+	"""
+
+	def __init__(self, cache_dir: Optional[str] = None, ttl: float = PREFETCH_TTL, max_entries: int = MAX_ENTRIES):
+		self._cache_dir = cache_dir or default_cache_dir()
+		self._ttl = ttl
+		self._max_entries = max_entries
+		self._lock = threading.Lock()
+		self._entries: "OrderedDict[str, PrefetchedInfo]" = OrderedDict()
+		self._pending: Dict[str, _Pending] = {}
+		self.hits = 0
+		self.misses = 0
+
+	def prefetch(self, url: str) -> bool:
+		if not url:
+			return False
+		key = urls.normalize_url(url)
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry and time.time() - entry.fetched_at < self._ttl:
+				return False
+			if key in self._pending:
+				return False
+			for other in list(self._pending.values()):
+				if not other.claimed:
+					self._cancel(other)
+			pending = self._pending[key] = _Pending()
+		threading.Thread(target=self._fetch, args=(key, url, pending), daemon=True).start()
+		return True
+
+	def take(self, url: str, wait: Optional[float] = None) -> Optional[PrefetchedInfo]:
+		"""Removes and returns the fresh entry for url, waiting up to wait seconds for a running fetch.
+
+		The caller owns the file afterwards and calls release() once yt-dlp is done with it.
+		"""
+		key = urls.normalize_url(url)
+		with self._lock:
+			pending = self._pending.get(key)
+			if pending and not pending.cancelled:
+				pending.claimed = True
+		if pending and wait:
+			pending.done.wait(wait)
+		with self._lock:
+			entry = self._entries.pop(key, None)
+			if entry and time.time() - entry.fetched_at >= self._ttl:
+				entry.release()
+				entry = None
+			if entry:
+				self.hits += 1
+			else:
+				self.misses += 1
+		return entry
+
+	def clear(self):
+		with self._lock:
+			for pending in self._pending.values():
+				self._cancel(pending)
+			entries = list(self._entries.values())
+			self._entries.clear()
+		for entry in entries:
+			entry.release()
+
+	@staticmethod
+	def _cancel(pending: _Pending):
+		pending.cancelled = True
+		if pending.proc is not None:
+			try:
+				pending.proc.kill()
+			except Exception:
+				pass
+
+	def _fetch(self, key: str, url: str, pending: _Pending):
+		priority = downloader.PRIORITY_IDLE
+		try:
+			cmd = [
+				downloader.get_yt_dlp_path(),
+				"--dump-single-json",
+				"--skip-download",
+				"--no-playlist",
+				"--no-warnings",
+				"--no-check-certificates",
+				"--encoding", "utf-8",
+				url,
+			]
+			with self._lock:
+				if pending.cancelled:
+					return
+				pending.proc = subprocess.Popen(
+					downloader.priority_prefix(priority) + cmd,
+					stdout=subprocess.PIPE,
+					stderr=subprocess.DEVNULL,
+					stdin=subprocess.DEVNULL,
+					**downloader.popen_kwargs(priority),
+				)
+			try:
+				out, _ = pending.proc.communicate(timeout=FETCH_TIMEOUT)
+			except subprocess.TimeoutExpired:
+				pending.proc.kill()
+				pending.proc.communicate()
+				return
+			if pending.cancelled or pending.proc.returncode != 0 or not out:
+				return
+
+			info = json.loads(out.decode("utf-8", errors="replace"))
+			os.makedirs(self._cache_dir, exist_ok=True)
+			name = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+			path = os.path.join(self._cache_dir, f"{name}-{int(time.time() * 1000)}.info.json")
+			with open(path, "wb") as f:
+				f.write(out)
+			self._store(key, PrefetchedInfo(url=url, path=path, title=info.get("title") or None, fetched_at=time.time()))
+		except Exception as e:
+			logging.debug(f"Metadata prefetch failed for {url}: {e}")
+		finally:
+			with self._lock:
+				if self._pending.get(key) is pending:
+					del self._pending[key]
+			pending.done.set()
+
+	def _store(self, key: str, entry: PrefetchedInfo):
+		evicted = []
+		with self._lock:
+			old = self._entries.pop(key, None)
+			if old:
+				evicted.append(old)
+			self._entries[key] = entry
+			while len(self._entries) > self._max_entries:
+				evicted.append(self._entries.popitem(last=False)[1])
+		for old in evicted:
+			old.release()
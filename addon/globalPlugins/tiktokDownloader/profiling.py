@@ -0,0 +1,308 @@
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, Callable, Dict, Any, List
+
+DEFAULT_WINDOW = 60.0
+# Worker threads hand their samples over this often, so stopping a session loses little.
+FLUSH_INTERVAL = 2.0
+SUMMARY_LINES = 40
+
+
+def default_profile_dir() -> str:
+	try:
+		import globalVars
+		return os.path.join(globalVars.appArgs.configPath, "tiktokDownloader_profiles")
+	except Exception:
+		return os.path.join(os.path.expanduser("~"), "nvda_tiktok_downloader_profiles")
+
+
+class InstrumentedLock:
+	"""An RLock that can count acquisitions, waits and hold times.
+
+	Counters are only updated while enabled and while the lock is held, so
+	they need no extra synchronisation and cost nothing when disabled.
+	"""
+
+	def __init__(self):
+		self._lock = threading.RLock()
+		self._local = threading.local()
+		self.enabled = False
+		self.reset()
+
+	def reset(self):
+		self.acquisitions = 0
+		self.contended = 0
+		self.wait_time = 0.0
+		self.hold_time = 0.0
+		self.max_hold = 0.0
+
+	def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+		if not self.enabled:
+			return self._lock.acquire(blocking, timeout)
+		start = time.perf_counter()
+		contended = False
+		if not self._lock.acquire(False):
+			if not blocking or not self._lock.acquire(True, timeout):
+				return False
+			contended = True
+		now = time.perf_counter()
+		depth = getattr(self._local, "depth", 0)
+		if depth == 0:
+			self._local.held_since = now
+		self._local.depth = depth + 1
+		self.acquisitions += 1
+		if contended:
+			self.contended += 1
+		self.wait_time += now - start
+		return True
+
+	def release(self):
+		depth = getattr(self._local, "depth", 0)
+		if depth:
+			self._local.depth = depth - 1
+			if depth == 1:
+				held = time.perf_counter() - self._local.held_since
+				self.hold_time += held
+				if held > self.max_hold:
+					self.max_hold = held
+		self._lock.release()
+
+	def __enter__(self):
+		self.acquire()
+		return self
+
+	def __exit__(self, exc_type, exc, tb):
+		self.release()
+
+	def stats(self) -> Dict[str, Any]:
+		return {
+			"acquisitions": self.acquisitions,
+			"contended": self.contended,
+			"wait_s": round(self.wait_time, 4),
+			"hold_s": round(self.hold_time, 4),
+			"max_hold_ms": round(self.max_hold * 1000, 2),
+		}
+
+
+class Profiler:
+	"""cProfile sessions across worker and UI threads for a bounded window.
+
+	cProfile only sees the thread that enabled it, so every thread opts in:
+	workers through thread_scope() and checkpoint(), wx callbacks through
+	profiled(). Samples are merged into one pstats.Stats and dumped when the
+	window ends.
+	"""
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._local = threading.local()
+		self._session = 0
+		self._active = False
+		self._timer: Optional[threading.Timer] = None
+		self._stats: Optional[pstats.Stats] = None
+		self._sections: Dict[str, List[float]] = {}
+		self._locks: Dict[str, InstrumentedLock] = {}
+		self._summaries: Dict[str, Callable[[], Any]] = {}
+		self._directory: Optional[str] = None
+		self._on_finished: Optional[Callable[[Optional[str]], None]] = None
+		self._started_at = 0.0
+		self.last_path: Optional[str] = None
+
+	@property
+	def active(self) -> bool:
+		return self._active
+
+	def register_lock(self, name: str, lock: InstrumentedLock):
+		with self._lock:
+			self._locks[name] = lock
+			lock.enabled = self._active
+
+	def register_summary(self, name: str, provider: Callable[[], Any]):
+		"""Adds provider()'s result, as JSON, to every dumped summary."""
+		with self._lock:
+			self._summaries[name] = provider
+
+	def start(
+		self,
+		duration: float = DEFAULT_WINDOW,
+		directory: Optional[str] = None,
+		on_finished: Optional[Callable[[Optional[str]], None]] = None,
+	) -> bool:
+		with self._lock:
+			if self._active:
+				return False
+			self._session += 1
+			self._active = True
+			self._stats = None
+			self._sections = {}
+			self._directory = directory
+			self._on_finished = on_finished
+			self._started_at = time.time()
+			for lock in self._locks.values():
+				lock.reset()
+				lock.enabled = True
+			if duration and duration > 0:
+				self._timer = threading.Timer(duration, self.stop)
+				self._timer.daemon = True
+				self._timer.start()
+		return True
+
+	def stop(self) -> Optional[str]:
+		with self._lock:
+			if not self._active:
+				return None
+			self._active = False
+			if self._timer:
+				self._timer.cancel()
+				self._timer = None
+			for lock in self._locks.values():
+				lock.enabled = False
+			on_finished = self._on_finished
+			self._on_finished = None
+
+		# This thread may itself be profiling, e.g. a wx callback or a worker.
+		self._flush(force_stop=True)
+		path = None
+		try:
+			path = self._dump()
+		except Exception as e:
+			logging.error(f"Failed to write profile: {e}")
+		self.last_path = path
+		if on_finished:
+			try:
+				on_finished(path)
+			except Exception:
+				pass
+		return path
+
+	def toggle(self, duration: float = DEFAULT_WINDOW, directory: Optional[str] = None, on_finished=None) -> bool:
+		"""Starts a session, or stops the running one. Returns True if a session started."""
+		if self._active:
+			self.stop()
+			return False
+		return self.start(duration, directory, on_finished)
+
+	@contextmanager
+	def thread_scope(self, label: str):
+		"""Profiles the current thread for the duration of the block while a session runs."""
+		started = time.perf_counter()
+		self.checkpoint()
+		try:
+			yield
+		finally:
+			self._flush(force_stop=True)
+			if self._active:
+				self._add_section(label, time.perf_counter() - started)
+
+	def checkpoint(self):
+		"""Called from long-running loops so threads join or leave sessions as they toggle."""
+		profile = getattr(self._local, "profile", None)
+		if profile is None:
+			if self._active:
+				self._enable_thread()
+			return
+		if not self._active or self._local.session != self._session:
+			self._flush(force_stop=True)
+		elif time.monotonic() - self._local.since >= FLUSH_INTERVAL:
+			self._flush(force_stop=False)
+
+	def profiled(self, label: str):
+		"""Decorator for wx callbacks; a plain call unless a session is running."""
+		def decorator(func):
+			@functools.wraps(func)
+			def wrapper(*args, **kwargs):
+				if not self._active or getattr(self._local, "profile", None) is not None:
+					return func(*args, **kwargs)
+				started = time.perf_counter()
+				self._enable_thread()
+				try:
+					return func(*args, **kwargs)
+				finally:
+					self._flush(force_stop=True)
+					self._add_section(label, time.perf_counter() - started)
+			return wrapper
+		return decorator
+
+	def _enable_thread(self):
+		profile = cProfile.Profile()
+		try:
+			profile.enable()
+		except ValueError:
+			# Python 3.12+ allows one active cProfile per process; skip this thread.
+			return
+		self._local.profile = profile
+		self._local.session = self._session
+		self._local.since = time.monotonic()
+
+	def _flush(self, force_stop: bool):
+		profile = getattr(self._local, "profile", None)
+		if profile is None:
+			return
+		profile.disable()
+		session = self._local.session
+		self._local.profile = None
+		with self._lock:
+			if session == self._session and (self._active or force_stop):
+				try:
+					if self._stats is None:
+						self._stats = pstats.Stats(profile)
+					else:
+						self._stats.add(profile)
+				except TypeError:
+					# pstats refuses profiles that recorded no calls.
+					pass
+		if not force_stop and self._active:
+			self._enable_thread()
+
+	def _add_section(self, label: str, seconds: float):
+		with self._lock:
+			entry = self._sections.setdefault(label, [0, 0.0])
+			entry[0] += 1
+			entry[1] += seconds
+
+	def _dump(self) -> Optional[str]:
+		with self._lock:
+			stats = self._stats
+			sections = dict(self._sections)
+			locks = {name: lock.stats() for name, lock in self._locks.items()}
+			summaries = dict(self._summaries)
+			directory = self._directory or default_profile_dir()
+			started_at = self._started_at
+		os.makedirs(directory, exist_ok=True)
+		base = os.path.join(directory, time.strftime("profile-%Y%m%d-%H%M%S", time.localtime(started_at)))
+
+		out = io.StringIO()
+		out.write(f"Profile window: {time.time() - started_at:.1f}s\n\n")
+		out.write("Sections (calls, wall seconds):\n")
+		for label, (calls, seconds) in sorted(sections.items(), key=lambda kv: -kv[1][1]):
+			out.write(f"  {label}: {calls} calls, {seconds:.3f}s\n")
+		out.write("\nLocks:\n")
+		for name, values in locks.items():
+			out.write(f"  {name}: " + ", ".join(f"{k}={v}" for k, v in values.items()) + "\n")
+		out.write("\n")
+		for name, provider in summaries.items():
+			try:
+				out.write(f"{name}:\n{json.dumps(provider(), indent=2, default=str)}\n\n")
+			except Exception as e:
+				out.write(f"{name}: unavailable ({e})\n\n")
+		if stats is not None:
+			stats.dump_stats(base + ".prof")
+			stats.stream = out
+			stats.sort_stats("cumulative").print_stats(SUMMARY_LINES)
+		else:
+			out.write("No profiled calls were recorded.\n")
+
+		with open(base + ".txt", "w", encoding="utf-8") as f:
+			f.write(out.getvalue())
+		return base + ".txt"
+
+
+PROFILER = Profiler()
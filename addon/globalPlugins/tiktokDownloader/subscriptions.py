@@ -0,0 +1,289 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Optional, Callable, Dict, Any, List
+
+from . import downloader
+from . import expander
+from . import urls
+
+SYNC_INTERVAL = 6 * 60 * 60
+# Profiles show up to three pinned, usually older, videos first, so one known video is not
+# yet the end of the new ones. The listing stops at this many.
+KNOWN_TO_STOP = 4
+PAGE_SIZE = 10
+
+_VIDEO_ID_RE = re.compile(r"/(?:video|photo)/(\d+)")
+
+
+def _subscriptions_file_path() -> str:
+	return os.path.join(os.path.expanduser("~"), "nvda_tiktok_downloader_subscriptions.json")
+
+
+def has_saved_subscriptions() -> bool:
+	return os.path.exists(_subscriptions_file_path())
+
+
+def video_number(video: expander.ListedVideo) -> Optional[int]:
+	"""TikTok video ids grow over time, so a larger one is a newer video."""
+	if video.video_id and video.video_id.isdigit():
+		return int(video.video_id)
+	m = _VIDEO_ID_RE.search(video.url)
+	return int(m.group(1)) if m else None
+
+
+@dataclass
+class Subscription:
+	url: str
+	quality_str: str
+	remove_watermark: bool = True
+	# Id of the newest video seen; None until the first sync has run.
+	high_water: Optional[int] = None
+	last_sync: float = 0.0
+	last_new: int = 0
+	last_error: Optional[str] = None
+
+	def is_due(self, interval: float, now: float) -> bool:
+		return interval > 0 and now - self.last_sync >= interval
+
+	def to_persist_dict(self) -> Dict[str, Any]:
+		return {
+			"url": self.url,
+			"quality_str": self.quality_str,
+			"remove_watermark": self.remove_watermark,
+			# A string, as the ids do not fit a double in other JSON readers.
+			"high_water": str(self.high_water) if self.high_water is not None else None,
+			"last_sync": self.last_sync,
+			"last_new": self.last_new,
+			"last_error": self.last_error,
+		}
+
+	@staticmethod
+	def from_persist_dict(d: Dict[str, Any]) -> "Subscription":
+		high_water = d.get("high_water")
+		return Subscription(
+			url=d["url"],
+			quality_str=d.get("quality_str", "best"),
+			remove_watermark=bool(d.get("remove_watermark", True)),
+			high_water=int(high_water) if high_water not in (None, "") else None,
+			last_sync=float(d.get("last_sync", 0.0)),
+			last_new=int(d.get("last_new", 0)),
+			last_error=d.get("last_error"),
+		)
+
+
+class SubscriptionManager:
+	"""Keeps a list of subscribed profiles and queues their new videos on a schedule.
+
+	Each subscription remembers the id of the newest video seen. A sync
+	reads the profile newest first and stops as soon as it reaches videos at
+	or below that mark, killing the listing, so a profile with nothing new
+	costs about one page however many videos it has. The first sync only
+	sets the mark. Syncs run one at a time on a background thread, at idle
+	priority.
+	"""
+
+	def __init__(
+		self,
+		enqueue: Callable[[List[str], List[Optional[str]], str, bool], int],
+		interval: float = SYNC_INTERVAL,
+		on_synced: Optional[Callable[[Subscription, int], None]] = None,
+	):
+		# enqueue(video urls, titles, quality, remove_watermark) queues the videos and returns how many were new.
+		self._enqueue = enqueue
+		self._interval = interval
+		self._on_synced = on_synced
+		self._lock = threading.Lock()
+		self._subs: Dict[str, Subscription] = {}
+		self._forced: set = set()
+		self._wake = threading.Event()
+		self._stopping = False
+		self._thread: Optional[threading.Thread] = None
+		self._current: Optional[expander.PlaylistExpander] = None
+
+	@staticmethod
+	def _key(url: str) -> str:
+		return urls.normalize_url(url).rstrip("/")
+
+	def get_subscriptions(self) -> List[Subscription]:
+		with self._lock:
+			return [Subscription(**vars(sub)) for sub in self._subs.values()]
+
+	def add(self, url: str, quality_str: str, remove_watermark: bool = True) -> bool:
+		key = self._key(url)
+		with self._lock:
+			if key in self._subs:
+				return False
+			self._subs[key] = Subscription(url=url, quality_str=quality_str, remove_watermark=remove_watermark)
+			self._forced.add(key)
+		self.save()
+		self._wake.set()
+		return True
+
+	def remove(self, url: str) -> bool:
+		key = self._key(url)
+		with self._lock:
+			if self._subs.pop(key, None) is None:
+				return False
+			self._forced.discard(key)
+		self.save()
+		return True
+
+	def set_interval(self, interval: float):
+		self._interval = interval
+		self._wake.set()
+
+	def sync_now(self, url: Optional[str] = None):
+		with self._lock:
+			self._forced |= {self._key(url)} if url else set(self._subs)
+		self._wake.set()
+
+	def start(self):
+		if self._thread is not None:
+			return
+		self._stopping = False
+		self._thread = threading.Thread(target=self._run, name="TikTokSubscriptions", daemon=True)
+		self._thread.start()
+
+	def stop(self):
+		self._stopping = True
+		self._wake.set()
+		current = self._current
+		if current is not None:
+			current.close()
+		if self._thread is not None:
+			self._thread.join(5)
+			self._thread = None
+
+	def load(self):
+		path = _subscriptions_file_path()
+		if not os.path.exists(path):
+			return
+		try:
+			with open(path, "r", encoding="utf-8") as f:
+				loaded = json.load(f)
+		except Exception as e:
+			logging.error(f"Failed to load subscriptions: {e}")
+			return
+		subs = {}
+		for d in loaded.get("subscriptions") or []:
+			try:
+				sub = Subscription.from_persist_dict(d)
+			except Exception:
+				continue
+			subs[self._key(sub.url)] = sub
+		with self._lock:
+			for key, sub in subs.items():
+				self._subs.setdefault(key, sub)
+		self._wake.set()
+
+	def save(self):
+		with self._lock:
+			payload = {"version": 1, "subscriptions": [sub.to_persist_dict() for sub in self._subs.values()]}
+		try:
+			with open(_subscriptions_file_path(), "w", encoding="utf-8") as f:
+				f.write(json.dumps(payload, ensure_ascii=False))
+		except Exception as e:
+			logging.error(f"Failed to save subscriptions: {e}")
+
+	def sync(self, sub: Subscription) -> int:
+		"""Queues the videos newer than sub's mark and moves the mark; returns how many were queued."""
+		exp = expander.PlaylistExpander(sub.url, priority=downloader.PRIORITY_IDLE)
+		self._current = exp
+		found: List[expander.ListedVideo] = []
+		newest = sub.high_water
+		known = 0
+		try:
+			while known < KNOWN_TO_STOP and not self._stopping:
+				page = exp.next_page(PAGE_SIZE)
+				if not page:
+					break
+				for video in page:
+					number = video_number(video)
+					if number is not None and (newest is None or number > newest):
+						newest = number
+					if sub.high_water is not None and number is not None and number <= sub.high_water:
+						known += 1
+						if known >= KNOWN_TO_STOP:
+							break
+						continue
+					found.append(video)
+				if sub.high_water is None:
+					# First sync: the newest video on the first page is the mark, nothing is queued.
+					found = []
+					break
+		finally:
+			exp.close()
+			self._current = None
+
+		if self._stopping:
+			return 0
+		if exp.error and not found and newest == sub.high_water:
+			sub.last_error = exp.error
+			return 0
+
+		queued = 0
+		if found:
+			# The listing is newest first; queue in the order they were posted.
+			found.reverse()
+			queued = self._enqueue([v.url for v in found], [v.title for v in found], sub.quality_str, sub.remove_watermark)
+		sub.high_water = newest
+		sub.last_error = None
+		sub.last_new = queued
+		return queued
+
+	def _run(self):
+		while not self._stopping:
+			self._wake.clear()
+			for key in self._due_keys():
+				if self._stopping:
+					break
+				self._sync_key(key)
+			self._wake.wait(self._seconds_to_next())
+
+	def _due_keys(self) -> List[str]:
+		now = time.time()
+		with self._lock:
+			due = [key for key, sub in self._subs.items() if key in self._forced or sub.is_due(self._interval, now)]
+			self._forced.difference_update(due)
+		return due
+
+	def _seconds_to_next(self) -> Optional[float]:
+		if self._interval <= 0:
+			return None
+		now = time.time()
+		with self._lock:
+			if not self._subs:
+				return None
+			next_due = min(sub.last_sync + self._interval for sub in self._subs.values())
+		return max(1.0, next_due - now)
+
+	def _sync_key(self, key: str):
+		with self._lock:
+			sub = self._subs.get(key)
+			if sub is None:
+				return
+			work = Subscription(**vars(sub))
+		try:
+			queued = self.sync(work)
+		except Exception as e:
+			logging.error(f"Syncing {work.url} failed: {e}")
+			work.last_error = str(e)
+			queued = 0
+		if self._stopping:
+			return
+		work.last_sync = time.time()
+		with self._lock:
+			if self._subs.get(key) is not sub:
+				return
+			self._subs[key] = work
+		self.save()
+		if self._on_synced:
+			try:
+				self._on_synced(work, queued)
+			except Exception:
+				pass
@@ -0,0 +1,220 @@
+import gzip
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional, Dict, Any, List, Iterator
+
+from .constants import STATUS_QUEUED
+
+TRACE_VERSION = 1
+
+# Each trace line is a JSON array: [seconds since start, kind, download id, data]
+KIND_META = "meta"
+KIND_ADD = "add"
+KIND_TITLE = "title"
+KIND_SPAWN = "spawn"
+KIND_LINE = "line"
+KIND_EXIT = "exit"
+KIND_STATE = "state"
+KIND_REMOVE = "remove"
+
+
+def default_trace_dir() -> str:
+	return os.path.join(os.path.expanduser("~"), "nvda_tiktok_downloader_traces")
+
+
+def new_trace_path(directory: Optional[str] = None) -> str:
+	directory = directory or default_trace_dir()
+	return os.path.join(directory, time.strftime("trace-%Y%m%d-%H%M%S.jsonl.gz"))
+
+
+def _open_trace(path: str, mode: str):
+	if path.endswith(".gz"):
+		return gzip.open(path, mode + "t", encoding="utf-8")
+	return open(path, mode, encoding="utf-8")
+
+
+class TraceRecorder:
+
+	def __init__(self, path: str, max_concurrent: Optional[int] = None):
+		self.path = path
+		self._lock = threading.Lock()
+		self._started = time.monotonic()
+		os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+		self._file = _open_trace(path, "w")
+		self.record(KIND_META, None, {"version": TRACE_VERSION, "created": time.time(), "max_concurrent": max_concurrent})
+
+	def record(self, kind: str, d_id: Optional[int], data: Any = None):
+		with self._lock:
+			if self._file is None:
+				return
+			entry = [round(time.monotonic() - self._started, 4), kind, d_id, data]
+			self._file.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+	def wrap_process(self, d_id: int, proc):
+		self.record(KIND_SPAWN, d_id)
+		return RecordingProcess(self, d_id, proc)
+
+	def close(self):
+		with self._lock:
+			if self._file is not None:
+				try:
+					self._file.close()
+				finally:
+					self._file = None
+
+
+class RecordingProcess:
+	"""Passes a yt-dlp Popen through while recording its stdout and exit code."""
+
+	def __init__(self, recorder: TraceRecorder, d_id: int, proc):
+		self._recorder = recorder
+		self._d_id = d_id
+		self._proc = proc
+		self._exit_recorded = False
+		self.stdout = self._iter_stdout()
+
+	def _iter_stdout(self) -> Iterator[str]:
+		for line in self._proc.stdout:
+			self._recorder.record(KIND_LINE, self._d_id, line.rstrip("\r\n"))
+			yield line
+
+	def _record_exit(self, returncode):
+		if returncode is not None and not self._exit_recorded:
+			self._exit_recorded = True
+			self._recorder.record(KIND_EXIT, self._d_id, returncode)
+		return returncode
+
+	def poll(self):
+		return self._record_exit(self._proc.poll())
+
+	def wait(self, timeout=None):
+		return self._record_exit(self._proc.wait(timeout))
+
+	def __getattr__(self, name):
+		return getattr(self._proc, name)
+
+
+def load_trace(path: str) -> List[list]:
+	with _open_trace(path, "r") as f:
+		return [json.loads(line) for line in f if line.strip()]
+
+
+class ReplayProcess:
+	"""Stands in for a yt-dlp Popen by yielding recorded lines.
+
+	speed scales the recorded gaps between lines; 0 replays as fast as possible.
+	"""
+
+	def __init__(self, lines: List[tuple], returncode: int, speed: float):
+		self._lines = lines
+		self._final_returncode = returncode
+		self._speed = speed
+		self._stopped = threading.Event()
+		self.returncode = None
+		self.pid = None
+		self.stdout = self._iter_stdout()
+
+	def _iter_stdout(self) -> Iterator[str]:
+		started = time.monotonic()
+		for offset, line in self._lines:
+			if self._stopped.is_set():
+				return
+			if self._speed > 0:
+				delay = offset / self._speed - (time.monotonic() - started)
+				if delay > 0 and self._stopped.wait(delay):
+					return
+			yield line + "\n"
+		if self.returncode is None:
+			self.returncode = self._final_returncode
+
+	def poll(self):
+		return self.returncode
+
+	def wait(self, timeout=None):
+		if self.returncode is None:
+			for _ in self.stdout:
+				pass
+		return self.returncode
+
+	def terminate(self):
+		if self.returncode is None:
+			self.returncode = -15
+		self._stopped.set()
+
+	def kill(self):
+		if self.returncode is None:
+			self.returncode = -9
+		self._stopped.set()
+
+
+class TraceReplayer:
+	"""Rebuilds jobs and yt-dlp runs from a trace for DownloadManager.
+
+	Runs are matched to downloads by URL, in recorded order, so retries replay
+	the same output they produced in the recorded session.
+	"""
+
+	def __init__(self, records: List[list], speed: float = 1.0):
+		self.speed = speed
+		self.meta: Dict[str, Any] = {}
+		self.jobs: List[Dict[str, Any]] = []
+		self.states: Dict[str, List[str]] = {}
+		self._runs: Dict[str, deque] = {}
+		self._runs_lock = threading.Lock()
+
+		urls: Dict[int, str] = {}
+		jobs_by_id: Dict[int, Dict[str, Any]] = {}
+		open_runs: Dict[int, Dict[str, Any]] = {}
+
+		for t, kind, d_id, data in records:
+			if kind == KIND_META:
+				self.meta = data or {}
+			elif kind == KIND_ADD:
+				urls[d_id] = data["url"]
+				job = {
+					"offset": t,
+					"url": data["url"],
+					"quality": data.get("quality", "best"),
+					"title": data.get("title"),
+					"remove_watermark": data.get("remove_watermark", True),
+				}
+				jobs_by_id[d_id] = job
+				self.jobs.append(job)
+				collapse_state(self.states.setdefault(data["url"], []), STATUS_QUEUED)
+			elif kind == KIND_TITLE and d_id in jobs_by_id:
+				jobs_by_id[d_id]["title"] = data
+			elif kind == KIND_SPAWN and d_id in urls:
+				run = {"started": t, "lines": [], "returncode": 1}
+				open_runs[d_id] = run
+				self._runs.setdefault(urls[d_id], deque()).append(run)
+			elif kind == KIND_LINE and d_id in open_runs:
+				run = open_runs[d_id]
+				run["lines"].append((t - run["started"], data))
+			elif kind == KIND_EXIT and d_id in open_runs:
+				open_runs.pop(d_id)["returncode"] = data
+			elif kind == KIND_STATE and d_id in urls:
+				collapse_state(self.states.setdefault(urls[d_id], []), data)
+
+	@property
+	def line_count(self) -> int:
+		return sum(len(run["lines"]) for runs in self._runs.values() for run in runs)
+
+	@classmethod
+	def from_file(cls, path: str, speed: float = 1.0) -> "TraceReplayer":
+		return cls(load_trace(path), speed)
+
+	def launcher(self, url, output_path, quality_str, progress_hook, remove_watermark=True, **kwargs) -> ReplayProcess:
+		with self._runs_lock:
+			runs = self._runs.get(url)
+			run = runs.popleft() if runs else None
+		if run is None:
+			return ReplayProcess([(0.0, f"ERROR: no recorded run left for {url}")], 1, self.speed)
+		return ReplayProcess(run["lines"], run["returncode"], self.speed)
+
+
+def collapse_state(sequence: List[str], state: str):
+	if not sequence or sequence[-1] != state:
+		sequence.append(state)
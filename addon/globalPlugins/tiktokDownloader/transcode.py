@@ -0,0 +1,412 @@
+import os
+import json
+import signal
+import logging
+import tempfile
+import threading
+import subprocess
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional, Callable, Dict, Any, List
+
+from . import downloader
+
+PROFILE_OFF = "off"
+PROFILE_HEVC = "hevc"
+PROFILE_HEVC_SMALL = "hevc_small"
+PROFILE_AUDIO_CAP = "audio_cap"
+
+MAX_WORKERS = 4
+# How often a waiting worker asks the gate again.
+GATE_POLL = 2.0
+PROBE_TIMEOUT = 60
+# A result this much shorter or longer than the original is treated as broken.
+DURATION_TOLERANCE = 0.02
+MIN_DURATION_SLACK = 1.0
+WORK_SUFFIX = ".ttdl-transcode"
+
+# The sound encoder each container can hold; files in any other container are left alone.
+AUDIO_ENCODERS = {
+	".mp4": "aac",
+	".m4a": "aac",
+	".mov": "aac",
+	".mkv": "aac",
+	".mp3": "libmp3lame",
+	".webm": "libopus",
+}
+# Containers H.265 video can go in. Audio-only ones such as .m4a and .mp3 only carry cover art.
+HEVC_CONTAINERS = (".mp4", ".mov", ".mkv")
+# The hvc1 tag and faststart only mean something to these.
+MP4_CONTAINERS = (".mp4", ".m4a", ".mov")
+PROCESS_SUSPEND_RESUME = 0x0800
+
+
+@dataclass(frozen=True)
+class TranscodeProfile:
+	"""How finished downloads are re-encoded to save space.
+
+	video_crf re-encodes the video to H.265 at that CRF, unless it already is
+	H.265 or the container cannot hold it; audio_kbps re-encodes sound above
+	that bitrate to it, in the container's own codec (AAC in MP4, MP3 in
+	.mp3). Streams left alone are copied.
+	"""
+	key: str
+	video_crf: Optional[int] = None
+	audio_kbps: Optional[int] = None
+
+
+PROFILES: Dict[str, TranscodeProfile] = {
+	PROFILE_HEVC: TranscodeProfile(PROFILE_HEVC, video_crf=28),
+	PROFILE_HEVC_SMALL: TranscodeProfile(PROFILE_HEVC_SMALL, video_crf=32, audio_kbps=96),
+	PROFILE_AUDIO_CAP: TranscodeProfile(PROFILE_AUDIO_CAP, audio_kbps=96),
+}
+
+
+@dataclass
+class MediaInfo:
+	duration: Optional[float]
+	video_codec: Optional[str] = None
+	audio_codec: Optional[str] = None
+	audio_bitrate: Optional[int] = None
+
+	@property
+	def stream_types(self) -> set:
+		return {kind for kind, codec in (("video", self.video_codec), ("audio", self.audio_codec)) if codec}
+
+
+@dataclass
+class TranscodeResult:
+	job_id: Any
+	path: str
+	original_size: int
+	new_size: int
+	# Why the original was kept, or None when it was replaced.
+	kept_reason: Optional[str] = None
+	error: Optional[str] = None
+
+	@property
+	def saved(self) -> int:
+		return self.original_size - self.new_size if self.kept_reason is None and not self.error else 0
+
+
+def probe(path: str) -> Optional[MediaInfo]:
+	"""Reads the duration and the first video and audio stream of a file with ffprobe; None if it cannot."""
+	cmd = [
+		downloader.get_ffprobe_path(),
+		"-v", "error",
+		"-print_format", "json",
+		"-show_entries", "format=duration:stream=codec_type,codec_name,bit_rate",
+		path,
+	]
+	try:
+		result = subprocess.run(
+			downloader.priority_prefix(downloader.PRIORITY_IDLE) + cmd,
+			capture_output=True,
+			check=False,
+			timeout=PROBE_TIMEOUT,
+			**downloader.popen_kwargs(downloader.PRIORITY_IDLE),
+		)
+		if result.returncode != 0:
+			return None
+		data = json.loads(result.stdout.decode("utf-8", errors="replace"))
+	except (OSError, ValueError, subprocess.TimeoutExpired):
+		return None
+
+	try:
+		duration = float((data.get("format") or {}).get("duration"))
+	except (TypeError, ValueError):
+		duration = None
+	info = MediaInfo(duration=duration)
+	for stream in data.get("streams") or []:
+		kind = stream.get("codec_type")
+		if kind == "video" and info.video_codec is None:
+			info.video_codec = stream.get("codec_name") or "unknown"
+		elif kind == "audio" and info.audio_codec is None:
+			info.audio_codec = stream.get("codec_name") or "unknown"
+			bit_rate = stream.get("bit_rate")
+			info.audio_bitrate = int(bit_rate) if isinstance(bit_rate, str) and bit_rate.isdigit() else None
+	return info
+
+
+def codec_args(profile: TranscodeProfile, source: MediaInfo, ext: str) -> Optional[List[str]]:
+	"""The ffmpeg codec options that apply profile to source in an ext file; None if the profile would change nothing."""
+	ext = ext.lower()
+	audio_encoder = AUDIO_ENCODERS.get(ext)
+	if audio_encoder is None:
+		return None
+	args = []
+	changed = False
+	if source.video_codec:
+		# Cover art in an m4a or mp3 shows up as an mjpeg video stream; it is not worth encoding.
+		if profile.video_crf is not None and ext in HEVC_CONTAINERS and source.video_codec not in ("hevc", "mjpeg", "png"):
+			args += ["-c:v", "libx265", "-crf", str(profile.video_crf), "-preset", "medium", "-x265-params", "log-level=error"]
+			if ext in MP4_CONTAINERS:
+				args += ["-tag:v", "hvc1"]
+			changed = True
+		else:
+			args += ["-c:v", "copy"]
+	if source.audio_codec:
+		cap = profile.audio_kbps
+		# Sound a little over the cap, or of unknown bitrate, is not worth a lossy generation.
+		if cap is not None and source.audio_bitrate and source.audio_bitrate > cap * 1000 * 1.1:
+			args += ["-c:a", audio_encoder, "-b:a", f"{cap}k"]
+			changed = True
+		else:
+			args += ["-c:a", "copy"]
+	return args if changed else None
+
+
+def container_args(ext: str) -> List[str]:
+	"""The ffmpeg output options for an ext file."""
+	if ext.lower() in MP4_CONTAINERS:
+		return ["-movflags", "+faststart"]
+	return []
+
+
+def _set_suspended(proc: subprocess.Popen, suspended: bool) -> bool:
+	"""Pauses or resumes proc; False if it could not be."""
+	try:
+		if os.name == "nt":
+			import ctypes
+			from ctypes import wintypes
+			kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+			ntdll = ctypes.WinDLL("ntdll")
+			kernel32.OpenProcess.restype = wintypes.HANDLE
+			kernel32.OpenProcess.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.DWORD]
+			kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+			call = ntdll.NtSuspendProcess if suspended else ntdll.NtResumeProcess
+			call.argtypes = [wintypes.HANDLE]
+			handle = kernel32.OpenProcess(PROCESS_SUSPEND_RESUME, False, proc.pid)
+			if not handle:
+				return False
+			try:
+				return call(handle) == 0
+			finally:
+				kernel32.CloseHandle(handle)
+		os.kill(proc.pid, signal.SIGSTOP if suspended else signal.SIGCONT)
+		return True
+	except (OSError, AttributeError, ImportError):
+		return False
+
+
+def _work_path(path: str) -> str:
+	"""Where the new file is written: on the same volume as path, so replacing path is a rename."""
+	directory = os.path.dirname(path)
+	base, ext = os.path.splitext(os.path.basename(path))
+	temp_dir = downloader.get_temp_path(directory)
+	if not downloader._same_volume(temp_dir, directory):
+		temp_dir = directory
+	return os.path.join(temp_dir, base + WORK_SUFFIX + ext)
+
+
+def verify(source: MediaInfo, output_path: str) -> Optional[str]:
+	"""Checks the new file with ffprobe; returns what is wrong with it, or None."""
+	result = probe(output_path)
+	if result is None:
+		return "ffprobe cannot read the result"
+	if result.stream_types != source.stream_types:
+		return "the result is missing a stream"
+	if source.duration and result.duration is not None:
+		slack = max(MIN_DURATION_SLACK, source.duration * DURATION_TOLERANCE)
+		if abs(result.duration - source.duration) > slack:
+			return f"the result lasts {result.duration:.1f}s instead of {source.duration:.1f}s"
+	elif source.duration:
+		return "the result has no duration"
+	return None
+
+
+class TranscodePool:
+	"""Re-encodes finished downloads with a storage profile in the background.
+
+	At most `workers` ffmpeg processes run, at idle priority. Before each
+	job a worker waits until gate() is true, which the manager makes mean
+	no download is running or queued, so the pool never competes with
+	downloads. A running ffmpeg is paused within GATE_POLL seconds of the
+	gate closing and resumed once it opens; where it cannot be paused it
+	carries on at idle priority. The result goes to a temp file on the same volume, is checked
+	with ffprobe and replaces the original with a rename only if it is
+	smaller. Jobs still waiting when NVDA exits are dropped.
+	"""
+
+	def __init__(
+		self,
+		workers: int = 1,
+		gate: Optional[Callable[[], bool]] = None,
+		on_done: Optional[Callable[[TranscodeResult], None]] = None,
+	):
+		self._workers = max(1, min(MAX_WORKERS, int(workers)))
+		self._gate = gate
+		self._on_done = on_done
+		self._lock = threading.Lock()
+		self._jobs: deque = deque()
+		self._running: Dict[int, subprocess.Popen] = {}
+		self._threads = 0
+		self._wake = threading.Condition()
+		self._stopping = False
+
+	def submit(self, job_id: Any, path: str, profile_key: str, threads: int = 0) -> bool:
+		"""Queues path for profile_key; threads caps each ffmpeg's threads, 0 lets it choose."""
+		profile = PROFILES.get(profile_key)
+		if profile is None or not os.path.isfile(path):
+			return False
+		with self._lock:
+			if self._stopping:
+				return False
+			self._jobs.append((job_id, path, profile, threads))
+			start = self._threads < self._workers
+			if start:
+				self._threads += 1
+		if start:
+			threading.Thread(target=self._worker, name="TikTokTranscode", daemon=True).start()
+		return True
+
+	def pending_count(self) -> int:
+		with self._lock:
+			return len(self._jobs) + len(self._running)
+
+	def set_workers(self, workers: int):
+		with self._lock:
+			self._workers = max(1, min(MAX_WORKERS, int(workers)))
+			extra = max(0, min(len(self._jobs), self._workers - self._threads))
+			self._threads += extra
+		for _n in range(extra):
+			threading.Thread(target=self._worker, name="TikTokTranscode", daemon=True).start()
+
+	def wake(self):
+		"""Has waiting and paused workers ask the gate again now instead of at their next poll."""
+		with self._wake:
+			self._wake.notify_all()
+
+	def stop(self):
+		"""Drops the waiting jobs and kills the running ones; their originals are kept."""
+		with self._lock:
+			self._stopping = True
+			self._jobs.clear()
+			running = list(self._running.values())
+		for proc in running:
+			try:
+				proc.kill()
+			except Exception:
+				pass
+		self.wake()
+
+	def _worker(self):
+		ident = threading.get_ident()
+		while True:
+			while not self._stopping and self._gate is not None and not self._gate():
+				self._sleep()
+			with self._lock:
+				if self._stopping or not self._jobs or self._threads > self._workers:
+					self._threads -= 1
+					return
+				job_id, path, profile, threads = self._jobs.popleft()
+			try:
+				result = self._transcode(ident, job_id, path, profile, threads)
+			except Exception as e:
+				logging.error(f"Transcoding {path} failed: {e}")
+				result = TranscodeResult(job_id, path, 0, 0, error=str(e))
+			if self._stopping:
+				continue
+			if self._on_done:
+				try:
+					self._on_done(result)
+				except Exception:
+					pass
+
+	def _transcode(self, ident: int, job_id: Any, path: str, profile: TranscodeProfile, threads: int) -> TranscodeResult:
+		original_size = os.path.getsize(path)
+		ext = os.path.splitext(path)[1]
+		if ext.lower() not in AUDIO_ENCODERS:
+			return TranscodeResult(job_id, path, original_size, original_size, kept_reason=f"{ext or 'this'} files are not shrunk")
+		source = probe(path)
+		if source is None:
+			return TranscodeResult(job_id, path, original_size, original_size, error="ffprobe cannot read the download")
+		args = codec_args(profile, source, ext)
+		if args is None:
+			return TranscodeResult(job_id, path, original_size, original_size, kept_reason="already within the profile")
+
+		work_path = _work_path(path)
+		cmd = [
+			downloader.get_ffmpeg_path(),
+			"-y", "-hide_banner", "-nostdin", "-loglevel", "error",
+			"-i", path,
+			"-map", "0:v?", "-map", "0:a?", "-map_metadata", "0",
+			*args,
+		]
+		if threads > 0:
+			cmd += ["-threads", str(threads)]
+		cmd += container_args(ext) + [work_path]
+		# The encode is polled rather than communicated with, so stderr goes to a file nothing has to drain.
+		err_file = tempfile.TemporaryFile()
+		try:
+			with self._lock:
+				if self._stopping:
+					return TranscodeResult(job_id, path, original_size, original_size, kept_reason="stopped")
+				proc = downloader.start_process(
+					cmd,
+					downloader.PRIORITY_IDLE,
+					stdout=subprocess.DEVNULL,
+					stderr=err_file,
+					stdin=subprocess.DEVNULL,
+				)
+				self._running[ident] = proc
+			try:
+				self._wait_gated(proc)
+			finally:
+				with self._lock:
+					self._running.pop(ident, None)
+			if self._stopping:
+				return TranscodeResult(job_id, path, original_size, original_size, kept_reason="stopped")
+			if proc.returncode != 0:
+				err_file.seek(0)
+				lines = [line for line in err_file.read().decode("utf-8", errors="replace").splitlines() if line.strip()]
+				return TranscodeResult(
+					job_id, path, original_size, original_size,
+					error=lines[-1] if lines else f"ffmpeg exited with code {proc.returncode}",
+				)
+
+			problem = verify(source, work_path)
+			if problem:
+				return TranscodeResult(job_id, path, original_size, original_size, error=problem)
+			new_size = os.path.getsize(work_path)
+			if new_size >= original_size:
+				return TranscodeResult(job_id, path, original_size, original_size, kept_reason="the result was not smaller")
+
+			# Keep the download's date, so a folder sorted by date stays in download order.
+			stat = os.stat(path)
+			os.utime(work_path, (stat.st_atime, stat.st_mtime))
+			os.replace(work_path, path)
+			return TranscodeResult(job_id, path, original_size, new_size)
+		finally:
+			err_file.close()
+			try:
+				os.remove(work_path)
+			except OSError:
+				pass
+
+	def _sleep(self):
+		with self._wake:
+			self._wake.wait(GATE_POLL)
+
+	def _wait_gated(self, proc: subprocess.Popen):
+		"""Waits for proc to exit, pausing it while the gate is closed."""
+		paused = False
+		while True:
+			if paused:
+				# A paused process cannot exit by itself; wake() or stop() end the wait early.
+				self._sleep()
+				if proc.poll() is not None:
+					return
+			else:
+				try:
+					proc.wait(GATE_POLL)
+					return
+				except subprocess.TimeoutExpired:
+					pass
+			if self._gate is None or self._stopping:
+				continue
+			gate_open = self._gate()
+			if paused and gate_open:
+				paused = not _set_suspended(proc, False)
+			elif not paused and not gate_open:
+				paused = _set_suspended(proc, True)
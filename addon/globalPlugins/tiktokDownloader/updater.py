@@ -0,0 +1,147 @@
+import os
+import re
+import shutil
+import logging
+import threading
+import subprocess
+from typing import Optional, Tuple
+
+import addonHandler
+addonHandler.initTranslation()
+
+from . import downloader
+
+UPDATE_TIMEOUT = 120
+VERSION_TIMEOUT = 30
+# Checks at startup are skipped when the last one is more recent than this.
+CHECK_INTERVAL = 24 * 60 * 60
+
+_VERSION_RE = re.compile(r"^\d{4}\.\d{2}\.\d{2}[\w.-]*$")
+
+
+def _run(cmd, timeout):
+	return subprocess.run(
+		downloader.priority_prefix(downloader.PRIORITY_BELOW_NORMAL) + cmd,
+		capture_output=True,
+		text=True,
+		check=False,
+		encoding="utf-8",
+		errors="replace",
+		timeout=timeout,
+		**downloader.popen_kwargs(downloader.PRIORITY_BELOW_NORMAL),
+	)
+
+
+def get_version(path: str) -> Optional[str]:
+	"""Runs `yt-dlp --version`; None unless the binary starts and prints a version."""
+	try:
+		proc = _run([path, "--version"], VERSION_TIMEOUT)
+	except Exception as e:
+		logging.error(f"yt-dlp smoke test failed for {path}: {e}")
+		return None
+	lines = (proc.stdout or "").strip().splitlines()
+	version = lines[-1].strip() if lines else ""
+	if proc.returncode != 0 or not _VERSION_RE.match(version):
+		return None
+	return version
+
+
+class YtDlpUpdater:
+	"""Updates yt-dlp next to the binary that downloads are using.
+
+	The current binary is copied to a staging file and `-U` runs on the copy.
+	A copy that passes a `--version` smoke test is renamed to
+	yt-dlp-<version>.exe and the yt-dlp.current pointer is swapped to it with
+	an atomic rename. Downloads that already started keep running on the
+	previous binary; the next ones pick the new one up from get_yt_dlp_path().
+	"""
+
+	def __init__(self, bin_dir: Optional[str] = None):
+		self._bin_dir = bin_dir
+		self._lock = threading.Lock()
+
+	@property
+	def bin_dir(self) -> str:
+		# Read at call time so benchmarks can point downloader.BIN_DIR elsewhere.
+		return self._bin_dir or downloader.BIN_DIR
+
+	def update(self) -> str:
+		if not self._lock.acquire(blocking=False):
+			return _("A yt-dlp update check is already running.")
+		try:
+			return self._update()
+		finally:
+			self._lock.release()
+
+	def _update(self) -> str:
+		current = downloader.get_yt_dlp_path()
+		if not os.path.exists(current):
+			return _("yt-dlp executable not found.")
+		# Staging files left by a failed or interrupted run, and binaries an earlier update could not remove.
+		self._remove_old_binaries(keep={os.path.basename(current)})
+
+		staging = os.path.join(self.bin_dir, f"yt-dlp-staging-{os.getpid()}.exe")
+		try:
+			logging.info("Checking for yt-dlp updates...")
+			shutil.copy2(current, staging)
+			proc = _run([staging, "-U"], UPDATE_TIMEOUT)
+			output = (proc.stdout or "") + "\n" + (proc.stderr or "")
+			logging.info(f"Update Output: {output}")
+
+			if "up-to-date" in output or "is up to date" in output:
+				return _("yt-dlp is up to date.")
+			if "Updating to version" not in output and "Updated yt-dlp to" not in output:
+				return _("Update Info: {}").format(output.strip()[:200])
+
+			version = get_version(staging)
+			if not version:
+				logging.error("Updated yt-dlp failed the smoke test; keeping the current version")
+				return _("The yt-dlp update could not be verified, so the current version is kept.")
+
+			installed = self._install(staging, version, current)
+			staging = None
+			self._remove_old_binaries(keep={os.path.basename(installed), os.path.basename(current)})
+			return _("Updated yt-dlp to version {}.").format(version)
+		except Exception as e:
+			logging.error(f"Auto-update failed: {e}")
+			return _("Update failed: {}").format(str(e))
+		finally:
+			if staging:
+				self._remove(staging)
+
+	def _install(self, staging: str, version: str, current: str) -> str:
+		target = os.path.join(self.bin_dir, f"yt-dlp-{version}.exe")
+		if os.path.normcase(target) == os.path.normcase(current):
+			self._remove(staging)
+			return target
+		os.replace(staging, target)
+		self.set_current(target)
+		return target
+
+	def set_current(self, path: str):
+		"""Points get_yt_dlp_path() at path, replacing the pointer file in one rename."""
+		pointer = os.path.join(self.bin_dir, downloader.YT_DLP_POINTER)
+		tmp = pointer + ".tmp"
+		with open(tmp, "w", encoding="utf-8") as f:
+			f.write(os.path.basename(path))
+		os.replace(tmp, pointer)
+
+	def _remove_old_binaries(self, keep):
+		for name in os.listdir(self.bin_dir):
+			if name.startswith("yt-dlp-") and name not in keep:
+				# Fails on Windows while an older download still runs it; the next update retries.
+				self._remove(os.path.join(self.bin_dir, name))
+
+	@staticmethod
+	def _remove(path: str):
+		try:
+			os.remove(path)
+		except OSError:
+			pass
+
+
+UPDATER = YtDlpUpdater()
+
+
+def is_check_due(last_check: int, now: float) -> bool:
+	return not last_check or now - last_check >= CHECK_INTERVAL or last_check > now
@@ -0,0 +1,136 @@
+import re
+from typing import List, Iterable, Iterator, Optional
+from urllib.parse import urlparse, urlunparse
+
+TIKTOK_HOSTS = ("tiktok.com", "www.tiktok.com", "m.tiktok.com", "vm.tiktok.com", "vt.tiktok.com")
+SHORT_HOSTS = ("vm.tiktok.com", "vt.tiktok.com")
+
+# The lookbehind keeps hosts such as nottiktok.com or evil-tiktok.com from matching as tiktok.com.
+_URL_RE = re.compile(r"(?<![\w.-])(?:https?://)?(?:[a-z0-9-]+\.)*tiktok\.com/[^\s<>\"'`]*", re.IGNORECASE)
+_TRAILING = ".,;:!?)]}"
+
+KIND_VIDEO = "video"
+KIND_PHOTO = "photo"
+KIND_PROFILE = "profile"
+KIND_HASHTAG = "hashtag"
+KIND_SOUND = "sound"
+COLLECTION_KINDS = (KIND_PROFILE, KIND_HASHTAG, KIND_SOUND)
+
+_PROFILE_RE = re.compile(r"^/@[^/]+/?$")
+_HASHTAG_RE = re.compile(r"^/tag/[^/]+/?$")
+_SOUND_RE = re.compile(r"^/music/[^/]+/?$")
+_PHOTO_RE = re.compile(r"^/@[^/]+/photo/\d+/?$")
+_VIDEO_RE = re.compile(r"^/(?:@[^/]+/video/\d+|v/\d+(?:\.html)?|embed(?:/v2)?/\d+|t/[A-Za-z0-9]+)/?$")
+_SHORT_RE = re.compile(r"^/[A-Za-z0-9]+/?$")
+
+
+def is_tiktok_url(url: str) -> bool:
+	if not url:
+		return False
+	try:
+		u = url.strip()
+		if "://" not in u:
+			u = "https://" + u
+		host = (urlparse(u).hostname or "").lower()
+		return host in TIKTOK_HOSTS
+	except Exception:
+		return False
+
+
+def normalize_url(url: str) -> str:
+	"""Canonical form used to tell duplicate links apart.
+
+	Video pages lose their tracking query (?is_from_webapp=1&sender_device=...)
+	and fragment; short vm./vt. links keep their path, which is the video key.
+	"""
+	u = url.strip().rstrip(_TRAILING)
+	if "://" not in u:
+		u = "https://" + u
+	try:
+		parsed = urlparse(u)
+	except ValueError:
+		return u
+	host = (parsed.hostname or "").lower()
+	path = parsed.path or "/"
+	if host in ("tiktok.com", "m.tiktok.com"):
+		host = "www.tiktok.com"
+	return urlunparse(("https", host, path, "", "", ""))
+
+
+def classify_url(url: str) -> Optional[str]:
+	"""Tells a single video or photo post from a profile, hashtag or sound page.
+
+	None if it is not a TikTok link, or is one to a page with nothing to
+	download, such as the home, For You or Explore page. Short vm./vt. and
+	/t/ links count as videos; one may still turn out to be a photo post
+	once the download resolves it.
+	"""
+	if not is_tiktok_url(url):
+		return None
+	u = url.strip()
+	if "://" not in u:
+		u = "https://" + u
+	try:
+		parsed = urlparse(u)
+	except ValueError:
+		return None
+	path = parsed.path or "/"
+	if (parsed.hostname or "").lower() in SHORT_HOSTS:
+		return KIND_VIDEO if _SHORT_RE.match(path) else None
+	if _PROFILE_RE.match(path):
+		return KIND_PROFILE
+	if _HASHTAG_RE.match(path):
+		return KIND_HASHTAG
+	if _SOUND_RE.match(path):
+		return KIND_SOUND
+	if _PHOTO_RE.match(path):
+		return KIND_PHOTO
+	if _VIDEO_RE.match(path):
+		return KIND_VIDEO
+	return None
+
+
+def as_video_url(url: str) -> str:
+	"""The /video/ form of a /photo/ link, which yt-dlp can read when the post turns out to be a video."""
+	u = url.strip()
+	try:
+		parsed = urlparse(u if "://" in u else "https://" + u)
+	except ValueError:
+		return url
+	if not _PHOTO_RE.match(parsed.path or ""):
+		return url
+	return urlunparse(parsed._replace(path=parsed.path.replace("/photo/", "/video/", 1)))
+
+
+def is_collection_url(url: str) -> bool:
+	return classify_url(url) in COLLECTION_KINDS
+
+
+def extract_urls(text: str) -> List[str]:
+	"""Returns every TikTok link to something downloadable in text, normalized, in order and without duplicates."""
+	if not text or "tiktok.com" not in text.lower():
+		return []
+	seen = set()
+	found = []
+	for match in _URL_RE.finditer(text):
+		candidate = match.group(0).rstrip(_TRAILING)
+		if classify_url(candidate) is None:
+			continue
+		url = normalize_url(candidate)
+		if url not in seen:
+			seen.add(url)
+			found.append(url)
+	return found
+
+
+def iter_urls(lines: Iterable[str]) -> Iterator[str]:
+	"""Streams the TikTok links found in lines of text or CSV, without duplicates.
+
+	Only the set of links seen so far is kept, so a file is never read whole.
+	"""
+	seen = set()
+	for line in lines:
+		for url in extract_urls(line):
+			if url not in seen:
+				seen.add(url)
+				yield url
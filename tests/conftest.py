@@ -0,0 +1,69 @@
+"""Loads the add-on headlessly for the tests, with the stubs from tools/harness.py.
+
+NVDA's modules are replaced before the package is imported, as the
+benchmarks do, so the tests run on any platform with plain pytest.
+"""
+import logging
+import os
+import shutil
+import sys
+import time
+
+import pytest
+
+TOOLS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools")
+sys.path.insert(0, TOOLS_DIR)
+import harness  # noqa: E402
+
+harness.install_stubs()
+manager_mod, downloader_mod = harness.load_package()
+
+
+@pytest.fixture
+def conf():
+	values = sys.modules["config"].conf["tiktokDownloader"]
+	saved = dict(values)
+	yield values
+	values.clear()
+	values.update(saved)
+
+
+@pytest.fixture
+def workspace(monkeypatch, conf):
+	"""A download folder, home folder and bin folder whose yt-dlp is tools/fake_yt_dlp.py."""
+	ws = harness.make_workspace()
+	monkeypatch.setenv("HOME", ws["home"])
+	monkeypatch.setenv("USERPROFILE", ws["home"])
+	monkeypatch.setattr(downloader_mod, "BIN_DIR", ws["bin"])
+	conf.update({
+		"downloadPath": ws["downloads"],
+		"autoRetryAttempts": 0,
+		"stallTimeout": 60,
+		"mergeTimeout": 300,
+		"minSpeedKbps": 0,
+		"resolveTimeout": 30,
+		"totalDownloads": 0,
+		"processPriority": downloader_mod.PRIORITY_NORMAL,
+		"cpuAffinity": "",
+		"ffmpegThreads": 0,
+	})
+	logging.disable(logging.CRITICAL)
+	yield ws
+	logging.disable(logging.NOTSET)
+	shutil.rmtree(ws["root"], ignore_errors=True)
+
+
+def wait_until(predicate, timeout=30.0, interval=0.02):
+	deadline = time.monotonic() + timeout
+	while time.monotonic() < deadline:
+		if predicate():
+			return True
+		time.sleep(interval)
+	return predicate()
+
+
+def wait_finished(manager, d_ids, timeout=30.0):
+	def finished():
+		return all(manager_mod.is_finished_status(manager.get_snapshot(d_id)["state"]) for d_id in d_ids)
+	assert wait_until(finished, timeout), [manager.get_snapshot(d_id)["status"] for d_id in d_ids]
+	return [manager.get_snapshot(d_id) for d_id in d_ids]
@@ -0,0 +1,56 @@
+"""Runs tools/bench_e2e.py with a wall-clock budget, so a throughput regression fails the suite.
+
+Needs a Python with yt-dlp and an ffmpeg binary; the tests are skipped
+without them. Point them at other ones with TTDL_E2E_PYTHON and
+TTDL_E2E_FFMPEG, and change the per-level budget with TTDL_E2E_MAX_WALL
+(seconds).
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH = os.path.join(ROOT, "tools", "bench_e2e.py")
+E2E_PYTHON = os.environ.get("TTDL_E2E_PYTHON", sys.executable)
+E2E_FFMPEG = os.environ.get("TTDL_E2E_FFMPEG") or shutil.which("ffmpeg")
+MAX_WALL = float(os.environ.get("TTDL_E2E_MAX_WALL", "60"))
+
+
+def _has_yt_dlp():
+	try:
+		return subprocess.run([E2E_PYTHON, "-c", "import yt_dlp"], capture_output=True, timeout=60).returncode == 0
+	except (OSError, subprocess.TimeoutExpired):
+		return False
+
+
+pytestmark = pytest.mark.skipif(
+	not E2E_FFMPEG or not _has_yt_dlp(),
+	reason="needs ffmpeg and a Python with yt-dlp (TTDL_E2E_FFMPEG, TTDL_E2E_PYTHON)",
+)
+
+
+def _run_bench(*extra):
+	result = subprocess.run(
+		[sys.executable, BENCH, "--python", E2E_PYTHON, "--ffmpeg", E2E_FFMPEG, "--max-wall", str(MAX_WALL), "--timeout", str(MAX_WALL * 2), "--json", *extra],
+		capture_output=True,
+		text=True,
+		timeout=MAX_WALL * 10,
+	)
+	assert result.returncode == 0, result.stderr[-2000:]
+	return json.loads(result.stdout)
+
+
+def test_downloads_finish_within_budget():
+	for level in _run_bench("--concurrency", "1", "3", "--jobs", "4")["results"]:
+		assert level["states"] == {"Completed": 4}, level
+		assert level["merge_p95_s"] is not None
+
+
+def test_rate_limits_and_resets_are_retried_within_budget():
+	report = _run_bench("--concurrency", "2", "--jobs", "6", "--fail-429-every", "5", "--reset-every", "7", "--retries", "2")
+	assert report["faults"]["429"] and report["faults"]["resets"]
+	assert report["results"][0]["states"] == {"Completed": 6}, report["results"][0]
@@ -0,0 +1,91 @@
+import os
+import shutil
+
+from conftest import downloader_mod, manager_mod, wait_finished
+
+
+def test_temp_path_is_hidden_folder_in_download_folder(tmp_path):
+	temp_path = downloader_mod.get_temp_path(str(tmp_path))
+
+	assert temp_path == os.path.join(str(tmp_path), downloader_mod.TEMP_DIR_NAME)
+	assert os.path.isdir(temp_path)
+	assert os.stat(temp_path).st_dev == os.stat(str(tmp_path)).st_dev
+
+
+def test_temp_path_falls_back_to_system_temp_when_not_writable(tmp_path, monkeypatch):
+	blocked = os.path.join(str(tmp_path), downloader_mod.TEMP_DIR_NAME)
+	real_access = os.access
+	# chmod does not stop root, so the check itself is made to fail.
+	monkeypatch.setattr(downloader_mod.os, "access", lambda path, mode: False if path == blocked else real_access(path, mode))
+
+	assert downloader_mod.get_temp_path(str(tmp_path)) == downloader_mod._system_temp_path()
+
+
+def test_temp_path_falls_back_to_system_temp_on_another_volume(tmp_path, monkeypatch):
+	monkeypatch.setattr(downloader_mod, "_same_volume", lambda a, b: False)
+
+	assert downloader_mod.get_temp_path(str(tmp_path)) == downloader_mod._system_temp_path()
+
+
+def test_move_out_of_temp_path_is_a_rename(tmp_path, monkeypatch):
+	# yt-dlp moves the finished file with shutil.move, which only copies across volumes.
+	temp_file = os.path.join(downloader_mod.get_temp_path(str(tmp_path)), "clip.mp4")
+	with open(temp_file, "wb") as f:
+		f.write(b"\0" * 4096)
+	inode = os.stat(temp_file).st_ino
+
+	def no_copy(*args, **kwargs):
+		raise AssertionError("the file was copied instead of renamed")
+	monkeypatch.setattr(shutil, "copy2", no_copy)
+	monkeypatch.setattr(shutil, "copyfile", no_copy)
+	final = shutil.move(temp_file, os.path.join(str(tmp_path), "clip.mp4"))
+
+	assert os.stat(final).st_ino == inode
+
+
+def test_download_finishes_through_temp_folder(workspace):
+	# The fake yt-dlp moves its result with os.replace, which fails across volumes.
+	manager = manager_mod.DownloadManager()
+	d_id = manager.start_download("https://www.tiktok.com/@user/video/7300000000000000001", "best")
+
+	snapshot, = wait_finished(manager, [d_id])
+
+	temp_path = os.path.join(workspace["downloads"], downloader_mod.TEMP_DIR_NAME)
+	assert snapshot["state"] == manager_mod.STATUS_COMPLETED
+	assert os.path.dirname(snapshot["file_path"]) == workspace["downloads"]
+	assert os.path.isfile(snapshot["file_path"])
+	assert os.listdir(temp_path) == []
+
+
+def test_temp_file_variants_cover_yt_dlp_partial_names():
+	path = os.path.join("dl", "Clip.f137.mp4")
+
+	assert downloader_mod.temp_file_variants(path) == [
+		path,
+		path + ".part",
+		path + ".ytdl",
+		path + ".temp",
+		os.path.join("dl", "Clip.f137.temp.mp4"),
+	]
+
+
+def test_cleanup_removes_partials_and_keeps_the_finished_file(tmp_path, monkeypatch):
+	names = ["Clip.f137.mp4", "Clip.f137.mp4.part", "Clip.f137.mp4.ytdl", "Clip.f140.m4a.part", "Clip.temp.mp4", "Clip.mp4", "Other.mp4"]
+	for name in names:
+		(tmp_path / name).write_bytes(b"\0")
+	recorded = [str(tmp_path / "Clip.f137.mp4"), str(tmp_path / "Clip.f140.m4a"), str(tmp_path / "Clip.mp4")]
+	# The kept path may come in another form than the recorded one.
+	monkeypatch.chdir(tmp_path)
+
+	removed = downloader_mod.cleanup_job_files(recorded, keep=[None, "Clip.mp4"])
+
+	assert removed == 5
+	assert sorted(os.listdir(tmp_path)) == ["Clip.mp4", "Other.mp4"]
+
+
+def test_cleanup_without_a_keep_list_removes_every_variant(tmp_path):
+	(tmp_path / "Clip.mp4").write_bytes(b"\0")
+	(tmp_path / "Clip.mp4.part").write_bytes(b"\0")
+
+	assert downloader_mod.cleanup_job_files([str(tmp_path / "Clip.mp4"), "", None]) == 2
+	assert os.listdir(tmp_path) == []
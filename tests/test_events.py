@@ -0,0 +1,76 @@
+import json
+
+from conftest import manager_mod
+
+events = manager_mod.events
+
+
+def _tagged(tag, payload):
+	return events.PREFIX + tag + ":" + json.dumps(payload)
+
+
+def test_progress_line_is_parsed_from_json():
+	event = events.parse_line(_tagged(events.PROGRESS_TAG, {
+		"status": "downloading",
+		"downloaded_bytes": 1024,
+		"total_bytes": None,
+		"total_bytes_estimate": 4096.0,
+		"speed": 512.5,
+		"eta": 6,
+		"filename": "C:\\Downloads\\.ttdl-tmp\\Clip.f1.mp4",
+		"tmpfilename": "C:\\Downloads\\.ttdl-tmp\\Clip.f1.mp4.part",
+	}))
+
+	assert isinstance(event, events.ProgressEvent)
+	assert event.downloaded_bytes == 1024
+	assert event.total_bytes == 4096
+	assert event.percent == 25.0
+	assert event.speed == 512.5
+	assert event.tmpfilename.endswith(".part")
+
+
+def test_finished_progress_is_complete_without_sizes():
+	event = events.parse_line(_tagged(events.PROGRESS_TAG, {"status": "finished"}))
+
+	assert event.percent == 100.0
+
+
+def test_malformed_progress_falls_back_to_a_log_line():
+	line = events.PREFIX + events.PROGRESS_TAG + ":{not json"
+
+	event = events.parse_line(line)
+
+	assert isinstance(event, events.LogEvent)
+	assert event.line == line
+
+
+def test_info_line_counts_formats_and_falls_back_to_approximate_size():
+	event = events.parse_line(_tagged(events.INFO_TAG, {
+		"id": "7300000000000000001",
+		"title": "Clip: \"quoted\" title",
+		"ext": "mp4",
+		"format_id": "bytevc1_1080p+audio",
+		"vcodec": "h265",
+		"filesize": None,
+		"filesize_approx": 2048,
+	}))
+
+	assert event.title == "Clip: \"quoted\" title"
+	assert event.format_count == 2
+	assert event.filesize == 2048
+	assert not event.is_audio_only
+
+
+def test_file_paths_survive_quotes_and_non_ascii():
+	path = "C:\\Downloads\\Clip \"ünïcødé\" 🎵.mp4"
+
+	event = events.parse_line(_tagged(events.FILEPATH_TAG, path))
+
+	assert event == events.FileEvent(stage="after_move", path=path)
+
+
+def test_plain_yt_dlp_lines_are_still_recognised():
+	assert events.parse_line('[Merger] Merging formats into "C:\\Downloads\\Clip.mp4"') == events.MergeEvent("C:\\Downloads\\Clip.mp4")
+	assert events.parse_line("[download] Destination: C:\\Downloads\\Clip.f1.mp4") == events.DestinationEvent("C:\\Downloads\\Clip.f1.mp4")
+	assert isinstance(events.parse_line("[download] Clip.mp4 has already been downloaded"), events.AlreadyDownloadedEvent)
+	assert events.parse_line("") is None
@@ -0,0 +1,69 @@
+import shutil
+import sys
+import textwrap
+import threading
+
+import harness
+from conftest import downloader_mod, manager_mod
+
+expander = manager_mod.expander
+
+# Writes more stderr than a pipe holds before each entry, as a chatty yt-dlp does, then fails.
+LISTER = textwrap.dedent("""
+	import json, sys
+	for n in range(1, 6):
+		sys.stderr.write("WARNING: slow page\\n" * 20000)
+		sys.stderr.flush()
+		print(json.dumps({"playlist_index": n, "id": str(n), "url": f"https://www.tiktok.com/@user/video/{n}", "title": f"Clip {n}"}), flush=True)
+	sys.stderr.write("ERROR: listing ended early\\n")
+	sys.exit(1)
+""")
+
+
+def test_listing_survives_a_full_stderr_and_reports_its_last_line(tmp_path, monkeypatch):
+	script = tmp_path / "lister.py"
+	script.write_text(LISTER)
+	workspace = harness.make_workspace(yt_dlp_command=f'"{sys.executable}" "{script}"')
+	monkeypatch.setattr(downloader_mod, "BIN_DIR", workspace["bin"])
+	lister = expander.PlaylistExpander("https://www.tiktok.com/@user", priority=downloader_mod.PRIORITY_NORMAL)
+	pages = []
+
+	worker = threading.Thread(target=lambda: pages.extend([lister.next_page(2), lister.next_page(2), lister.next_page(2), lister.next_page(2)]), daemon=True)
+	worker.start()
+	worker.join(30)
+	lister.close()
+	shutil.rmtree(workspace["root"], ignore_errors=True)
+
+	assert not worker.is_alive(), "the listing blocked on its stderr"
+	assert [[v.index for v in page] for page in pages] == [[1, 2], [3, 4], [5], []]
+	assert lister.error == "ERROR: listing ended early"
+	assert lister._stderr is None
+
+
+ENDLESS_LISTER = textwrap.dedent("""
+	import json, sys
+	n = 0
+	while True:
+		n += 1
+		print(json.dumps({"playlist_index": n, "id": str(n), "url": f"https://www.tiktok.com/@user/video/{n}"}), flush=True)
+""")
+
+
+def test_close_part_way_finishes_the_listing_at_once(tmp_path, monkeypatch):
+	script = tmp_path / "lister.py"
+	script.write_text(ENDLESS_LISTER)
+	workspace = harness.make_workspace(yt_dlp_command=f'"{sys.executable}" "{script}"')
+	monkeypatch.setattr(downloader_mod, "BIN_DIR", workspace["bin"])
+	lister = expander.PlaylistExpander("https://www.tiktok.com/@user", priority=downloader_mod.PRIORITY_NORMAL)
+
+	try:
+		assert len(lister.next_page(3)) == 3
+		lister.close()
+
+		# The process was reaped and its stderr file closed, without waiting for garbage collection.
+		assert lister._proc.returncode is not None
+		assert lister._stderr is None
+		assert lister.error is None
+		assert lister.next_page(3) == []
+	finally:
+		shutil.rmtree(workspace["root"], ignore_errors=True)
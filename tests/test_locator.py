@@ -0,0 +1,87 @@
+import importlib
+
+import pytest
+
+locator = importlib.import_module("tiktokDownloader.locator")
+
+
+class Node:
+
+	def __init__(self, role="pane", children=()):
+		self.role = role
+		self.next = None
+		self.firstChild = None
+		self.set_children(children)
+
+	def set_children(self, children):
+		self.firstChild = children[0] if children else None
+		for node, following in zip(children, children[1:]):
+			node.next = following
+		if children:
+			children[-1].next = None
+
+
+class Window(Node):
+
+	def __init__(self, handle, children=()):
+		super().__init__("window", children)
+		self.processID = 100
+		self.windowHandle = handle
+
+
+def _browser(handle):
+	"""A window whose address bar sits two levels down, behind a tab strip."""
+	bar = Node("edit")
+	toolbar = Node("toolbar", [Node("button"), bar])
+	return Window(handle, [Node("tabs", [Node("tab"), Node("tab")]), toolbar]), toolbar, bar
+
+
+@pytest.fixture
+def checked():
+	return []
+
+
+@pytest.fixture
+def bar_locator(checked):
+	def is_match(node):
+		checked.append(node)
+		return node.role == "edit"
+	return locator.AddressBarLocator(is_candidate=lambda node: node.role == "edit", is_match=is_match)
+
+
+def test_second_lookup_walks_the_cached_path(bar_locator, checked):
+	window, _toolbar, bar = _browser(1)
+
+	assert bar_locator.find(window) is bar
+	searched = len(checked)
+	assert bar_locator.find(window) is bar
+
+	assert len(checked) == searched
+	assert (bar_locator.hits, bar_locator.misses) == (1, 1)
+
+
+def test_stale_path_falls_back_to_a_search(bar_locator):
+	window, toolbar, bar = _browser(1)
+	bar_locator.find(window)
+	# A new button pushes the address bar one place along; the cached path now ends on a button.
+	toolbar.set_children([Node("button"), Node("button"), bar])
+
+	assert bar_locator.find(window) is bar
+	assert (bar_locator.hits, bar_locator.misses) == (0, 2)
+	assert bar_locator.find(window) is bar
+	assert bar_locator.hits == 1
+
+
+def test_least_recently_used_window_is_forgotten(bar_locator):
+	windows = [_browser(handle)[0] for handle in range(locator.MAX_CACHED_WINDOWS + 1)]
+	for window in windows[:locator.MAX_CACHED_WINDOWS]:
+		bar_locator.find(window)
+	# Using the first window again makes the second the oldest.
+	bar_locator.find(windows[0])
+	bar_locator.find(windows[-1])
+	hits = bar_locator.hits
+
+	bar_locator.find(windows[0])
+	assert bar_locator.hits == hits + 1
+	bar_locator.find(windows[1])
+	assert bar_locator.hits == hits + 1
@@ -0,0 +1,226 @@
+import json
+import os
+import signal
+import socket
+import time
+
+import pytest
+from conftest import manager_mod, wait_finished, wait_until
+
+
+def _video_url(n):
+	return f"https://www.tiktok.com/@user/video/{7300000000000000000 + n}"
+
+
+def test_schedule_save_folds_requests_into_one_write(workspace):
+	manager = manager_mod.DownloadManager()
+	saves = []
+	real_save = manager.save_state
+	manager.save_state = lambda: saves.append(time.monotonic()) or real_save()
+
+	for _n in range(200):
+		manager.schedule_save(delay=0.05)
+
+	assert wait_until(lambda: saves, timeout=5)
+	time.sleep(0.2)
+	assert len(saves) == 1
+
+
+def test_saved_state_is_compact_and_loads_back(workspace, monkeypatch):
+	manager = manager_mod.DownloadManager()
+	# Nothing starts, so the saved items stay as queued.
+	monkeypatch.setattr(manager, "_process_queue", lambda: None)
+	manager.start_downloads([_video_url(n) for n in range(5)], "best")
+	manager.save_state()
+
+	with open(manager_mod._state_file_path(), encoding="utf-8") as f:
+		text = f.read()
+	assert "\n" not in text
+
+	restored = manager_mod.DownloadManager()
+	d_ids = restored.load_state()
+	assert sorted(restored.get_snapshot(d_id)["url"] for d_id in d_ids) == sorted(_video_url(n) for n in range(5))
+	assert json.loads(text)["next_download_id"] == 5
+
+
+class _HangingPrefetcher:
+
+	def take(self, url, wait=None):
+		time.sleep(3)
+		return None
+
+
+class _RecordingPrefetcher:
+
+	def __init__(self):
+		self.waits = []
+
+	def take(self, url, wait=None):
+		self.waits.append(wait)
+		return None
+
+
+def test_disabled_resolve_timeout_still_waits_for_a_running_prefetch(workspace, conf):
+	# Without a wait the download extracted the metadata a second time beside the prefetch.
+	conf["resolveTimeout"] = 0
+	prefetcher = _RecordingPrefetcher()
+	manager = manager_mod.DownloadManager(prefetcher=prefetcher)
+	d_id = manager.start_download(_video_url(1), "best", known_title="Clip")
+
+	wait_finished(manager, [d_id])
+
+	assert prefetcher.waits == [manager_mod.prefetch.FETCH_TIMEOUT]
+
+
+def test_watchdog_flags_a_resolve_step_that_overruns(workspace, conf, monkeypatch):
+	conf["resolveTimeout"] = 1
+	monkeypatch.setattr(manager_mod, "RESOLVE_GRACE", 0.5)
+	manager = manager_mod.DownloadManager(prefetcher=_HangingPrefetcher())
+	d_id = manager.start_download(_video_url(1), "best", known_title="Clip")
+
+	snapshot, = wait_finished(manager, [d_id])
+
+	assert snapshot["state"] == manager_mod.STATUS_ERROR
+	assert manager.get_metrics()["stalls_resolve"] == 1
+
+
+def test_watchdog_breaks_a_hanging_photo_page_load(workspace, conf, monkeypatch):
+	# Accepts the connection and never answers, as a stalled server would.
+	server = socket.socket()
+	server.bind(("127.0.0.1", 0))
+	server.listen(1)
+	conf["resolveTimeout"] = 1
+	monkeypatch.setattr(manager_mod, "RESOLVE_GRACE", 0.5)
+	monkeypatch.setattr(manager_mod.urls, "classify_url", lambda url: manager_mod.urls.KIND_PHOTO)
+	manager = manager_mod.DownloadManager()
+	started = time.monotonic()
+	d_id = manager.start_download(f"http://127.0.0.1:{server.getsockname()[1]}/@user/photo/1", "best")
+
+	try:
+		snapshot, = wait_finished(manager, [d_id])
+	finally:
+		server.close()
+
+	# The page load's own socket timeout is 30 seconds.
+	assert time.monotonic() - started < 10
+	assert snapshot["state"] == manager_mod.STATUS_ERROR
+	assert manager.get_metrics()["stalls_resolve"] == 1
+
+
+def test_retry_keeps_the_first_queued_time(workspace, conf, monkeypatch):
+	monkeypatch.setenv("FAKE_YTDLP_MODE", "fail")
+	conf["autoRetryAttempts"] = 1
+	manager = manager_mod.DownloadManager()
+	d_id = manager.start_download(_video_url(1), "best", known_title="Clip")
+
+	snapshot, = wait_finished(manager, [d_id])
+
+	assert snapshot["state"] == manager_mod.STATUS_ERROR
+	record, = [r for r in manager.get_timing_records() if r["id"] == d_id]
+	timings = record["timings"]
+	assert record["retry_count"] == 1
+	assert timings["queued"] < timings["retried"] <= timings["spawned"]
+	spans = manager_mod.metrics.span_durations(timings)
+	assert spans["queue_wait"] == timings["spawned"] - timings["queued"]
+	assert spans["retry_wait"] == timings["spawned"] - timings["retried"]
+
+
+def test_retrying_download_does_not_hold_a_slot(workspace, conf, monkeypatch):
+	# A retrying download waits in the queue; counted as active, it kept itself from starting again.
+	monkeypatch.setenv("FAKE_YTDLP_MODE", "fail")
+	conf["autoRetryAttempts"] = 1
+	manager = manager_mod.DownloadManager(max_concurrent=1)
+	d_ids = [manager.start_download(_video_url(n), "best", known_title=f"Clip {n}") for n in range(3)]
+
+	snapshots = wait_finished(manager, d_ids, timeout=20)
+
+	assert [s["state"] for s in snapshots] == [manager_mod.STATUS_ERROR] * 3
+	assert [s["retry_count"] for s in snapshots] == [1] * 3
+
+
+def test_retry_many_leaves_running_and_completed_downloads_alone(workspace, monkeypatch):
+	spawned = []
+	real_start = manager_mod.downloader.start_process
+	monkeypatch.setattr(manager_mod.downloader, "start_process", lambda *a, **kw: spawned.append(a) or real_start(*a, **kw))
+	manager = manager_mod.DownloadManager()
+	done_id = manager.start_download(_video_url(1), "best", known_title="Done")
+	wait_finished(manager, [done_id])
+	monkeypatch.setenv("FAKE_YTDLP_MODE", "hang")
+	running_id = manager.start_download(_video_url(2), "best", known_title="Running")
+	assert wait_until(lambda: len(spawned) == 2)
+
+	try:
+		assert manager.retry_many([done_id, running_id]) == 0
+		time.sleep(0.3)
+		assert len(spawned) == 2
+		assert manager.get_snapshot(running_id)["state"] == manager_mod.STATUS_DOWNLOADING
+		assert manager.get_snapshot(done_id)["state"] == manager_mod.STATUS_COMPLETED
+	finally:
+		manager.stop_many([running_id], workspace["downloads"])
+		wait_finished(manager, [running_id])
+
+
+@pytest.mark.skipif(os.name == "nt", reason="terminate and kill are the same call on Windows")
+def test_stop_kills_a_process_that_ignores_terminate_and_removes_its_files(workspace, monkeypatch):
+	monkeypatch.setenv("FAKE_YTDLP_MODE", "stubborn")
+	monkeypatch.setattr(manager_mod, "STOP_GRACE_SECONDS", 0.5)
+	manager = manager_mod.DownloadManager()
+	d_id = manager.start_download(_video_url(1), "best", known_title="Clip")
+	item = manager._items[d_id]
+	assert wait_until(lambda: item.process is not None and item.temp_files)
+	proc = item.process
+	temp_path = os.path.join(workspace["downloads"], manager_mod.downloader.TEMP_DIR_NAME)
+	assert any(name.endswith(".part") for name in os.listdir(temp_path))
+	terminated = []
+	real_terminate = proc.terminate
+	monkeypatch.setattr(proc, "terminate", lambda: terminated.append(time.monotonic()) or real_terminate())
+
+	manager.stop_many([d_id], workspace["downloads"])
+	snapshot, = wait_finished(manager, [d_id], timeout=10)
+
+	assert terminated
+	assert proc.returncode == -signal.SIGKILL
+	assert snapshot["state"] == manager_mod.STATUS_STOPPED
+	assert os.listdir(temp_path) == []
+
+
+class _VideoPageFetch:
+	"""A photo link whose page shows a regular video."""
+	calls = 0
+
+	def __init__(self, url):
+		self.returncode = None
+
+	def run(self):
+		_VideoPageFetch.calls += 1
+		self.returncode = 0
+		return None
+
+	def poll(self):
+		return self.returncode
+
+	def wait(self, timeout=None):
+		return self.returncode
+
+	def terminate(self):
+		pass
+
+	kill = terminate
+
+
+def test_photo_link_to_a_video_goes_straight_to_yt_dlp(workspace, conf, monkeypatch):
+	conf["autoRetryAttempts"] = 2
+	_VideoPageFetch.calls = 0
+	monkeypatch.setattr(manager_mod.photo, "PostFetch", _VideoPageFetch)
+	commands = []
+	real_start = manager_mod.downloader.start_process
+	monkeypatch.setattr(manager_mod.downloader, "start_process", lambda cmd, *a, **kw: commands.append(cmd) or real_start(cmd, *a, **kw))
+	manager = manager_mod.DownloadManager()
+	d_id = manager.start_download("https://www.tiktok.com/@user/photo/7300000000000000001", "best")
+
+	snapshot, = wait_finished(manager, [d_id])
+
+	assert snapshot["state"] == manager_mod.STATUS_COMPLETED
+	assert snapshot["retry_count"] == 0
+	assert _VideoPageFetch.calls == 1
+	assert [cmd[-1] for cmd in commands] == ["https://www.tiktok.com/@user/video/7300000000000000001"]
@@ -0,0 +1,65 @@
+import types
+
+import pytest
+from conftest import manager_mod
+
+metrics = manager_mod.metrics
+
+
+def test_throughput_is_an_ewma_of_per_interval_rates():
+	meter = metrics.ThroughputMeter(alpha=0.5, interval=1.0)
+	meter.add(1000, 0.0)
+	meter.add(1000, 0.5)
+
+	# The first full window sets the rate, later ones are blended in.
+	assert meter.rate(1.0) == 2000
+	meter.add(4000, 1.5)
+	assert meter.rate(2.0) == 3000
+	# Less than an interval later nothing is rolled.
+	assert meter.rate(2.5) == 3000
+
+
+def test_idle_windows_decay_the_rate():
+	meter = metrics.ThroughputMeter(alpha=0.5, interval=1.0)
+	meter.add(2000, 0.0)
+	assert meter.rate(1.0) == 2000
+
+	# Three seconds without bytes: two idle windows decay it, then an empty sample is blended in.
+	assert meter.rate(4.0) == pytest.approx(2000 * 0.25 * 0.5)
+
+
+def test_queue_estimate_fills_unknown_sizes_with_the_average():
+	estimator = metrics.QueueEstimator()
+	estimator.track(1, 1000)
+	estimator.track(2, None)
+	estimator.track(3, None)
+	assert estimator.bytes_remaining() == 1000
+
+	estimator.observe_size(3000)
+	estimator.observe_size(5000)
+	assert estimator.bytes_remaining() == 1000 + 2 * 4000
+
+	estimator.track(1, 400)
+	estimator.untrack(2)
+	estimator.untrack(2)
+	assert estimator.bytes_remaining() == 400 + 4000
+	assert (estimator.tracked_count, estimator.unknown_count) == (2, 1)
+
+
+def _manager_with(rate, sizes):
+	manager = manager_mod.DownloadManager()
+	manager._throughput = types.SimpleNamespace(rate=lambda now: rate)
+	for d_id, size in enumerate(sizes):
+		manager._queue_estimator.track(d_id, size)
+	return manager
+
+
+def test_queue_eta_is_remaining_bytes_over_the_rate(workspace):
+	assert _manager_with(2000.0, [6000, 4000]).get_queue_eta()["eta_seconds"] == 5.0
+
+
+def test_queue_eta_is_unknown_without_a_rate_or_a_size_estimate(workspace):
+	assert _manager_with(0.0, [6000]).get_queue_eta()["eta_seconds"] is None
+	eta = _manager_with(2000.0, [6000, None]).get_queue_eta()
+	assert eta["eta_seconds"] is None
+	assert eta["unknown_sizes"] == 1
@@ -0,0 +1,74 @@
+"""Loads the global plugin in a fresh interpreter, as NVDA does at startup.
+
+The plugin replaces the package the other tests load, so each check runs
+in its own process.
+"""
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+TOOLS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools")
+
+
+def _run(*args):
+	result = subprocess.run([sys.executable, *args], capture_output=True, text=True, timeout=120, cwd=TOOLS_DIR)
+	assert result.returncode == 0, result.stderr[-2000:]
+	return result.stdout
+
+
+def test_startup_leaves_manager_and_dialogs_unloaded():
+	report = json.loads(_run("bench_startup.py", "--saved", "20", "--repeat", "1", "--json"))
+
+	assert "manager" not in report["modules_at_init"]
+	assert "dialogs" not in report["modules_at_init"]
+	assert report["restore_failed"] == 0
+
+
+def test_ensure_helpers_create_each_instance_once():
+	out = _run("-c", textwrap.dedent("""
+		import os, sys
+		import harness
+		workspace = harness.make_workspace()
+		os.environ["HOME"] = os.environ["USERPROFILE"] = workspace["home"]
+		harness.install_plugin_stubs({"downloadPath": workspace["downloads"]})
+		plugin = harness.load_plugin().GlobalPlugin()
+		assert plugin._manager is None
+		manager = plugin._ensure_manager()
+		assert plugin.manager is manager and plugin._ensure_manager() is manager
+		assert plugin._prefetcher is not None
+		subs = plugin._ensure_subscriptions()
+		assert plugin.subscriptions is subs and plugin._ensure_subscriptions() is subs
+		print("ok")
+	"""))
+
+	assert out.strip().splitlines()[-1] == "ok"
+
+
+def test_copied_collection_links_are_not_expanded():
+	out = _run("-c", textwrap.dedent("""
+		import json, os, sys
+		import harness
+		workspace = harness.make_workspace()
+		os.environ["HOME"] = os.environ["USERPROFILE"] = workspace["home"]
+		harness.install_plugin_stubs({"downloadPath": workspace["downloads"], "lastQuality": "best", "removeWatermark": True})
+		plugin = harness.load_plugin().GlobalPlugin()
+		calls = []
+
+		class Manager:
+			def expand_url(self, url, *args, **kwargs):
+				calls.append(["expand", url])
+				return True
+
+			def start_downloads(self, found, *args, **kwargs):
+				calls.append(["start", found])
+				return found, 0
+
+		plugin._manager = Manager()
+		plugin._on_clipboard_text("https://www.tiktok.com/@creator https://www.tiktok.com/tag/cats")
+		plugin._on_clipboard_text("https://www.tiktok.com/@creator https://www.tiktok.com/@creator/video/7300000000000000001")
+		print(json.dumps(calls))
+	"""))
+
+	assert json.loads(out.strip().splitlines()[-1]) == [["start", ["https://www.tiktok.com/@creator/video/7300000000000000001"]]]
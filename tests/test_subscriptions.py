@@ -0,0 +1,92 @@
+import importlib
+import json
+import shutil
+import sys
+import textwrap
+
+import harness
+import pytest
+from conftest import downloader_mod
+
+subscriptions = importlib.import_module("tiktokDownloader.subscriptions")
+
+# Lists the ids in FAKE_LISTING, newest first as TikTok does, one entry per line.
+LISTER = textwrap.dedent("""
+	import json, os
+	with open(os.environ["FAKE_LISTING"]) as f:
+		ids = json.load(f)
+	for n, video_id in enumerate(ids, 1):
+		print(json.dumps({"playlist_index": n, "id": str(video_id), "url": f"https://www.tiktok.com/@user/video/{video_id}", "title": f"Clip {video_id}"}), flush=True)
+""")
+
+
+@pytest.fixture
+def listing(tmp_path, monkeypatch):
+	script = tmp_path / "lister.py"
+	script.write_text(LISTER)
+	workspace = harness.make_workspace(yt_dlp_command=f'"{sys.executable}" "{script}"')
+	monkeypatch.setattr(downloader_mod, "BIN_DIR", workspace["bin"])
+	listing_file = tmp_path / "listing.json"
+	monkeypatch.setenv("FAKE_LISTING", str(listing_file))
+	yield lambda ids: listing_file.write_text(json.dumps(ids))
+	shutil.rmtree(workspace["root"], ignore_errors=True)
+
+
+@pytest.fixture
+def manager():
+	queued = []
+
+	def enqueue(video_urls, titles, quality_str, remove_watermark):
+		queued.append([int(url.rsplit("/", 1)[1]) for url in video_urls])
+		return len(video_urls)
+
+	sub_manager = subscriptions.SubscriptionManager(enqueue)
+	sub_manager.queued = queued
+	return sub_manager
+
+
+def _sub(high_water=None):
+	return subscriptions.Subscription("https://www.tiktok.com/@user", "best", high_water=high_water)
+
+
+def test_first_sync_only_sets_the_mark(listing, manager):
+	listing(list(range(130, 100, -1)))
+	sub = _sub()
+
+	assert manager.sync(sub) == 0
+	assert manager.queued == []
+	assert sub.high_water == 130
+
+
+def test_new_videos_are_queued_oldest_first_and_move_the_mark(listing, manager):
+	listing([108, 107, 106, 105, 104, 103, 102, 101])
+	sub = _sub(high_water=105)
+
+	assert manager.sync(sub) == 3
+	assert manager.queued == [[106, 107, 108]]
+	assert sub.high_water == 108
+	assert sub.last_new == 3
+
+	assert manager.sync(sub) == 0
+	assert manager.queued == [[106, 107, 108]]
+	assert sub.high_water == 108
+
+
+def test_pinned_videos_do_not_end_the_sync_but_enough_known_ones_do(listing, manager):
+	# Three older pinned videos come first. The listing stops at the fourth known video, before the odd 200.
+	listing([50, 60, 70, 110, 109, 108, 107, 106, 105, 200])
+	sub = _sub(high_water=108)
+
+	assert manager.sync(sub) == 2
+	assert manager.queued == [[109, 110]]
+	assert sub.high_water == 110
+
+
+def test_failed_listing_keeps_the_mark(listing, manager, tmp_path, monkeypatch):
+	monkeypatch.setenv("FAKE_LISTING", str(tmp_path / "missing.json"))
+	sub = _sub(high_water=108)
+
+	assert manager.sync(sub) == 0
+	assert manager.queued == []
+	assert sub.high_water == 108
+	assert sub.last_error
@@ -0,0 +1,156 @@
+import json
+import os
+import shutil
+import sys
+import textwrap
+import threading
+import time
+
+import harness
+import pytest
+from conftest import downloader_mod, manager_mod, wait_until
+
+transcode = manager_mod.transcode
+
+H264_AAC = transcode.MediaInfo(duration=None, video_codec="h264", audio_codec="aac", audio_bitrate=192000)
+MP3_WITH_COVER = transcode.MediaInfo(duration=None, video_codec="mjpeg", audio_codec="mp3", audio_bitrate=192000)
+
+# Records its arguments, ticks while it "encodes", then writes a small output file.
+FAKE_FFMPEG = textwrap.dedent("""
+	import json, os, sys, time
+	with open(os.environ["FAKE_FFMPEG_LOG"], "a") as f:
+		f.write(json.dumps(sys.argv[1:]) + "\\n")
+	for _n in range(int(os.environ.get("FAKE_FFMPEG_TICKS", "0"))):
+		with open(os.environ["FAKE_FFMPEG_LOG"] + ".ticks", "a") as f:
+			f.write(".")
+		time.sleep(0.05)
+	with open(sys.argv[-1], "wb") as f:
+		f.write(b"\\0" * 100)
+""")
+
+
+def test_mp4_gets_hevc_aac_and_faststart():
+	args = transcode.codec_args(transcode.PROFILES[transcode.PROFILE_HEVC_SMALL], H264_AAC, ".mp4")
+
+	assert args[args.index("-c:v") + 1] == "libx265"
+	assert "hvc1" in args
+	assert args[args.index("-c:a") + 1] == "aac"
+	assert transcode.container_args(".mp4") == ["-movflags", "+faststart"]
+
+
+def test_mp3_stays_mp3_without_mp4_options():
+	args = transcode.codec_args(transcode.PROFILES[transcode.PROFILE_HEVC_SMALL], MP3_WITH_COVER, ".mp3")
+
+	assert args == ["-c:v", "copy", "-c:a", "libmp3lame", "-b:a", "96k"]
+	assert transcode.container_args(".mp3") == []
+
+
+def test_containers_that_cannot_change_are_left_alone():
+	hevc = transcode.PROFILES[transcode.PROFILE_HEVC]
+	# H.265 cannot go in WebM, and cover art is never encoded.
+	assert transcode.codec_args(hevc, H264_AAC, ".webm") is None
+	assert transcode.codec_args(hevc, MP3_WITH_COVER, ".m4a") is None
+	assert transcode.codec_args(transcode.PROFILES[transcode.PROFILE_AUDIO_CAP], H264_AAC, ".flv") is None
+	assert transcode.codec_args(transcode.PROFILES[transcode.PROFILE_AUDIO_CAP], H264_AAC, ".webm")[-3:] == ["libopus", "-b:a", "96k"]
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+	script = tmp_path / "ffmpeg.py"
+	script.write_text(f"#!{sys.executable}\n" + FAKE_FFMPEG)
+	script.chmod(0o755)
+	workspace = harness.make_workspace(ffmpeg=str(script))
+	monkeypatch.setattr(downloader_mod, "BIN_DIR", workspace["bin"])
+	log = tmp_path / "ffmpeg.log"
+	monkeypatch.setenv("FAKE_FFMPEG_LOG", str(log))
+	yield workspace, log
+	shutil.rmtree(workspace["root"], ignore_errors=True)
+
+
+def _run_pool(path, profile_key, source, monkeypatch, gate=None):
+	# ffprobe is not needed: the stand-in reports the same streams for the result.
+	monkeypatch.setattr(transcode, "probe", lambda p: source)
+	done = []
+	pool = transcode.TranscodePool(gate=gate, on_done=done.append)
+	assert pool.submit(1, path, profile_key)
+	return pool, done
+
+
+@pytest.mark.skipif(os.name == "nt", reason="the fake ffmpeg is a script")
+def test_audio_only_mp3_is_shrunk_as_mp3(fake_ffmpeg, monkeypatch):
+	workspace, log = fake_ffmpeg
+	path = os.path.join(workspace["downloads"], "clip.mp3")
+	with open(path, "wb") as f:
+		f.write(b"\0" * 4096)
+
+	_pool, done = _run_pool(path, transcode.PROFILE_AUDIO_CAP, MP3_WITH_COVER, monkeypatch)
+
+	assert wait_until(lambda: done, timeout=10)
+	assert done[0].saved == 4096 - 100
+	args = json.loads(log.read_text().splitlines()[0])
+	assert "-movflags" not in args and "aac" not in args
+	assert "libmp3lame" in args
+	assert args[-1].endswith(".mp3")
+
+
+@pytest.mark.skipif(os.name == "nt", reason="the fake ffmpeg is a script")
+def test_encode_pauses_while_the_gate_is_closed(fake_ffmpeg, monkeypatch):
+	workspace, log = fake_ffmpeg
+	monkeypatch.setenv("FAKE_FFMPEG_TICKS", "30")
+	monkeypatch.setattr(transcode, "GATE_POLL", 0.1)
+	ticks = log.parent / (log.name + ".ticks")
+	path = os.path.join(workspace["downloads"], "clip.mp4")
+	with open(path, "wb") as f:
+		f.write(b"\0" * 4096)
+	gate_open = threading.Event()
+	gate_open.set()
+
+	_pool, done = _run_pool(path, transcode.PROFILE_HEVC, H264_AAC, monkeypatch, gate=gate_open.is_set)
+	assert wait_until(lambda: ticks.exists() and len(ticks.read_text()) >= 3, timeout=10)
+	# A download starts: the encode stops making progress until it is over.
+	gate_open.clear()
+	time.sleep(0.5)
+	paused_at = len(ticks.read_text())
+	time.sleep(0.6)
+
+	assert len(ticks.read_text()) == paused_at < 30
+	assert not done
+	gate_open.set()
+	assert wait_until(lambda: done, timeout=10)
+	assert len(ticks.read_text()) == 30
+	assert done[0].saved == 4096 - 100
+
+
+@pytest.mark.skipif(os.name == "nt", reason="the fake ffmpeg is a script")
+def test_wake_resumes_a_paused_encode_without_waiting_for_the_poll(fake_ffmpeg, monkeypatch):
+	workspace, log = fake_ffmpeg
+	monkeypatch.setenv("FAKE_FFMPEG_TICKS", "20")
+	monkeypatch.setattr(transcode, "GATE_POLL", 0.1)
+	ticks = log.parent / (log.name + ".ticks")
+	path = os.path.join(workspace["downloads"], "clip.mp4")
+	with open(path, "wb") as f:
+		f.write(b"\0" * 4096)
+	gate_open = threading.Event()
+	gate_open.set()
+	pool, done = _run_pool(path, transcode.PROFILE_HEVC, H264_AAC, monkeypatch, gate=gate_open.is_set)
+	assert wait_until(lambda: ticks.exists() and len(ticks.read_text()) >= 3, timeout=10)
+	gate_open.clear()
+	time.sleep(0.5)
+	# From now on only wake() can resume it in time.
+	monkeypatch.setattr(transcode, "GATE_POLL", 60)
+	time.sleep(0.2)
+
+	gate_open.set()
+	pool.wake()
+
+	assert wait_until(lambda: done, timeout=5)
+
+
+def test_manager_wakes_the_pool_when_downloads_drain(workspace):
+	manager = manager_mod.DownloadManager()
+	wakes = []
+	manager._transcoder = type("Pool", (), {"wake": lambda self: wakes.append(1)})()
+
+	manager._process_queue()
+
+	assert wakes == [1]
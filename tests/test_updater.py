@@ -0,0 +1,64 @@
+import importlib
+import os
+import shutil
+import sys
+import textwrap
+
+import harness
+import pytest
+from conftest import downloader_mod
+
+updater = importlib.import_module("tiktokDownloader.updater")
+
+# Answers -U with FAKE_UPDATE_OUTPUT and --version with FAKE_VERSION_OUTPUT.
+FAKE_YT_DLP = textwrap.dedent("""
+	import os, sys
+	if "-U" in sys.argv:
+		print(os.environ.get("FAKE_UPDATE_OUTPUT", "yt-dlp is up to date"))
+	elif "--version" in sys.argv:
+		print(os.environ.get("FAKE_VERSION_OUTPUT", "2025.01.01"))
+""")
+
+
+@pytest.fixture
+def bin_dir(tmp_path, monkeypatch):
+	script = tmp_path / "yt_dlp.py"
+	script.write_text(FAKE_YT_DLP)
+	workspace = harness.make_workspace(yt_dlp_command=f'"{sys.executable}" "{script}"')
+	monkeypatch.setattr(downloader_mod, "BIN_DIR", workspace["bin"])
+	monkeypatch.setenv("FAKE_UPDATE_OUTPUT", "Updating to version 2026.10.01 ...")
+	# A previous version that is current, and a staging copy a crashed run left behind.
+	previous = os.path.join(workspace["bin"], "yt-dlp-2025.01.01.exe")
+	shutil.copy2(os.path.join(workspace["bin"], "yt-dlp.exe"), previous)
+	updater.YtDlpUpdater().set_current(previous)
+	shutil.copy2(previous, os.path.join(workspace["bin"], "yt-dlp-staging-1.exe"))
+	yield workspace["bin"]
+	shutil.rmtree(workspace["root"], ignore_errors=True)
+
+
+def _pointer(bin_dir):
+	with open(os.path.join(bin_dir, downloader_mod.YT_DLP_POINTER), encoding="utf-8") as f:
+		return f.read()
+
+
+def test_verified_update_swaps_the_pointer(bin_dir, monkeypatch):
+	monkeypatch.setenv("FAKE_VERSION_OUTPUT", "2026.10.01")
+
+	message = updater.YtDlpUpdater().update()
+
+	assert message == "Updated yt-dlp to version {}.".format("2026.10.01")
+	assert _pointer(bin_dir) == "yt-dlp-2026.10.01.exe"
+	assert downloader_mod.get_yt_dlp_path() == os.path.join(bin_dir, "yt-dlp-2026.10.01.exe")
+	assert not [name for name in os.listdir(bin_dir) if name.startswith("yt-dlp-staging-")]
+
+
+def test_failed_smoke_test_keeps_the_current_binary(bin_dir, monkeypatch):
+	monkeypatch.setenv("FAKE_VERSION_OUTPUT", "Traceback (most recent call last):")
+
+	message = updater.YtDlpUpdater().update()
+
+	assert "could not be verified" in message
+	assert _pointer(bin_dir) == "yt-dlp-2025.01.01.exe"
+	assert os.path.isfile(os.path.join(bin_dir, "yt-dlp-2025.01.01.exe"))
+	# Neither this run's staging copy nor the one left by the crashed run remains.
+	assert not [name for name in os.listdir(bin_dir) if name.startswith("yt-dlp-staging-")]
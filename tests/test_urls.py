@@ -0,0 +1,31 @@
+from conftest import manager_mod
+
+urls = manager_mod.urls
+
+
+def test_links_are_found_only_on_tiktok_hosts():
+	text = (
+		"see nottiktok.com/@user/video/1 and evil-tiktok.com/@user/video/2, "
+		"evil.tiktok.com.example/@user/video/3 or https://www.tiktok.com/@user/video/4?is_from_webapp=1."
+	)
+
+	assert urls.extract_urls(text) == ["https://www.tiktok.com/@user/video/4"]
+
+
+def test_pages_without_a_download_are_not_links():
+	for path in ("", "/", "/foryou", "/explore", "/@user/live", "/login?redirect=1"):
+		assert urls.classify_url("https://www.tiktok.com" + path) is None, path
+	assert urls.extract_urls("https://www.tiktok.com/foryou https://www.tiktok.com/explore") == []
+
+
+def test_each_kind_of_link_is_recognised():
+	assert urls.classify_url("https://www.tiktok.com/@user/video/7300000000000000001") == urls.KIND_VIDEO
+	assert urls.classify_url("m.tiktok.com/v/7300000000000000001.html") == urls.KIND_VIDEO
+	assert urls.classify_url("https://www.tiktok.com/embed/v2/7300000000000000001") == urls.KIND_VIDEO
+	assert urls.classify_url("https://www.tiktok.com/t/ZTRabcdEF/") == urls.KIND_VIDEO
+	assert urls.classify_url("https://vm.tiktok.com/ZMabcdEF/") == urls.KIND_VIDEO
+	assert urls.classify_url("https://www.tiktok.com/@user/photo/7300000000000000002") == urls.KIND_PHOTO
+	assert urls.classify_url("https://www.tiktok.com/@user") == urls.KIND_PROFILE
+	assert urls.classify_url("https://www.tiktok.com/tag/cats") == urls.KIND_HASHTAG
+	assert urls.classify_url("https://www.tiktok.com/music/song-7300000000000000003") == urls.KIND_SOUND
+	assert urls.classify_url("https://example.com/@user/video/1") is None
@@ -0,0 +1,198 @@
+"""End-to-end benchmark: real yt-dlp and ffmpeg against a local media server.
+
+Needs a Python with yt-dlp installed and an ffmpeg binary, but no network:
+
+	python tools/bench_e2e.py --python /path/to/venv/bin/python --ffmpeg /usr/bin/ffmpeg
+	python tools/bench_e2e.py --concurrency 1 3 6 --jobs 12 --throttle 2000000 --fail-429-every 7
+
+The pages are matched by the test-only extractor in tools/yt_dlp_plugins, so
+every job goes through the split video+audio download and the ffmpeg merge
+exactly like a real TikTok URL. Each concurrency level reports wall time,
+aggregate bytes per second and the p50/p95 of time to first byte and merge.
+A probe also posts a callback to a stand-in main thread every 10 ms, and
+main_p95_ms/main_max_ms show how long those waited: compare --priority normal
+with --priority idle to see how much the children slow the main thread.
+With --max-wall the script exits non-zero when any level runs over budget.
+--prefetch S looks each URL up with the metadata prefetcher S seconds before
+queueing it, as the dialog does while the user confirms; compare ttfb with
+and without it. --profile queues the jobs by expanding one profile link,
+a page of videos at a time as slots free up, instead of one link each.
+"""
+import argparse
+import importlib
+import json
+import logging
+import os
+import shlex
+import shutil
+import sys
+import tempfile
+import time
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, TOOLS_DIR)
+import harness  # noqa: E402
+import media_server  # noqa: E402
+
+
+def yt_dlp_command(python):
+	return f"env PYTHONPATH={shlex.quote(TOOLS_DIR)} {shlex.quote(python)} -m yt_dlp --no-config"
+
+
+def run_level(manager_mod, downloader_mod, latency_mod, server, concurrency, args):
+	workspace = harness.make_workspace(yt_dlp_command(args.python), ffmpeg=args.ffmpeg, ffprobe=args.ffprobe)
+	os.environ["HOME"] = workspace["home"]
+	downloader_mod.BIN_DIR = workspace["bin"]
+
+	conf = sys.modules["config"].conf["tiktokDownloader"]
+	conf.update({
+		"downloadPath": workspace["downloads"],
+		"autoRetryAttempts": args.retries,
+		"stallTimeout": 60,
+		"mergeTimeout": 300,
+		"minSpeedKbps": 0,
+		"resolveTimeout": 30,
+		"totalDownloads": 0,
+		"processPriority": args.priority,
+		"cpuAffinity": args.cpus,
+		"ffmpegThreads": args.ffmpeg_threads,
+	})
+
+	recorder = None
+	if args.record:
+		recorder = manager_mod.tracing.TraceRecorder(os.path.join(args.record, f"trace-concurrency{concurrency}.jsonl.gz"), concurrency)
+	prefetcher = None
+	if args.prefetch is not None:
+		prefetcher = importlib.import_module("tiktokDownloader.prefetch").MetadataPrefetcher(cache_dir=os.path.join(workspace["root"], "info"))
+	manager = manager_mod.DownloadManager(max_concurrent=concurrency, recorder=recorder, prefetcher=prefetcher)
+	bytes_before = server.faults.stats["bytes_sent"]
+	pages_before = server.faults.stats["list_pages"]
+	latency_mod.MONITOR.reset()
+	probe = harness.LatencyProbe(latency_mod.call_after).start()
+	wall_start = time.perf_counter()
+
+	if args.profile:
+		manager.expand_url(server.profile_url(), "best")
+	for i in range(0 if args.profile else args.jobs):
+		url = server.video_url(f"{7300000000000000000 + i}")
+		if prefetcher:
+			prefetcher.prefetch(url)
+			time.sleep(args.prefetch)
+		manager.start_download(url, "best", known_title=f"E2E clip {i}")
+
+	deadline = time.monotonic() + args.timeout
+	timed_out = False
+	while True:
+		states = [data["state"] for _, data in manager.iter_snapshot()]
+		if not manager.get_expansion_count() and all(manager_mod.is_finished_status(s) for s in states):
+			break
+		if time.monotonic() > deadline:
+			timed_out = True
+			manager.stop_all(workspace["downloads"])
+			break
+		time.sleep(0.1)
+
+	wall = time.perf_counter() - wall_start
+	probe.stop()
+	manager.set_recorder(None)
+	sent = server.faults.stats["bytes_sent"] - bytes_before
+	states = {}
+	for _, data in manager.iter_snapshot():
+		states[data["state"]] = states.get(data["state"], 0) + 1
+	timing = manager.get_timing_stats()
+	main_delay = latency_mod.MONITOR.summary()["delay"]
+
+	def pct(span, key):
+		value = timing.get(span, {}).get(key)
+		return round(value, 3) if value is not None else None
+
+	return {
+		"concurrency": concurrency,
+		"jobs": args.jobs,
+		"wall_s": round(wall, 3),
+		"bytes_per_s": int(sent / wall) if wall else 0,
+		"ttfb_p50_s": pct("time_to_first_byte", "p50"),
+		"ttfb_p95_s": pct("time_to_first_byte", "p95"),
+		"merge_p50_s": pct("merge", "p50"),
+		"merge_p95_s": pct("merge", "p95"),
+		"main_p95_ms": round(main_delay["p95"] * 1000, 2) if main_delay["p95"] is not None else None,
+		"main_max_ms": round(main_delay["max"] * 1000, 2) if main_delay["max"] is not None else None,
+		"states": states,
+		"prefetch_hits": prefetcher.hits if prefetcher else None,
+		"list_pages": server.faults.stats["list_pages"] - pages_before,
+		"timed_out": timed_out,
+	}
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Benchmark the add-on with real yt-dlp and ffmpeg against a local server.")
+	parser.add_argument("--python", default=sys.executable, help="interpreter that has yt-dlp installed")
+	parser.add_argument("--ffmpeg", default="ffmpeg", help="ffmpeg binary used for the fixtures and the merge")
+	parser.add_argument("--ffprobe", default=None, help="optional ffprobe binary")
+	parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 3], help="max concurrent downloads, one level each")
+	parser.add_argument("--jobs", type=int, default=6, help="downloads per level")
+	parser.add_argument("--duration", type=int, default=10, help="length of the synthetic clip in seconds")
+	parser.add_argument("--throttle", type=int, default=0, help="bytes per second per connection, 0 for unlimited")
+	parser.add_argument("--fail-429-every", type=int, default=0, help="answer every Nth media request with HTTP 429")
+	parser.add_argument("--reset-every", type=int, default=0, help="reset every Nth media connection part-way")
+	parser.add_argument("--page-delay", type=float, default=0.0, help="seconds the server waits before answering a video page")
+	parser.add_argument("--retries", type=int, default=1, help="autoRetryAttempts")
+	parser.add_argument("--priority", choices=["normal", "below_normal", "idle"], default="below_normal", help="processPriority for yt-dlp and ffmpeg")
+	parser.add_argument("--cpus", default="", help="cpuAffinity, e.g. 0-1")
+	parser.add_argument("--ffmpeg-threads", type=int, default=0, help="ffmpegThreads")
+	parser.add_argument("--prefetch", type=float, default=None, metavar="S", help="prefetch each URL's metadata S seconds before queueing it")
+	parser.add_argument("--profile", action="store_true", help="queue the jobs by expanding a profile link of --jobs videos")
+	parser.add_argument("--timeout", type=float, default=600, help="per-level timeout in seconds")
+	parser.add_argument("--max-wall", type=float, default=None, help="fail when any level takes longer than this many seconds")
+	parser.add_argument("--media-dir", default=os.path.join(tempfile.gettempdir(), "ttdl_media"))
+	parser.add_argument("--record", metavar="DIR", default=None, help="write a replayable trace of each level to DIR")
+	parser.add_argument("--json", action="store_true", help="print results as JSON")
+	parser.add_argument("--verbose", action="store_true", help="show the manager's error log")
+	args = parser.parse_args()
+
+	if not args.verbose:
+		logging.disable(logging.CRITICAL)
+
+	# The workspace symlinks the binaries, so bare names are resolved here.
+	args.ffmpeg = os.path.abspath(shutil.which(args.ffmpeg) or args.ffmpeg)
+	if args.ffprobe:
+		args.ffprobe = os.path.abspath(shutil.which(args.ffprobe) or args.ffprobe)
+	media_server.ensure_media(args.ffmpeg, args.media_dir, args.duration)
+	server = media_server.MediaServer(
+		args.media_dir,
+		throttle_bps=args.throttle,
+		fail_429_every=args.fail_429_every,
+		reset_every=args.reset_every,
+		page_delay=args.page_delay,
+		profile_size=args.jobs,
+	).start()
+
+	harness.install_stubs()
+	main_loop = harness.MainLoop().start()
+	manager_mod, downloader_mod = harness.load_package()
+	latency_mod = importlib.import_module("tiktokDownloader.latency")
+
+	try:
+		results = [run_level(manager_mod, downloader_mod, latency_mod, server, c, args) for c in args.concurrency]
+	finally:
+		server.stop()
+		main_loop.stop()
+
+	over_budget = [r for r in results if r["timed_out"] or (args.max_wall is not None and r["wall_s"] > args.max_wall)]
+
+	if args.json:
+		print(json.dumps({"results": results, "faults": server.faults.stats}, indent=2))
+	else:
+		header = ["concurrency", "jobs", "wall_s", "bytes_per_s", "ttfb_p50_s", "ttfb_p95_s", "merge_p50_s", "merge_p95_s", "main_p95_ms", "main_max_ms"]
+		print("  ".join(f"{h:>12}" for h in header))
+		for r in results:
+			print("  ".join(f"{str(r[h]):>12}" for h in header) + ("  TIMED OUT" if r["timed_out"] else "") + f"  {r['states']}")
+		print(f"server: {server.faults.stats}")
+
+	if over_budget:
+		print(f"Over budget: concurrency {', '.join(str(r['concurrency']) for r in over_budget)}", file=sys.stderr)
+		sys.exit(1)
+
+
+if __name__ == "__main__":
+	main()
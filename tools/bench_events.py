@@ -0,0 +1,89 @@
+"""Benchmark the yt-dlp output parser on recorded or synthetic output.
+
+Usage:
+	python tools/bench_events.py [--input recorded_stdout.txt] [--lines 200000]
+
+Without --input a synthetic session is generated that mirrors what a
+two-format download prints with the add-on's templates.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EVENTS_PATH = os.path.join(ROOT, "addon", "globalPlugins", "tiktokDownloader", "events.py")
+
+
+def load_events():
+	spec = importlib.util.spec_from_file_location("ttdl_events", EVENTS_PATH)
+	module = importlib.util.module_from_spec(spec)
+	spec.loader.exec_module(module)
+	return module
+
+
+def synthetic_session(events, total_lines):
+	lines = []
+	total = 8 * 1024 * 1024
+	video_id = 7300000000000000000
+	while len(lines) < total_lines:
+		video_id += 1
+		lines.append("[TikTok] Extracting URL: https://www.tiktok.com/@user/video/%d" % video_id)
+		lines.append(events.PREFIX + events.INFO_TAG + ":" + json.dumps({
+			"id": str(video_id), "title": "Clip %d" % video_id, "ext": "mp4",
+			"format_id": "bytevc1_1080p+audio", "filesize": total,
+		}))
+		for fmt in ("f1", "f2"):
+			filename = "C:\\Downloads\\.ttdl-tmp\\Clip %d.%s.mp4" % (video_id, fmt)
+			for step in range(0, 101):
+				done = total * step // 100
+				lines.append(events.PREFIX + events.PROGRESS_TAG + ":" + json.dumps({
+					"status": "finished" if step == 100 else "downloading",
+					"downloaded_bytes": done,
+					"total_bytes": total,
+					"total_bytes_estimate": None,
+					"speed": 1536000.5,
+					"eta": (100 - step) // 10,
+					"filename": filename,
+					"tmpfilename": filename + ".part",
+				}))
+		lines.append(events.PREFIX + events.POSTPROCESS_TAG + ":" + json.dumps("C:\\Downloads\\.ttdl-tmp\\Clip %d.mp4" % video_id))
+		lines.append(events.PREFIX + events.FILEPATH_TAG + ":" + json.dumps("C:\\Downloads\\Clip %d.mp4" % video_id))
+	return lines[:total_lines]
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--input", help="file with recorded yt-dlp stdout, one line per line")
+	parser.add_argument("--lines", type=int, default=200000, help="synthetic line count when --input is not given")
+	parser.add_argument("--repeat", type=int, default=3, help="number of timed passes")
+	args = parser.parse_args()
+
+	events = load_events()
+	if args.input:
+		with open(args.input, "r", encoding="utf-8", errors="replace") as f:
+			lines = [line.strip() for line in f if line.strip()]
+	else:
+		lines = synthetic_session(events, args.lines)
+
+	best = None
+	counts = {}
+	for _ in range(args.repeat):
+		counts = {}
+		start = time.perf_counter()
+		for line in lines:
+			event = events.parse_line(line)
+			name = type(event).__name__
+			counts[name] = counts.get(name, 0) + 1
+		elapsed = time.perf_counter() - start
+		best = elapsed if best is None else min(best, elapsed)
+
+	print(f"lines: {len(lines)}")
+	print(f"best pass: {best * 1000:.1f} ms ({len(lines) / best:,.0f} lines/s, {best * 1e6 / len(lines):.2f} us/line)")
+	for name, count in sorted(counts.items()):
+		print(f"  {name}: {count}")
+
+
+if __name__ == "__main__":
+	main()
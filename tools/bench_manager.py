@@ -0,0 +1,168 @@
+"""Measure DownloadManager overhead against a fake yt-dlp.
+
+Runs headlessly on Linux without network access:
+
+	python tools/bench_manager.py --jobs 1 10 100 1000 --rate 200
+	python tools/bench_manager.py --jobs 10 --mode fail --retries 0
+
+Each scenario reports wall time, CPU time of this process and of the fake
+children, time spent waiting for DownloadManager._lock, the number of UI
+callbacks, save_state calls and the peak RSS of this process.
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness  # noqa: E402
+
+
+def run_scenario(manager_mod, downloader_mod, jobs, args):
+	workspace = harness.make_workspace()
+	os.environ["HOME"] = workspace["home"]
+	os.environ["FAKE_YTDLP_MODE"] = args.mode
+	os.environ["FAKE_YTDLP_RATE"] = str(args.rate)
+	os.environ["FAKE_YTDLP_STEPS"] = str(args.steps)
+	os.environ["FAKE_YTDLP_SIZE"] = str(args.size)
+	downloader_mod.BIN_DIR = workspace["bin"]
+
+	conf = sys.modules["config"].conf["tiktokDownloader"]
+	conf.update({
+		"downloadPath": workspace["downloads"],
+		"autoRetryAttempts": args.retries,
+		"stallTimeout": args.stall_timeout,
+		"mergeTimeout": 300,
+		"minSpeedKbps": 0,
+		"resolveTimeout": 30,
+		"totalDownloads": 0,
+	})
+
+	counters = {"callbacks": 0, "save_state": 0}
+	counter_lock = threading.Lock()
+
+	def count(name):
+		with counter_lock:
+			counters[name] += 1
+
+	manager = None
+
+	def on_item_updated(d_id, data):
+		count("callbacks")
+		if args.plugin_saves:
+			manager.schedule_save()
+
+	def on_items_updated(batch):
+		count("callbacks")
+
+	recorder = None
+	if args.record:
+		recorder = manager_mod.tracing.TraceRecorder(os.path.join(args.record, f"trace-jobs{jobs}.jsonl.gz"), args.concurrency)
+
+	manager = manager_mod.DownloadManager(
+		max_concurrent=args.concurrency,
+		on_item_added=lambda d_id, data: count("callbacks"),
+		on_item_updated=on_item_updated,
+		on_item_removed=lambda d_id: count("callbacks"),
+		on_items_updated=on_items_updated,
+		on_items_removed=lambda ids: count("callbacks"),
+		on_queue_updated=lambda: count("callbacks"),
+		recorder=recorder,
+	)
+	timed_lock = harness.TimedRLock()
+	manager._lock = timed_lock
+
+	original_save = manager.save_state
+
+	def counted_save():
+		count("save_state")
+		original_save()
+
+	manager.save_state = counted_save
+
+	cpu_start = time.process_time()
+	children_start = resource.getrusage(resource.RUSAGE_CHILDREN)
+	wall_start = time.perf_counter()
+
+	for i in range(jobs):
+		known_title = None if args.resolve_titles else f"Bench clip {i}"
+		manager.start_download(f"https://www.tiktok.com/@bench/video/{i}", "best", known_title=known_title)
+
+	deadline = time.monotonic() + args.timeout
+	timed_out = False
+	while True:
+		states = [data["state"] for _, data in manager.iter_snapshot()]
+		if all(manager_mod.is_finished_status(s) for s in states):
+			break
+		if time.monotonic() > deadline:
+			timed_out = True
+			manager.stop_all(workspace["downloads"])
+			break
+		time.sleep(0.05)
+
+	wall = time.perf_counter() - wall_start
+	manager.set_recorder(None)
+	children_end = resource.getrusage(resource.RUSAGE_CHILDREN)
+	states = {}
+	for _, data in manager.iter_snapshot():
+		states[data["state"]] = states.get(data["state"], 0) + 1
+
+	return {
+		"jobs": jobs,
+		"wall_s": round(wall, 3),
+		"cpu_s": round(time.process_time() - cpu_start, 3),
+		"children_cpu_s": round(
+			(children_end.ru_utime + children_end.ru_stime) - (children_start.ru_utime + children_start.ru_stime), 3
+		),
+		"lock_acquisitions": timed_lock.acquisitions,
+		"lock_wait_ms": round(timed_lock.wait_time * 1000, 2),
+		"callbacks": counters["callbacks"],
+		"save_state_calls": counters["save_state"],
+		"peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1),
+		"states": states,
+		"timed_out": timed_out,
+	}
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Benchmark DownloadManager with a fake yt-dlp.")
+	parser.add_argument("--jobs", type=int, nargs="+", default=[1, 10, 100, 1000], help="job counts, one scenario each")
+	parser.add_argument("--concurrency", type=int, default=3)
+	parser.add_argument("--mode", choices=["ok", "fail", "hang"], default="ok")
+	parser.add_argument("--rate", type=float, default=200, help="progress lines per second per child, 0 for unthrottled")
+	parser.add_argument("--steps", type=int, default=20, help="progress lines per format")
+	parser.add_argument("--size", type=int, default=262144, help="bytes per format")
+	parser.add_argument("--retries", type=int, default=0, help="autoRetryAttempts")
+	parser.add_argument("--stall-timeout", type=int, default=5, help="stallTimeout, so that --mode hang terminates")
+	parser.add_argument("--resolve-titles", action="store_true", help="let each job run the --get-title lookup")
+	parser.add_argument("--no-plugin-saves", dest="plugin_saves", action="store_false", help="do not request a state save on every item update like the plugin does")
+	parser.add_argument("--timeout", type=float, default=600, help="per-scenario timeout in seconds")
+	parser.add_argument("--record", metavar="DIR", default=None, help="write a replayable trace of each scenario to DIR")
+	parser.add_argument("--json", action="store_true", help="print results as JSON")
+	parser.add_argument("--verbose", action="store_true", help="show the manager's error log")
+	args = parser.parse_args()
+
+	if not args.verbose:
+		logging.disable(logging.CRITICAL)
+
+	harness.install_stubs()
+	manager_mod, downloader_mod = harness.load_package()
+
+	results = [run_scenario(manager_mod, downloader_mod, jobs, args) for jobs in args.jobs]
+
+	if args.json:
+		print(json.dumps(results, indent=2))
+		return
+
+	header = ["jobs", "wall_s", "cpu_s", "children_cpu_s", "lock_acquisitions", "lock_wait_ms", "callbacks", "save_state_calls", "peak_rss_mb"]
+	print("  ".join(f"{h:>17}" for h in header))
+	for r in results:
+		print("  ".join(f"{r[h]:>17}" for h in header) + ("  TIMED OUT" if r["timed_out"] else "") + f"  {r['states']}")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,131 @@
+"""Measure what loading the add-on adds to NVDA's startup.
+
+Each run happens in a fresh interpreter so module imports are cold:
+
+	python tools/bench_startup.py --saved 1000 --repeat 5
+	python tools/bench_startup.py --import-budget 150 --init-budget 20
+
+It times importing the global plugin package and constructing GlobalPlugin,
+which is what NVDA waits for, and separately how long the background thread
+takes to restore --saved downloads from the state file. It also lists which of
+the add-on's modules were imported by the time the constructor returned.
+With a budget the script exits non-zero when the median run goes over it.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness  # noqa: E402
+
+
+def write_state(home, count):
+	downloads = {}
+	for d_id in range(count):
+		downloads[str(d_id)] = {
+			"id": d_id,
+			"url": f"https://www.tiktok.com/@user/video/{7300000000000000000 + d_id}",
+			"quality_str": "best",
+			"remove_watermark": True,
+			"title": f"Saved clip {d_id}",
+			"state": "Interrupted",
+			"statusText": f"Saved clip {d_id} - Interrupted",
+		}
+	with open(os.path.join(home, "nvda_tiktok_downloader_state.json"), "w", encoding="utf-8") as f:
+		json.dump({"version": 2, "next_download_id": count, "downloads": downloads}, f)
+
+
+def child(saved, timeout):
+	workspace = harness.make_workspace()
+	os.environ["HOME"] = workspace["home"]
+	os.environ["USERPROFILE"] = workspace["home"]
+	write_state(workspace["home"], saved)
+
+	harness.install_plugin_stubs({"downloadPath": workspace["downloads"]})
+	before = set(sys.modules)
+	started = time.perf_counter()
+	plugin_mod = harness.load_plugin()
+	imported = time.perf_counter()
+	plugin = plugin_mod.GlobalPlugin()
+	constructed = time.perf_counter()
+	loaded_modules = sorted(name for name in set(sys.modules) - before if name.startswith("tiktokDownloader."))
+
+	deadline = time.monotonic() + timeout
+	restored = None
+	while time.monotonic() < deadline:
+		manager = plugin._manager
+		if manager is not None and len(manager.iter_snapshot()) >= saved:
+			restored = time.perf_counter()
+			break
+		time.sleep(0.001)
+
+	return {
+		"import_ms": round((imported - started) * 1000, 2),
+		"init_ms": round((constructed - imported) * 1000, 2),
+		"restore_ms": round((restored - constructed) * 1000, 2) if restored else None,
+		"modules": [name.split(".", 1)[1] for name in loaded_modules],
+	}
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--saved", type=int, default=200, help="downloads in the saved state file")
+	parser.add_argument("--repeat", type=int, default=5, help="number of cold runs")
+	parser.add_argument("--import-budget", type=float, default=None, help="fail when the median import takes longer (ms)")
+	parser.add_argument("--init-budget", type=float, default=None, help="fail when the median GlobalPlugin() takes longer (ms)")
+	parser.add_argument("--timeout", type=float, default=60, help="seconds to wait for the saved downloads")
+	parser.add_argument("--json", action="store_true", help="print results as JSON")
+	parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+	args = parser.parse_args()
+
+	if args.child:
+		print(json.dumps(child(args.saved, args.timeout)))
+		return
+
+	runs = []
+	for _ in range(args.repeat):
+		out = subprocess.run(
+			[sys.executable, os.path.abspath(__file__), "--child", "--saved", str(args.saved), "--timeout", str(args.timeout)],
+			capture_output=True, text=True, check=True,
+		)
+		runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+	def median(key):
+		values = [r[key] for r in runs if r[key] is not None]
+		return round(statistics.median(values), 2) if values else None
+
+	result = {
+		"saved": args.saved,
+		"runs": len(runs),
+		"import_ms": median("import_ms"),
+		"init_ms": median("init_ms"),
+		"restore_ms": median("restore_ms"),
+		"restore_failed": sum(1 for r in runs if r["restore_ms"] is None),
+		"modules_at_init": runs[-1]["modules"],
+	}
+
+	if args.json:
+		print(json.dumps(result, indent=2))
+	else:
+		for key in ("saved", "runs", "import_ms", "init_ms", "restore_ms", "restore_failed"):
+			print(f"{key:>15}: {result[key]}")
+		print(f"{'modules':>15}: {', '.join(result['modules_at_init']) or '-'}")
+
+	over_budget = []
+	if args.import_budget is not None and result["import_ms"] > args.import_budget:
+		over_budget.append(f"import {result['import_ms']} ms > {args.import_budget} ms")
+	if args.init_budget is not None and result["init_ms"] > args.init_budget:
+		over_budget.append(f"GlobalPlugin() {result['init_ms']} ms > {args.init_budget} ms")
+	if result["restore_failed"]:
+		over_budget.append(f"{result['restore_failed']} runs did not restore the saved downloads")
+	if over_budget:
+		print("Over budget: " + "; ".join(over_budget), file=sys.stderr)
+		sys.exit(1)
+
+
+if __name__ == "__main__":
+	main()
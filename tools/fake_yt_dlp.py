@@ -0,0 +1,136 @@
+"""A stand-in for yt-dlp used by the add-on benchmarks.
+
+It understands the subset of the command line the add-on passes
+(--get-title, --paths, --format) and prints the same progress and print
+template lines the real binary would, without touching the network.
+
+Behaviour is controlled through environment variables:
+
+	FAKE_YTDLP_MODE      ok (default), fail, hang, or stubborn (ignores SIGTERM and hangs after the first progress line)
+	FAKE_YTDLP_SIZE      bytes per format (default 262144)
+	FAKE_YTDLP_STEPS     progress lines per format (default 20)
+	FAKE_YTDLP_RATE      progress lines per second, 0 for no delay (default 200)
+	FAKE_YTDLP_FAIL_AT   percent at which "fail" mode exits (default 50)
+"""
+import json
+import os
+import signal
+import sys
+import time
+
+PREFIX = "NVDA_TTDL_"
+
+
+def emit(tag, payload):
+	sys.stdout.write(PREFIX + tag + ":" + json.dumps(payload) + "\n")
+	sys.stdout.flush()
+
+
+def parse_args(argv):
+	opts = {"paths": {}, "format": "best", "url": None, "get_title": False}
+	i = 0
+	while i < len(argv):
+		arg = argv[i]
+		if arg == "--get-title":
+			opts["get_title"] = True
+		elif arg == "--paths" and i + 1 < len(argv):
+			kind, _, value = argv[i + 1].partition(":")
+			opts["paths"][kind] = value
+			i += 1
+		elif arg in ("--format", "-f") and i + 1 < len(argv):
+			opts["format"] = argv[i + 1]
+			i += 1
+		elif arg.startswith("-"):
+			if arg in ("--ffmpeg-location", "--output", "--encoding", "--progress-template", "--print", "--merge-output-format", "-S", "--load-info-json"):
+				i += 1
+		else:
+			opts["url"] = arg
+		i += 1
+	return opts
+
+
+def video_id(url):
+	return (url or "video").rstrip("/").rsplit("/", 1)[-1] or "video"
+
+
+def main():
+	opts = parse_args(sys.argv[1:])
+	mode = os.environ.get("FAKE_YTDLP_MODE", "ok")
+	size = int(os.environ.get("FAKE_YTDLP_SIZE", "262144"))
+	steps = max(1, int(os.environ.get("FAKE_YTDLP_STEPS", "20")))
+	rate = float(os.environ.get("FAKE_YTDLP_RATE", "200"))
+	fail_at = int(os.environ.get("FAKE_YTDLP_FAIL_AT", "50"))
+	delay = 1.0 / rate if rate > 0 else 0.0
+	if mode == "stubborn" and hasattr(signal, "SIGTERM"):
+		signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+	if "/photo/" in (opts["url"] or ""):
+		# Like the real one, it has no extractor for photo-mode post links.
+		print(f"ERROR: Unsupported URL: {opts['url']}", file=sys.stderr)
+		return 1
+
+	vid = video_id(opts["url"])
+	if opts["get_title"]:
+		print(f"Fake clip {vid}")
+		return 0
+
+	home = opts["paths"].get("home") or os.getcwd()
+	temp = opts["paths"].get("temp") or home
+	os.makedirs(temp, exist_ok=True)
+	name = f"Fake clip {vid}"
+	format_ids = ["v", "a"] if "+" in opts["format"] else ["b"]
+
+	emit("INFO", {"id": vid, "title": name, "ext": "mp4", "format_id": "+".join(format_ids), "filesize": size * len(format_ids)})
+
+	parts = []
+	chunk = b"\0" * max(1, size // steps)
+	for fmt in format_ids:
+		filename = os.path.join(temp, f"{name}.f{fmt}.mp4")
+		tmpfilename = filename + ".part"
+		started = time.monotonic()
+		with open(tmpfilename, "wb") as f:
+			for step in range(1, steps + 1):
+				if mode == "hang" or (mode == "stubborn" and step > 1):
+					time.sleep(3600)
+				done = min(size, step * size // steps)
+				f.write(chunk)
+				elapsed = max(1e-6, time.monotonic() - started)
+				emit("PROGRESS", {
+					"status": "downloading",
+					"downloaded_bytes": done,
+					"total_bytes": size,
+					"total_bytes_estimate": None,
+					"speed": done / elapsed,
+					"eta": 0,
+					"filename": filename,
+					"tmpfilename": tmpfilename,
+				})
+				if mode == "fail" and done * 100 >= size * fail_at:
+					print("ERROR: fake failure requested")
+					return 1
+				if delay:
+					time.sleep(delay)
+		os.replace(tmpfilename, filename)
+		emit("PROGRESS", {"status": "finished", "downloaded_bytes": size, "total_bytes": size, "filename": filename, "tmpfilename": tmpfilename})
+		parts.append(filename)
+
+	merged = os.path.join(temp, f"{name}.mp4")
+	if len(parts) > 1:
+		print(f'[Merger] Merging formats into "{merged}"')
+		with open(merged, "wb") as out:
+			for part in parts:
+				with open(part, "rb") as f:
+					out.write(f.read())
+				os.remove(part)
+	else:
+		os.replace(parts[0], merged)
+	emit("POSTPROCESS", merged)
+
+	final = os.path.join(home, os.path.basename(merged))
+	os.replace(merged, final)
+	emit("FILEPATH", final)
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
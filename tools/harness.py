@@ -0,0 +1,240 @@
+"""Headless loading of the add-on package for benchmarks.
+
+NVDA's modules (addonHandler, config, ui, wx) are replaced by small stubs so
+that DownloadManager can run on any platform. load_package() never executes
+the package __init__ (the NVDA global plugin); load_plugin() does, on top of
+the extra stubs from install_plugin_stubs().
+"""
+import ast
+import builtins
+import re
+import os
+import queue
+import stat
+import sys
+import tempfile
+import threading
+import time
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_DIR = os.path.join(ROOT, "addon", "globalPlugins", "tiktokDownloader")
+FAKE_YT_DLP = os.path.join(ROOT, "tools", "fake_yt_dlp.py")
+
+
+def _stub_module(name, **attrs):
+	module = types.ModuleType(name)
+	module.__dict__.update(attrs)
+	sys.modules[name] = module
+	return module
+
+
+def install_stubs(conf=None):
+	builtins.__dict__.setdefault("_", lambda s: s)
+	_stub_module("addonHandler", initTranslation=lambda: None)
+	_stub_module("ui", message=lambda msg: None)
+	_stub_module("config", conf={"tiktokDownloader": dict(conf or {})})
+	_stub_module("wx", CallAfter=lambda func, *args, **kwargs: func(*args, **kwargs))
+
+
+class _Spec(dict):
+	"""config.conf.spec stand-in that fills in the defaults of each registered section."""
+
+	def __init__(self, conf):
+		super().__init__()
+		self._conf = conf
+
+	def update(self, sections):
+		super().update(sections)
+		for section, keys in sections.items():
+			values = self._conf.setdefault(section, {})
+			for key, spec in keys.items():
+				match = re.search(r"default=(.+)\)$", spec)
+				if match and key not in values:
+					values[key] = ast.literal_eval(match.group(1))
+
+
+class _Conf(dict):
+
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.spec = _Spec(self)
+
+
+class _MenuStub:
+
+	def Append(self, *args, **kwargs):
+		return object()
+
+	def Remove(self, item):
+		pass
+
+	def Bind(self, *args, **kwargs):
+		pass
+
+
+def install_plugin_stubs(conf=None):
+	"""Adds what the global plugin needs at import and construction time."""
+	install_stubs()
+	sys.modules["config"].conf = _Conf({"tiktokDownloader": dict(conf or {})})
+	wx = sys.modules["wx"]
+	wx.ID_ANY = -1
+	wx.EVT_MENU = object()
+	wx.CallLater = lambda delay, func, *args, **kwargs: None
+
+	class GlobalPlugin:
+
+		def __init__(self):
+			pass
+
+		def terminate(self):
+			pass
+
+	class SettingsPanel:
+		pass
+
+	class NVDASettingsDialog:
+		categoryClasses = []
+
+	_stub_module("globalPluginHandler", GlobalPlugin=GlobalPlugin, runningPlugins=set())
+	_stub_module("api", getFocusObject=lambda: None, getForegroundObject=lambda: None)
+	_stub_module("controlTypes")
+	_stub_module("tones", beep=lambda *args: None)
+	_stub_module("scriptHandler", script=lambda **kwargs: (lambda func: func))
+	tray = _MenuStub()
+	tray.toolsMenu = _MenuStub()
+	gui = _stub_module("gui", mainFrame=types.SimpleNamespace(sysTrayIcon=tray))
+	gui.guiHelper = _stub_module("gui.guiHelper")
+	gui.settingsDialogs = _stub_module("gui.settingsDialogs", SettingsPanel=SettingsPanel, NVDASettingsDialog=NVDASettingsDialog)
+
+
+def load_plugin():
+	"""Imports the package __init__, i.e. the NVDA global plugin, as NVDA does."""
+	import importlib.util
+	spec = importlib.util.spec_from_file_location(
+		"tiktokDownloader", os.path.join(PACKAGE_DIR, "__init__.py"), submodule_search_locations=[PACKAGE_DIR]
+	)
+	module = importlib.util.module_from_spec(spec)
+	sys.modules["tiktokDownloader"] = module
+	spec.loader.exec_module(module)
+	return module
+
+
+def load_package():
+	if "tiktokDownloader" not in sys.modules:
+		package = types.ModuleType("tiktokDownloader")
+		package.__path__ = [PACKAGE_DIR]
+		sys.modules["tiktokDownloader"] = package
+	import importlib
+	return importlib.import_module("tiktokDownloader.manager"), importlib.import_module("tiktokDownloader.downloader")
+
+
+def make_workspace(yt_dlp_command=None, ffmpeg=None, ffprobe=None):
+	root = tempfile.mkdtemp(prefix="ttdl_bench_")
+	bin_dir = os.path.join(root, "bin")
+	download_dir = os.path.join(root, "downloads")
+	home_dir = os.path.join(root, "home")
+	for d in (bin_dir, download_dir, home_dir):
+		os.makedirs(d)
+
+	if yt_dlp_command is None:
+		yt_dlp_command = f'"{sys.executable}" "{FAKE_YT_DLP}"'
+	launcher = os.path.join(bin_dir, "yt-dlp.exe")
+	with open(launcher, "w") as f:
+		f.write(f'#!/bin/sh\nexec {yt_dlp_command} "$@"\n')
+	os.chmod(launcher, os.stat(launcher).st_mode | stat.S_IEXEC)
+
+	# The add-on checks for the .exe names; yt-dlp looks up the bare names in --ffmpeg-location.
+	for name, target in (("ffmpeg", ffmpeg), ("ffprobe", ffprobe)):
+		if target:
+			os.symlink(target, os.path.join(bin_dir, name + ".exe"))
+			os.symlink(target, os.path.join(bin_dir, name))
+		else:
+			open(os.path.join(bin_dir, name + ".exe"), "w").close()
+
+	return {"root": root, "bin": bin_dir, "downloads": download_dir, "home": home_dir}
+
+
+class MainLoop:
+	"""Runs wx.CallAfter callbacks on one thread, standing in for NVDA's main thread."""
+
+	def __init__(self):
+		self._queue = queue.Queue()
+		self._thread = threading.Thread(target=self._run, daemon=True)
+
+	def start(self):
+		sys.modules["wx"].CallAfter = self.post
+		self._thread.start()
+		return self
+
+	def post(self, func, *args, **kwargs):
+		self._queue.put((func, args, kwargs))
+
+	def stop(self):
+		self._queue.put(None)
+		self._thread.join()
+
+	def _run(self):
+		while True:
+			entry = self._queue.get()
+			if entry is None:
+				return
+			func, args, kwargs = entry
+			try:
+				func(*args, **kwargs)
+			except Exception:
+				pass
+
+
+class LatencyProbe:
+	"""Posts an empty callback to the main loop at a fixed interval.
+
+	Its queue delay in latency.MONITOR shows how promptly the main thread gets
+	scheduled while downloads and merges compete for the CPU.
+	"""
+
+	def __init__(self, call_after, interval=0.01):
+		self._call_after = call_after
+		self._interval = interval
+		self._stop = threading.Event()
+		self._thread = threading.Thread(target=self._run, daemon=True)
+
+	def start(self):
+		self._thread.start()
+		return self
+
+	def stop(self):
+		self._stop.set()
+		self._thread.join()
+
+	def _run(self):
+		def latency_probe():
+			pass
+
+		while not self._stop.wait(self._interval):
+			self._call_after(latency_probe)
+
+
+class TimedRLock:
+
+	def __init__(self):
+		self._lock = threading.RLock()
+		self.acquisitions = 0
+		self.wait_time = 0.0
+
+	def acquire(self, blocking=True, timeout=-1):
+		start = time.perf_counter()
+		acquired = self._lock.acquire(blocking, timeout)
+		self.wait_time += time.perf_counter() - start
+		self.acquisitions += 1
+		return acquired
+
+	def release(self):
+		self._lock.release()
+
+	def __enter__(self):
+		self.acquire()
+		return self
+
+	def __exit__(self, exc_type, exc, tb):
+		self.release()
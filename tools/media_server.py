@@ -0,0 +1,333 @@
+"""Local HTTP server with synthetic TikTok-like pages and split media streams.
+
+Pages live at /@<user>/video/<id> and embed a __UNIVERSAL_DATA_FOR_REHYDRATION__
+blob pointing at a video-only MP4, an audio-only M4A and a progressive MP4.
+Ids from FIRST_PHOTO_ID on are photo-mode posts of PHOTO_IMAGES images and
+the M4A, served at /@<user>/photo/<id> as well as under /video/.
+/api/user/<user>/items?cursor=N pages through a profile of PROFILE_SIZE
+videos, newest (highest id) first and PROFILE_PAGE_SIZE at a time, for
+profile expansion and subscriptions.
+Media requests support byte ranges, per-connection throttling and fault
+injection (HTTP 429 responses and connection resets).
+
+Run standalone with `python tools/media_server.py --port 8765`; the media
+files are generated once with ffmpeg.
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MEDIA_FILES = {
+	"video.mp4": "video/mp4",
+	"audio.m4a": "audio/mp4",
+	"progressive.mp4": "video/mp4",
+	"photo1.jpg": "image/jpeg",
+	"photo2.jpg": "image/jpeg",
+	"photo3.png": "image/png",
+}
+PHOTO_FILES = ["photo1.jpg", "photo2.jpg", "photo3.png"]
+CHUNK_SIZE = 16 * 1024
+PROFILE_SIZE = 100
+PROFILE_PAGE_SIZE = 10
+FIRST_VIDEO_ID = 7300000000000000001
+FIRST_PHOTO_ID = 7400000000000000001
+PHOTO_IMAGES = 12
+
+
+def ensure_media(ffmpeg, media_dir, duration=10):
+	os.makedirs(media_dir, exist_ok=True)
+	video = os.path.join(media_dir, "video.mp4")
+	audio = os.path.join(media_dir, "audio.m4a")
+	progressive = os.path.join(media_dir, "progressive.mp4")
+	run = lambda args: subprocess.run([ffmpeg, "-y", "-loglevel", "error"] + args, check=True)
+	if not os.path.exists(video):
+		run([
+			"-f", "lavfi", "-i", f"testsrc=duration={duration}:size=720x1280:rate=30",
+			"-c:v", "libx264", "-pix_fmt", "yuv420p", "-preset", "veryfast", "-an", "-movflags", "+faststart", video,
+		])
+	if not os.path.exists(audio):
+		run(["-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}", "-c:a", "aac", "-vn", audio])
+	if not os.path.exists(progressive):
+		run(["-i", video, "-i", audio, "-c", "copy", "-movflags", "+faststart", progressive])
+	# Photo posts mix shapes: portrait, landscape and square.
+	for name, size in zip(PHOTO_FILES, ("1080x1440", "1280x720", "800x800")):
+		path = os.path.join(media_dir, name)
+		if not os.path.exists(path):
+			run(["-f", "lavfi", "-i", f"testsrc=size={size}", "-frames:v", "1", path])
+	return media_dir
+
+
+class FaultInjector:
+
+	def __init__(self, fail_429_every=0, reset_every=0, reset_after_bytes=64 * 1024):
+		self.fail_429_every = fail_429_every
+		self.reset_every = reset_every
+		self.reset_after_bytes = reset_after_bytes
+		self._lock = threading.Lock()
+		self._count = 0
+		self.stats = {"requests": 0, "429": 0, "resets": 0, "bytes_sent": 0, "list_pages": 0}
+
+	def next_request(self):
+		with self._lock:
+			self._count += 1
+			self.stats["requests"] += 1
+			n = self._count
+		send_429 = bool(self.fail_429_every) and n % self.fail_429_every == 0
+		reset = bool(self.reset_every) and not send_429 and n % self.reset_every == 0
+		return send_429, reset
+
+	def count(self, key, amount=1):
+		with self._lock:
+			self.stats[key] += amount
+
+
+def is_photo_id(video_id):
+	return int(video_id) >= FIRST_PHOTO_ID
+
+
+def render_page(user, video_id, sizes):
+	item = {
+		"id": video_id,
+		"desc": f"Local clip {video_id}",
+		"author": {"uniqueId": user},
+		"video": {
+			"playAddr": f"/media/{video_id}/video.mp4",
+			"downloadAddr": f"/media/{video_id}/progressive.mp4",
+			"width": 720,
+			"height": 1280,
+			"size": sizes["video.mp4"],
+			"downloadSize": sizes["progressive.mp4"],
+		},
+		"music": {
+			"playUrl": f"/media/{video_id}/audio.m4a",
+			"size": sizes["audio.m4a"],
+		},
+	}
+	if is_photo_id(video_id):
+		item["desc"] = f"Local photos {video_id}"
+		item["video"] = {"duration": 0}
+		item["imagePost"] = {
+			"title": f"Local photos {video_id}",
+			"images": [
+				# The query keeps the URLs of images sharing a file distinct.
+				{"imageURL": {"urlList": [f"/media/{video_id}/{PHOTO_FILES[n % len(PHOTO_FILES)]}?n={n}"]}}
+				for n in range(PHOTO_IMAGES)
+			],
+		}
+	data = {"__DEFAULT_SCOPE__": {"webapp.video-detail": {"itemInfo": {"itemStruct": item}}}}
+	return (
+		"<!DOCTYPE html><html><head><title>Local clip</title></head><body>"
+		f'<script id="__UNIVERSAL_DATA_FOR_REHYDRATION__" type="application/json">{json.dumps(data)}</script>'
+		"</body></html>"
+	).encode("utf-8")
+
+
+def render_listing(cursor, profile_size):
+	ids = [str(FIRST_VIDEO_ID + profile_size - 1 - i) for i in range(cursor, min(cursor + PROFILE_PAGE_SIZE, profile_size))]
+	next_cursor = cursor + len(ids)
+	return json.dumps({"items": [{"id": i, "desc": f"Local clip {i}"} for i in ids], "cursor": next_cursor, "hasMore": next_cursor < profile_size}).encode("utf-8")
+
+
+def make_handler(media_dir, throttle_bps, faults, page_delay=0.0, profile=None):
+	profile = profile if profile is not None else {"size": PROFILE_SIZE}
+	sizes = {name: os.path.getsize(os.path.join(media_dir, name)) for name in MEDIA_FILES}
+	page_re = re.compile(r"^/@(?P<user>[^/]+)/(?:video|photo)/(?P<id>\d+)/?$")
+	listing_re = re.compile(r"^/api/user/(?P<user>[^/]+)/items$")
+	cursor_re = re.compile(r"(?:^|&)cursor=(\d+)")
+	media_re = re.compile(r"^/media/(?P<id>\d+)/(?P<name>[\w.]+)$")
+	range_re = re.compile(r"bytes=(\d*)-(\d*)")
+
+	class Handler(BaseHTTPRequestHandler):
+		protocol_version = "HTTP/1.1"
+
+		def log_message(self, format, *args):
+			pass
+
+		def do_HEAD(self):
+			self._handle(head=True)
+
+		def do_GET(self):
+			self._handle(head=False)
+
+		def _handle(self, head):
+			path, _, query = self.path.partition("?")
+			m = listing_re.match(path)
+			if m:
+				if page_delay:
+					time.sleep(page_delay)
+				faults.count("list_pages")
+				cursor = cursor_re.search(query)
+				body = render_listing(int(cursor.group(1)) if cursor else 0, profile["size"])
+				self.send_response(200)
+				self.send_header("Content-Type", "application/json")
+				self.send_header("Content-Length", str(len(body)))
+				self.end_headers()
+				if not head:
+					self.wfile.write(body)
+				return
+
+			m = page_re.match(path)
+			if m:
+				if page_delay:
+					# Stands in for the slow page fetch that dominates real TikTok extraction.
+					time.sleep(page_delay)
+				body = render_page(m.group("user"), m.group("id"), sizes)
+				self.send_response(200)
+				self.send_header("Content-Type", "text/html; charset=utf-8")
+				self.send_header("Set-Cookie", "tt_chain_token=local; Path=/; HttpOnly")
+				self.send_header("Content-Length", str(len(body)))
+				self.end_headers()
+				if not head:
+					self.wfile.write(body)
+				return
+
+			m = media_re.match(path)
+			if not m or m.group("name") not in MEDIA_FILES:
+				self.send_error(404)
+				return
+
+			send_429, reset = faults.next_request()
+			if send_429:
+				faults.count("429")
+				self.send_response(429)
+				self.send_header("Retry-After", "0")
+				self.send_header("Content-Length", "0")
+				self.end_headers()
+				return
+
+			name = m.group("name")
+			size = sizes[name]
+			start, end = 0, size - 1
+			status = 200
+			rng = range_re.match(self.headers.get("Range", ""))
+			if rng and (rng.group(1) or rng.group(2)):
+				if rng.group(1):
+					start = int(rng.group(1))
+					if rng.group(2):
+						end = min(int(rng.group(2)), size - 1)
+				else:
+					start = max(0, size - int(rng.group(2)))
+				if start > end:
+					self.send_response(416)
+					self.send_header("Content-Range", f"bytes */{size}")
+					self.send_header("Content-Length", "0")
+					self.end_headers()
+					return
+				status = 206
+
+			length = end - start + 1
+			self.send_response(status)
+			self.send_header("Content-Type", MEDIA_FILES[name])
+			self.send_header("Accept-Ranges", "bytes")
+			self.send_header("Content-Length", str(length))
+			if status == 206:
+				self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+			self.end_headers()
+			if head:
+				return
+
+			self._send_file(os.path.join(media_dir, name), start, length, reset)
+
+		def _send_file(self, path, start, length, reset):
+			sent = 0
+			began = time.monotonic()
+			with open(path, "rb") as f:
+				f.seek(start)
+				while sent < length:
+					if reset and sent >= faults.reset_after_bytes:
+						faults.count("resets")
+						self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, b"\x01\x00\x00\x00\x00\x00\x00\x00")
+						self.close_connection = True
+						self.connection.close()
+						return
+					chunk = f.read(min(CHUNK_SIZE, length - sent))
+					if not chunk:
+						break
+					try:
+						self.wfile.write(chunk)
+					except (BrokenPipeError, ConnectionResetError):
+						return
+					sent += len(chunk)
+					faults.count("bytes_sent", len(chunk))
+					if throttle_bps:
+						ahead = sent / throttle_bps - (time.monotonic() - began)
+						if ahead > 0:
+							time.sleep(ahead)
+
+	return Handler
+
+
+class MediaServer:
+
+	def __init__(
+		self, media_dir, port=0, throttle_bps=0, fail_429_every=0, reset_every=0, reset_after_bytes=64 * 1024,
+		page_delay=0.0, profile_size=PROFILE_SIZE,
+	):
+		self.faults = FaultInjector(fail_429_every, reset_every, reset_after_bytes)
+		# Mutable, so a test can post new videos to the profile while the server runs.
+		self.profile = {"size": profile_size}
+		handler = make_handler(media_dir, throttle_bps, self.faults, page_delay, self.profile)
+		self._server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+		self._server.daemon_threads = True
+		self._thread = None
+
+	@property
+	def base_url(self):
+		host, port = self._server.server_address[:2]
+		return f"http://{host}:{port}"
+
+	def video_url(self, video_id, user="bench"):
+		return f"{self.base_url}/@{user}/video/{video_id}"
+
+	def photo_url(self, post_id, user="bench"):
+		return f"{self.base_url}/@{user}/photo/{post_id}"
+
+	def profile_url(self, user="bench"):
+		return f"{self.base_url}/@{user}"
+
+	def start(self):
+		self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+		self._thread.start()
+		return self
+
+	def stop(self):
+		self._server.shutdown()
+		self._server.server_close()
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Serve synthetic TikTok-like pages and media.")
+	parser.add_argument("--port", type=int, default=8765)
+	parser.add_argument("--ffmpeg", default="ffmpeg")
+	parser.add_argument("--media-dir", default=os.path.join(tempfile.gettempdir(), "ttdl_media"))
+	parser.add_argument("--throttle", type=int, default=0, help="bytes per second per connection, 0 for unlimited")
+	parser.add_argument("--fail-429-every", type=int, default=0, help="answer every Nth media request with HTTP 429")
+	parser.add_argument("--reset-every", type=int, default=0, help="reset every Nth media connection part-way")
+	parser.add_argument("--page-delay", type=float, default=0.0, help="seconds to wait before answering a video page or profile listing page")
+	parser.add_argument("--profile-size", type=int, default=PROFILE_SIZE, help="number of videos listed on every profile")
+	args = parser.parse_args()
+
+	ensure_media(args.ffmpeg, args.media_dir)
+	server = MediaServer(
+		args.media_dir, args.port, args.throttle, args.fail_429_every, args.reset_every,
+		page_delay=args.page_delay, profile_size=args.profile_size,
+	).start()
+	print(f"Serving on {server.video_url(str(FIRST_VIDEO_ID))}")
+	print(f"Profile at {server.profile_url()}")
+	print(f"Photo post at {server.photo_url(str(FIRST_PHOTO_ID))}")
+	try:
+		while True:
+			time.sleep(3600)
+	except KeyboardInterrupt:
+		server.stop()
+
+
+if __name__ == "__main__":
+	main()
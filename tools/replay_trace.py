@@ -0,0 +1,165 @@
+"""Replay a recorded download session through DownloadManager.
+
+Traces are written by the add-on when "Record download traces" is enabled in
+its settings (see tracing.py), or by bench_manager.py/bench_e2e.py --record.
+Replaying needs neither network access nor yt-dlp:
+
+	python tools/replay_trace.py ~/nvda_tiktok_downloader_traces/trace-20240101-120000.jsonl.gz
+	python tools/replay_trace.py trace.jsonl.gz --speed 0 --repeat 5
+
+--speed 1 keeps the recorded timing, --speed 0 replays as fast as possible.
+The report covers wall and CPU time, lock waits, UI callbacks and replayed
+lines per second. It also lists downloads whose state sequence differs from
+the recorded one, which points at ordering changes.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness  # noqa: E402
+
+
+def replay_once(manager_mod, tracing, records, args):
+	replayer = tracing.TraceReplayer(records, speed=args.speed)
+	concurrency = args.concurrency or replayer.meta.get("max_concurrent") or 3
+	workspace = harness.make_workspace()
+	os.environ["HOME"] = workspace["home"]
+	conf = sys.modules["config"].conf["tiktokDownloader"]
+	conf.update({
+		"downloadPath": workspace["downloads"],
+		"autoRetryAttempts": args.retries,
+		"stallTimeout": 0,
+		"mergeTimeout": 0,
+		"minSpeedKbps": 0,
+		"resolveTimeout": 30,
+		"totalDownloads": 0,
+	})
+
+	lines = replayer.line_count
+	urls = {}
+	states = {}
+	counters = {"callbacks": 0}
+	counter_lock = threading.Lock()
+
+	def on_added(d_id, data):
+		with counter_lock:
+			counters["callbacks"] += 1
+			urls[d_id] = data["url"]
+			tracing.collapse_state(states.setdefault(data["url"], []), data["state"])
+
+	def on_state(d_id, data):
+		with counter_lock:
+			counters["callbacks"] += 1
+			url = urls.get(d_id)
+			if url is not None:
+				tracing.collapse_state(states.setdefault(url, []), data["state"])
+
+	def on_states(batch):
+		for d_id, data in batch:
+			on_state(d_id, data)
+
+	def count(*_):
+		with counter_lock:
+			counters["callbacks"] += 1
+
+	manager = manager_mod.DownloadManager(
+		max_concurrent=concurrency,
+		on_item_added=on_added,
+		on_item_updated=on_state,
+		on_item_removed=count,
+		on_items_updated=on_states,
+		on_items_removed=count,
+		on_queue_updated=count,
+		launcher=replayer.launcher,
+	)
+	timed_lock = harness.TimedRLock()
+	manager._lock = timed_lock
+
+	cpu_start = time.process_time()
+	wall_start = time.perf_counter()
+	for job in replayer.jobs:
+		if args.speed > 0:
+			delay = job["offset"] / args.speed - (time.perf_counter() - wall_start)
+			if delay > 0:
+				time.sleep(delay)
+		# Recorded titles avoid the --get-title lookup, which would need yt-dlp.
+		manager.start_download(job["url"], job["quality"], known_title=job["title"] or job["url"], remove_watermark=job["remove_watermark"])
+
+	deadline = time.monotonic() + args.timeout
+	timed_out = False
+	while True:
+		if all(manager_mod.is_finished_status(data["state"]) for _, data in manager.iter_snapshot()):
+			break
+		if time.monotonic() > deadline:
+			timed_out = True
+			manager.stop_all(workspace["downloads"])
+			break
+		time.sleep(0.01)
+	wall = time.perf_counter() - wall_start
+
+	mismatches = []
+	for url, recorded in replayer.states.items():
+		replayed = states.get(url, [])
+		if recorded != replayed:
+			mismatches.append({"url": url, "recorded": recorded, "replayed": replayed})
+
+	return {
+		"jobs": len(replayer.jobs),
+		"lines": lines,
+		"wall_s": round(wall, 3),
+		"cpu_s": round(time.process_time() - cpu_start, 3),
+		"lines_per_s": int(lines / wall) if wall else 0,
+		"lock_acquisitions": timed_lock.acquisitions,
+		"lock_wait_ms": round(timed_lock.wait_time * 1000, 2),
+		"callbacks": counters["callbacks"],
+		"state_mismatches": mismatches,
+		"timed_out": timed_out,
+	}
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Replay a download trace through DownloadManager.")
+	parser.add_argument("trace", help="trace file written by the add-on (.jsonl or .jsonl.gz)")
+	parser.add_argument("--speed", type=float, default=1.0, help="timing scale, 0 to replay as fast as possible")
+	parser.add_argument("--concurrency", type=int, default=None, help="max concurrent downloads (default: as recorded)")
+	parser.add_argument("--retries", type=int, default=2, help="autoRetryAttempts; keep as recorded to reproduce retries")
+	parser.add_argument("--repeat", type=int, default=1, help="number of replays")
+	parser.add_argument("--timeout", type=float, default=600, help="per-replay timeout in seconds")
+	parser.add_argument("--json", action="store_true", help="print results as JSON")
+	parser.add_argument("--verbose", action="store_true", help="show the manager's error log")
+	args = parser.parse_args()
+
+	if not args.verbose:
+		logging.disable(logging.CRITICAL)
+
+	harness.install_stubs()
+	manager_mod, _ = harness.load_package()
+	import importlib
+	tracing = importlib.import_module("tiktokDownloader.tracing")
+	records = tracing.load_trace(args.trace)
+
+	results = [replay_once(manager_mod, tracing, records, args) for _ in range(args.repeat)]
+
+	if args.json:
+		print(json.dumps(results, indent=2))
+		return
+
+	header = ["jobs", "lines", "wall_s", "cpu_s", "lines_per_s", "lock_acquisitions", "lock_wait_ms", "callbacks"]
+	print("  ".join(f"{h:>17}" for h in header))
+	for r in results:
+		print(
+			"  ".join(f"{r[h]:>17}" for h in header)
+			+ ("  TIMED OUT" if r["timed_out"] else "")
+			+ f"  {len(r['state_mismatches'])} state mismatches"
+		)
+	for mismatch in results[-1]["state_mismatches"][:10]:
+		print(f"{mismatch['url']}\n  recorded: {' > '.join(mismatch['recorded'])}\n  replayed: {' > '.join(mismatch['replayed'])}")
+
+
+if __name__ == "__main__":
+	main()
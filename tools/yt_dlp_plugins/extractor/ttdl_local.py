@@ -0,0 +1,100 @@
+# Test-only yt-dlp extractor for the pages served by tools/media_server.py.
+# yt-dlp picks it up when the tools folder is on PYTHONPATH.
+from yt_dlp.extractor.common import InfoExtractor
+from yt_dlp.utils import int_or_none, urljoin
+
+
+class TTDLLocalUserIE(InfoExtractor):
+	IE_NAME = "ttdl:local:user"
+	_VALID_URL = r"https?://(?P<host>(?:127\.0\.0\.1|localhost):\d+)/@(?P<user>[^/?#]+)/?(?:[?#]|$)"
+
+	def _entries(self, host, user):
+		cursor = 0
+		while True:
+			data = self._download_json(
+				f"http://{host}/api/user/{user}/items", user, query={"cursor": cursor},
+				note=f"Downloading page at cursor {cursor}",
+			)
+			for item in data.get("items") or []:
+				yield self.url_result(
+					f"http://{host}/@{user}/video/{item['id']}", TTDLLocalIE, item["id"], item.get("desc"),
+				)
+			if not data.get("hasMore"):
+				return
+			cursor = data["cursor"]
+
+	def _real_extract(self, url):
+		host, user = self._match_valid_url(url).group("host", "user")
+		return self.playlist_result(self._entries(host, user), user, user)
+
+
+class TTDLLocalIE(InfoExtractor):
+	IE_NAME = "ttdl:local"
+	_VALID_URL = r"https?://(?:127\.0\.0\.1|localhost):\d+/@(?P<user>[^/]+)/video/(?P<id>\d+)"
+
+	def _real_extract(self, url):
+		user, video_id = self._match_valid_url(url).group("user", "id")
+		webpage = self._download_webpage(url, video_id)
+		data = self._search_json(
+			r'<script[^>]+\bid="__UNIVERSAL_DATA_FOR_REHYDRATION__"[^>]*>',
+			webpage, "universal data", video_id, end_pattern=r"</script>",
+		)
+		item = data["__DEFAULT_SCOPE__"]["webapp.video-detail"]["itemInfo"]["itemStruct"]
+		video = item["video"]
+		music = item["music"]
+
+		if item.get("imagePost"):
+			# Like TikTok's extractor, which has no image formats: the sound is all there is.
+			return {
+				"id": video_id,
+				"title": item.get("desc") or video_id,
+				"uploader": user,
+				"formats": [{
+					"format_id": "audio",
+					"url": urljoin(url, music["playUrl"]),
+					"ext": "m4a",
+					"vcodec": "none",
+					"acodec": "aac",
+					"filesize": int_or_none(music.get("size")),
+				}],
+			}
+
+		formats = [
+			{
+				"format_id": "bytevc1_split",
+				"url": urljoin(url, video["playAddr"]),
+				"ext": "mp4",
+				"vcodec": "h264",
+				"acodec": "none",
+				"width": int_or_none(video.get("width")),
+				"height": int_or_none(video.get("height")),
+				"filesize": int_or_none(video.get("size")),
+				"quality": 2,
+			},
+			{
+				"format_id": "audio",
+				"url": urljoin(url, music["playUrl"]),
+				"ext": "m4a",
+				"vcodec": "none",
+				"acodec": "aac",
+				"filesize": int_or_none(music.get("size")),
+			},
+			{
+				"format_id": "download_watermarked",
+				"url": urljoin(url, video["downloadAddr"]),
+				"ext": "mp4",
+				"vcodec": "h264",
+				"acodec": "aac",
+				"width": int_or_none(video.get("width")),
+				"height": int_or_none(video.get("height")),
+				"filesize": int_or_none(video.get("downloadSize")),
+				"quality": 1,
+			},
+		]
+
+		return {
+			"id": video_id,
+			"title": item.get("desc") or video_id,
+			"uploader": user,
+			"formats": formats,
+		}